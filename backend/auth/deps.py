@@ -2,7 +2,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from auth.jwt import decode_access_token
-from crud.users import get_user_by_username
+from crud.users import get_principal
 from db import get_db
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -19,7 +19,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
     username: str = payload.get("sub")
     if username is None:
         raise credentials_exception
-    user = await get_user_by_username(db, username)
+    user = await get_principal(db, username)
     if user is None:
         raise credentials_exception
     return user
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from opentelemetry import metrics
+from passlib.context import CryptContext
+
+# bcrypt навмисно повільний (~200 мс на виклик). Викликати його прямо в async
+# хендлері означає блокувати event loop, тому хешування і перевірка паролів
+# виконуються в обмеженому пулі потоків (bcrypt відпускає GIL).
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+meter = metrics.get_meter(__name__)
+queue_depth = meter.create_up_down_counter(
+    "auth.password_hash.queue_depth",
+    description="Password hash/verify jobs waiting for a free worker",
+)
+in_flight = meter.create_up_down_counter(
+    "auth.password_hash.in_flight",
+    description="Password hash/verify jobs currently running",
+)
+wait_time = meter.create_histogram(
+    "auth.password_hash.wait_time",
+    unit="ms",
+    description="Time a job spent queued before a worker picked it up",
+)
+run_time = meter.create_histogram(
+    "auth.password_hash.duration",
+    unit="ms",
+    description="Time spent inside bcrypt",
+)
+
+
+class PasswordHasher:
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", pwd_context.verify, plain_password, hashed_password)
+
+    async def _run(self, op: str, fn, *args):
+        attributes = {"op": op}
+        submitted = time.perf_counter()
+        queue_depth.add(1, attributes)
+
+        def job():
+            started = time.perf_counter()
+            queue_depth.add(-1, attributes)
+            in_flight.add(1, attributes)
+            wait_time.record((started - submitted) * 1000, attributes)
+            try:
+                return fn(*args)
+            finally:
+                in_flight.add(-1, attributes)
+                run_time.record((time.perf_counter() - started) * 1000, attributes)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, job)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
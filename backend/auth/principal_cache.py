@@ -0,0 +1,69 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from opentelemetry import metrics
+
+# Кеш користувачів для get_current_user, ключ - JWT "sub" (username).
+# Кеш живе в межах процесу: update/delete інвалідують його одразу в поточному
+# воркері, а в інших воркерах запис застаріє не пізніше ніж через TTL.
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 30))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 1024))
+
+meter = metrics.get_meter(__name__)
+hits_counter = meter.create_counter(
+    "auth.principal_cache.hits",
+    description="get_current_user lookups served from the principal cache",
+)
+misses_counter = meter.create_counter(
+    "auth.principal_cache.misses",
+    description="get_current_user lookups that went to the users table",
+)
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # username -> (expires_at, user)
+        self._usernames = {}  # user id -> username
+
+    def get(self, username: str) -> Optional[dict]:
+        entry = self._entries.get(username)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._drop(username)
+            misses_counter.add(1)
+            return None
+        self._entries.move_to_end(username)
+        hits_counter.add(1)
+        return dict(entry[1])
+
+    def put(self, username: str, user: dict):
+        if self.max_size <= 0:
+            return
+        self._drop(username)
+        self._entries[username] = (time.monotonic() + self.ttl, dict(user))
+        self._usernames[user["id"]] = username
+        while len(self._entries) > self.max_size:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._usernames.pop(evicted["id"], None)
+
+    def invalidate_user(self, user_id: int):
+        username = self._usernames.pop(user_id, None)
+        if username is not None:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._usernames.clear()
+
+    def _drop(self, username: str):
+        entry = self._entries.pop(username, None)
+        if entry is not None:
+            self._usernames.pop(entry[1]["id"], None)
+
+
+principal_cache = PrincipalCache()
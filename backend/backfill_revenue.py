@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+from datetime import date
+from typing import Optional
+
+from crud.revenue import rebuild_revenue_rollup
+
+# Перерахунок зведення виручки (revenue_rollup) з invoices/invoice_items.
+#
+# Зведення підтримується інкрементально (crud/revenue.py), тож це потрібно лише
+# після ручних правок у БД або щоб перевірити/виправити розбіжність за період.
+# На час перерахунку запис у зведення блокується: записи, що вже почалися,
+# встигнуть завершитися, нові почекають - і нічого не загубиться.
+#
+#     python backfill_revenue.py                                  # уся історія
+#     python backfill_revenue.py --from 2024-05-01 --to 2024-05-31
+
+
+async def backfill(database, date_from: Optional[date] = None, date_to: Optional[date] = None) -> int:
+    async with database.transaction():
+        await database.execute("SET LOCAL statement_timeout = 0")
+        await database.execute("LOCK TABLE revenue_rollup IN SHARE ROW EXCLUSIVE MODE")
+        return await rebuild_revenue_rollup(database, date_from, date_to)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Перераховує зведення виручки для /reports")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="перший день (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="останній день включно")
+    args = parser.parse_args()
+
+    from db import configure_database
+    database = configure_database()
+    await database.connect()
+    try:
+        rows = await backfill(database, args.date_from, args.date_to)
+        print(f"revenue rollup rebuilt: {rows} rows")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
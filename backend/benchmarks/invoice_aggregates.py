@@ -0,0 +1,146 @@
+"""
+Бенчмарк: 100k позицій інвойсів у пам'яті - як Pydantic DTO (InvoiceInDB +
+InvoiceItemInDB, як зараз у роутерах) і як агрегати domain.models через
+crud.invoice_aggregates.invoices_from_rows.
+
+Рядки генеруються в пам'яті (без БД), тож міряється лише рядок -> об'єкт:
+час побудови і пам'ять, яку займають готові об'єкти (tracemalloc). Значення
+з рядків (Decimal, datetime) в обох режимах можуть бути спільні з вхідними
+рядками - рахуються лише нові виділення.
+
+    python benchmarks/invoice_aggregates.py --lines 100000 --per-invoice 10
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from crud.invoice_aggregates import invoices_from_rows  # noqa: E402
+from schemas.invoice_items import InvoiceItemInDB  # noqa: E402
+from schemas.invoices import InvoiceInDB  # noqa: E402
+
+
+def make_rows(lines: int, per_invoice: int) -> Tuple[List[dict], List[dict], List[dict]]:
+    """
+    Ті самі дані у двох формах: окремо шапки та позиції (для DTO) і рядки
+    AGGREGATE_QUERY (шапка + позиція).
+    """
+    started = datetime(2024, 1, 1, 9, 0, 0)
+    headers, items, joined = [], [], []
+    for invoice_id in range(1, lines // per_invoice + 1):
+        header = {
+            "id": invoice_id,
+            "customer_id": 1 + invoice_id % 5000,
+            "car_id": 1 + invoice_id % 7000,
+            "worker_id": 1 + invoice_id % 20,
+            "service_id": 1 + invoice_id % 50,
+            "created_by": 1,
+            "total_amount": Decimal(0),
+            "payment_status": ("unpaid", "partial", "paid")[invoice_id % 3],
+            "work_status": "done",
+            "issue_date": started + timedelta(minutes=invoice_id),
+            "due_date": None,
+            "created_at": started + timedelta(minutes=invoice_id),
+            "updated_at": started + timedelta(minutes=invoice_id, seconds=30),
+        }
+        for n in range(per_invoice):
+            line_id = (invoice_id - 1) * per_invoice + n + 1
+            service_id = 1 + line_id % 50
+            quantity = 1 + line_id % 3
+            unit_price = Decimal(f"{10 + line_id % 90}.{line_id % 100:02d}")
+            header["total_amount"] += quantity * unit_price
+            items.append({
+                "id": line_id,
+                "invoice_id": invoice_id,
+                "service_id": service_id,
+                "quantity": quantity,
+                "unit_price": unit_price,
+                "total": quantity * unit_price,
+                "created_at": header["created_at"],
+                "updated_at": header["updated_at"],
+            })
+            joined.append({
+                **{key: header[key] for key in (
+                    "id", "customer_id", "car_id", "worker_id", "payment_status", "work_status", "created_at",
+                )},
+                "line_id": line_id,
+                "line_service_id": service_id,
+                "quantity": quantity,
+                "unit_price": unit_price,
+                # Як з asyncpg: окремий об'єкт str на кожен рядок
+                "service_name": "".join(["Service ", str(service_id)]),
+            })
+        headers.append(header)
+    totals = {header["id"]: header["total_amount"] for header in headers}
+    for row in joined:
+        row["total_amount"] = totals[row["id"]]
+    return headers, items, joined
+
+
+def build_dtos(headers: List[dict], items: List[dict]):
+    return (
+        [InvoiceInDB(**dict(row)) for row in headers],
+        [InvoiceItemInDB(**dict(row)) for row in items],
+    )
+
+
+def build_aggregates(joined: List[dict]):
+    return invoices_from_rows(joined)
+
+
+def measure(build: Callable[[], object], repeat: int) -> Tuple[List[float], int]:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        build()
+        timings.append((time.perf_counter() - started) * 1000)
+    # Пам'ять окремим прогоном: tracemalloc сповільнює побудову
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    retained = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+    del result
+    return timings, retained
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--per-invoice", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    headers, items, joined = make_rows(args.lines, args.per_invoice)
+    aggregates = build_aggregates(joined)
+    assert all(invoice.calculate_total() == invoice.total_amount for invoice in aggregates)
+    assert sum(len(invoice.items) for invoice in aggregates) == len(items)
+
+    print(f"{len(items)} lines in {len(headers)} invoices, {args.repeat} runs")
+    results = {
+        "dto": measure(lambda: build_dtos(headers, items), args.repeat),
+        "domain": measure(lambda: build_aggregates(joined), args.repeat),
+    }
+    for mode, (timings, retained) in results.items():
+        print(
+            f"{mode:>6}: median {statistics.median(timings):7.1f} ms   "
+            f"memory {retained / 2**20:6.1f} MiB ({retained / len(items):5.0f} B/line)"
+        )
+    print(
+        f"domain vs dto: x{statistics.median(results['dto'][0]) / statistics.median(results['domain'][0]):.1f} faster, "
+        f"x{results['dto'][1] / results['domain'][1]:.1f} less memory"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Бенчмарк: затримка інших запитів під час "шторму" логінів.
+
+Запускає N одночасних перевірок bcrypt і паралельно міряє, наскільки
+запізнюється короткий "probe" (аналог /health), який прокидається кожні 10 мс.
+
+    python benchmarks/login_storm.py --logins 40
+
+Режим inline - як було раніше (verify прямо в корутині),
+режим pool - через auth.passwords.password_hasher.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from auth.passwords import pwd_context, password_hasher  # noqa: E402
+
+PROBE_INTERVAL = 0.01
+
+
+async def inline_verify(plain, hashed):
+    return pwd_context.verify(plain, hashed)
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        expected = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - expected) * 1000)
+
+
+async def storm(verify, logins: int, hashed: str):
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(verify("password123", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return elapsed, lags
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash("password123")
+    print(f"{args.logins} concurrent logins, {password_hasher.max_workers} hash workers")
+    print(f"{'mode':<8}{'storm s':>10}{'probe p50 ms':>15}{'probe p99 ms':>15}{'probe max ms':>15}")
+    for mode, verify in (("inline", inline_verify), ("pool", password_hasher.verify)):
+        elapsed, lags = await storm(verify, args.logins, hashed)
+        print(
+            f"{mode:<8}{elapsed:>10.2f}"
+            f"{statistics.median(lags):>15.1f}{percentile(lags, 99):>15.1f}{max(lags):>15.1f}"
+        )
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""
+Бенчмарк: накладні витрати логування запитів на один запит - попередній
+structured_logging_middleware (синхронний OTel LoggingHandler) і
+request_logging.py (черга + ліниве форматування, з семплінгом і без).
+
+Той самий маленький ендпоінт без БД викликається через ASGI без логування і з
+кожним варіантом; накладні витрати = різниця медіан часу запиту. OTel-логи
+йдуть через BatchLogRecordProcessor в експортер, який їх відкидає (як у проді,
+але без мережі).
+
+    python benchmarks/request_logging.py --requests 3000 --sample-rate 0.1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from opentelemetry import trace  # noqa: E402
+from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler  # noqa: E402
+from opentelemetry.sdk._logs.export import BatchLogRecordProcessor, LogRecordExporter, LogRecordExportResult  # noqa: E402
+
+import request_logging  # noqa: E402
+from request_logging import RequestLoggingMiddleware, install_queue_logging  # noqa: E402
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+
+class DiscardingExporter(LogRecordExporter):
+    exported = 0
+
+    def export(self, batch):
+        self.exported += len(batch)
+        return LogRecordExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+    def shutdown(self):
+        pass
+
+
+async def legacy_logging_middleware(request: Request, call_next):
+    # structured_logging_middleware з main.py до request_logging.py
+    start_time = time.time()
+    span = trace.get_current_span()
+    trace_id = span.get_span_context().trace_id
+    span_id = span.get_span_context().span_id
+
+    response = await call_next(request)
+
+    duration = time.time() - start_time
+
+    log_details = {
+        "http.method": request.method,
+        "http.url": str(request.url),
+        "http.status_code": response.status_code,
+        "http.duration_ms": round(duration * 1000, 2),
+        "http.client_ip": request.client.host,
+        "trace_id": format(trace_id, 'x'),
+        "span_id": format(span_id, 'x'),
+    }
+
+    message = f'{request.client.host} - "{request.method} {request.url.path} HTTP/1.1" {response.status_code}'
+
+    if 400 <= response.status_code < 500:
+        logging.warning(message, extra=log_details)
+    elif response.status_code >= 500:
+        logging.error(message, extra=log_details)
+    else:
+        logging.info(message, extra=log_details)
+
+    return response
+
+
+def build_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/cars/{car_id}")
+    async def car(car_id: int):
+        return {"id": car_id, "brand": "Skoda", "model": "Octavia"}
+
+    if isinstance(middleware, type):
+        app.add_middleware(middleware)
+    elif middleware is not None:
+        app.middleware("http")(middleware)
+    return app
+
+
+async def measure(app: FastAPI, requests: int):
+    transport = httpx.ASGITransport(app=app, client=("10.0.0.7", 51234))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(200):  # прогрів
+            await client.get("/cars/1?expand=owner")
+        timings = []
+        for i in range(requests):
+            started = time.perf_counter()
+            await client.get(f"/cars/{i}?expand=owner")
+            timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    exporter = DiscardingExporter()
+    provider = LoggerProvider()
+    provider.add_log_record_processor(BatchLogRecordProcessor(exporter))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # свій лог на кожен запит клієнта
+
+    results = {"no logging": await measure(build_app(), args.requests)}
+
+    otel_handler = LoggingHandler(logger_provider=provider)
+    root.handlers = [otel_handler]
+    results["legacy (sync)"] = await measure(build_app(legacy_logging_middleware), args.requests)
+
+    root.handlers = []
+    listener = install_queue_logging(otel_handler)
+    listener.start()
+    for rate in (1.0, args.sample_rate):
+        request_logging.LOG_SAMPLE_RATE = rate
+        results[f"queue, sample {rate:g}"] = await measure(build_app(RequestLoggingMiddleware), args.requests)
+    listener.stop()
+    provider.shutdown()
+
+    baseline = results["no logging"]
+    print(f"{args.requests} requests per mode, median per request")
+    for mode, median in results.items():
+        overhead = "" if mode == "no logging" else f"   overhead {median - baseline:6.1f} us"
+        print(f"{mode:>18}: {median:7.1f} us{overhead}")
+    print(f"exported log records: {exporter.exported}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
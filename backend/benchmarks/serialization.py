@@ -0,0 +1,109 @@
+"""
+Бенчмарк: відповідь зі списком у 10k рядків - через моделі Pydantic (як було)
+і через serialization.RowSerializer.
+
+Рядки генеруються в пам'яті (без БД), тож міряється лише шлях рядок -> JSON
+разом з FastAPI: обидва ендпоінти мають однаковий response_model.
+
+    python benchmarks/serialization.py --rows 10000 --repeat 20
+
+Режим models - [InvoiceInDB(**dict(row))] + валідація response_model у FastAPI,
+режим fast - RowSerializer.many(). Тіла відповідей мають збігатися побайтно.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Response  # noqa: E402
+
+from schemas.invoices import InvoiceInDB  # noqa: E402
+from serialization import RowSerializer, orjson  # noqa: E402
+
+
+def make_rows(count: int) -> List[dict]:
+    started = datetime(2024, 1, 1, 9, 0, 0)
+    return [
+        {
+            "id": i,
+            "customer_id": 1 + i % 5000,
+            "car_id": 1 + i % 7000,
+            "worker_id": 1 + i % 20,
+            "service_id": 1 + i % 50,
+            "created_by": 1,
+            "total_amount": Decimal(f"{100 + i % 900}.{i % 100:02d}"),
+            "payment_status": ("unpaid", "partial", "paid")[i % 3],
+            "work_status": "done",
+            "issue_date": started + timedelta(minutes=i, microseconds=i % 1000),
+            "due_date": None if i % 4 else started + timedelta(days=14),
+            "created_at": started + timedelta(minutes=i),
+            "updated_at": started + timedelta(minutes=i, seconds=30),
+        }
+        for i in range(count)
+    ]
+
+
+def build_app(rows: List[dict]) -> FastAPI:
+    app = FastAPI()
+    serializer = RowSerializer(InvoiceInDB)
+
+    @app.get("/models", response_model=List[InvoiceInDB])
+    async def models():
+        return [InvoiceInDB(**dict(row)) for row in rows]
+
+    @app.get("/fast", response_model=List[InvoiceInDB])
+    async def fast(response: Response):
+        return serializer.many(response, rows)
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, repeat: int):
+    timings = []
+    body = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get(path)
+        timings.append((time.perf_counter() - started) * 1000)
+        body = response.content
+    return timings, body
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = build_app(make_rows(args.rows))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await measure(client, "/models", 2)  # прогрів
+        await measure(client, "/fast", 2)
+        results = {}
+        for mode in ("models", "fast"):
+            results[mode] = await measure(client, f"/{mode}", args.repeat)
+
+    encoder = "orjson" if orjson is not None else "json (orjson не встановлено)"
+    print(f"{args.rows} rows x {args.repeat} requests, encoder: {encoder}")
+    for mode, (timings, body) in results.items():
+        print(
+            f"{mode:>6}: median {statistics.median(timings):7.1f} ms   "
+            f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:7.1f} ms   {len(body)} bytes"
+        )
+    speedup = statistics.median(results["models"][0]) / statistics.median(results["fast"][0])
+    print(f"speedup: x{speedup:.1f}")
+    assert results["models"][1] == results["fast"][1], "тіла відповідей відрізняються"
+    print("bodies are byte-identical")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
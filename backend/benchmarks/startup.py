@@ -0,0 +1,117 @@
+"""
+Бенчмарк: холодний старт бекенду - від запуску процесу до першого обслуженого
+запиту.
+
+Кожен прогін - новий процес Python:
+- import: `import main` (час самого імпорту, без старту інтерпретатора);
+- first request: uvicorn main:app від запуску процесу до першої відповіді
+  200 на GET /health;
+- ready: від запуску процесу до 200 на GET /ready (пул і кеші прогріті;
+  "-", якщо в дереві ще немає /ready).
+
+Потрібна БД з DATABASE_URL. --backend-dir дозволяє заміряти інший checkout
+(наприклад, `git worktree add /tmp/before <commit>`) тим самим скриптом.
+
+    python benchmarks/startup.py --runs 5 --telemetry-mode otlp
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import main; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(backend_dir: str, env: Dict[str, str]) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=backend_dir, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def wait_for(client: httpx.Client, url: str, started: float, timeout: float) -> Optional[float]:
+    """
+    Мс від started до першої відповіді 200 на url; None - 404 (ендпоінта немає).
+    """
+    while time.perf_counter() - started < timeout:
+        try:
+            status = client.get(url).status_code
+        except httpx.TransportError:
+            status = None
+        if status == 200:
+            return (time.perf_counter() - started) * 1000
+        if status == 404:
+            return None
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def measure_serving(backend_dir: str, env: Dict[str, str], timeout: float):
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            first = wait_for(client, "/health", started, timeout)
+            ready = wait_for(client, "/ready", started, timeout)
+    finally:
+        server.terminate()
+        server.wait()
+    return first, ready
+
+
+def describe(values: List[Optional[float]]) -> str:
+    if any(value is None for value in values):
+        return "      -"
+    return f"{statistics.median(values):7.0f} ms (min {min(values):.0f})"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend-dir", default=BACKEND_DIR)
+    parser.add_argument("--telemetry-mode", default=None, help="TELEMETRY_MODE для процесу (off / memory / otlp)")
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.telemetry_mode:
+        env["TELEMETRY_MODE"] = args.telemetry_mode
+    backend_dir = os.path.abspath(args.backend_dir)
+
+    imports, firsts, readies = [], [], []
+    for _ in range(args.runs):
+        imports.append(measure_import(backend_dir, env))
+        first, ready = measure_serving(backend_dir, env, args.timeout)
+        firsts.append(first)
+        readies.append(ready)
+
+    print(f"{backend_dir}, TELEMETRY_MODE={env.get('TELEMETRY_MODE', 'otlp')}, {args.runs} runs, median")
+    print(f"       import main: {describe(imports)}")
+    print(f"     first request: {describe(firsts)}")
+    print(f"             ready: {describe(readies)}")
+
+
+if __name__ == "__main__":
+    main()
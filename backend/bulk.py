@@ -0,0 +1,106 @@
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+
+# Пакетне створення/оновлення записів (імпорт філії, автопарк клієнта).
+# Тіло - JSON-масив або NDJSON (Content-Type: application/x-ndjson). Рядки
+# валідуються і пишуться частинами по CHUNK_SIZE, один запит до БД на частину.
+# Увесь пакет - одна транзакція: якщо рядків більше за MAX_ROWS (це видно лише
+# посеред потоку NDJSON), 413 відкочує вже записані частини.
+
+CHUNK_SIZE = 1000
+MAX_ROWS = 100_000
+
+
+class RowResult(BaseModel):
+    index: int
+    status: str  # created | updated | error
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    errors: int = 0
+    results: List[RowResult] = []
+
+
+# Записувач частини: отримує [(index, model)] і повертає RowResult на кожен рядок
+ChunkWriter = Callable[[Any, List[Tuple[int, BaseModel]]], Awaitable[List[RowResult]]]
+
+
+async def iter_request_rows(request: Request) -> AsyncIterator[Any]:
+    """
+    Рядки NDJSON повертаються як bytes (розбираються в run_bulk, щоб зламаний
+    рядок став помилкою цього рядка), елементи JSON-масиву - вже розібраними.
+    """
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+
+    try:
+        rows = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid_json")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="expected_json_array")
+    for row in rows:
+        yield row
+
+
+async def run_bulk(request: Request, db, model: Type[BaseModel], writer: ChunkWriter) -> BulkResult:
+    result = BulkResult()
+    chunk: List[Tuple[int, BaseModel]] = []
+    index = 0
+
+    async def flush():
+        if chunk:
+            _collect(result, await writer(db, chunk))
+            chunk.clear()
+
+    async with db.transaction():
+        async for raw in iter_request_rows(request):
+            if index >= MAX_ROWS:
+                raise HTTPException(status_code=413, detail="too_many_rows")
+            try:
+                if isinstance(raw, bytes):
+                    raw = json.loads(raw)
+                chunk.append((index, model.model_validate(raw)))
+            except ValidationError as e:
+                _collect(result, [RowResult(index=index, status="error", error=_validation_message(e))])
+            except ValueError:
+                _collect(result, [RowResult(index=index, status="error", error="invalid_json")])
+            index += 1
+            if len(chunk) >= CHUNK_SIZE:
+                await flush()
+        await flush()
+    result.results.sort(key=lambda r: r.index)
+    return result
+
+
+def _collect(result: BulkResult, rows: List[RowResult]):
+    for row in rows:
+        if row.status == "created":
+            result.created += 1
+        elif row.status == "updated":
+            result.updated += 1
+        else:
+            result.errors += 1
+        result.results.append(row)
+
+
+def _validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
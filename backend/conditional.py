@@ -0,0 +1,147 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel
+
+# Умовні запити на основі updated_at.
+#
+# Сутність: ETag W/"<id>-<updated_at у мкс>", Last-Modified = updated_at.
+# Список: ETag W/"<кількість>-<max(updated_at) у мкс>-<хеш пар (id, updated_at)>".
+# Хеш потрібен, бо кількість і максимум не помічають заміни рядка: після
+# видалення з повної сторінки на його місце стає наступний, і якщо той не
+# новіший за решту, обидва числа ті самі. If-None-Match має пріоритет над
+# If-Modified-Since (видалення не змінює max(updated_at), а ETag - змінює).
+#
+# If-Match на PUT/PATCH: з ETag сутності відновлюється updated_at, і оновлення
+# виконується лише якщо рядок не змінився (умова в самому UPDATE, без гонки).
+# ETag-и слабкі, тож If-Match порівнює їх слабко - на відміну від RFC 9110,
+# але інакше If-Match з нашими ETag-ами ніколи б не спрацював.
+
+CACHE_CONTROL = "no-cache"  # браузер кешує, але щоразу ревалідує
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+Validators = Tuple[str, Optional[datetime]]
+
+
+def weak_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return (tag[2:] if tag.startswith("W/") else tag).strip('"')
+
+
+def _field(item: Any, name: str):
+    return getattr(item, name) if isinstance(item, BaseModel) else item[name]
+
+
+def version_stamp(updated_at: datetime) -> int:
+    # updated_at - TIMESTAMP без часового поясу, рахуємо від наївної епохи
+    return (updated_at.replace(tzinfo=None) - EPOCH) // MICROSECOND
+
+
+def entity_validators(item: Any) -> Validators:
+    """
+    ETag і Last-Modified для одного рядка (запис БД або Pydantic-модель).
+    """
+    updated_at = _field(item, "updated_at")
+    return weak_etag(_field(item, "id"), version_stamp(updated_at)), updated_at
+
+
+def list_validators(items: Iterable[Any]) -> Validators:
+    digest = hashlib.blake2b(digest_size=8)
+    count, last = 0, None
+    for item in items:
+        updated_at = _field(item, "updated_at")
+        digest.update(f"{_field(item, 'id')}:{version_stamp(updated_at)};".encode())
+        count += 1
+        last = updated_at if last is None else max(last, updated_at)
+    return weak_etag(count, version_stamp(last) if last else 0, digest.hexdigest()), last
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Слабке порівняння If-None-Match з поточним ETag (RFC 9110, 13.1.2).
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+
+def _not_modified_since(request: Request, last_modified: Optional[datetime]) -> bool:
+    header = request.headers.get("if-modified-since")
+    if not header or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP-дата має точність до секунди
+    return last_modified.replace(microsecond=0) <= since
+
+
+def set_etag(response: Response, etag: str, last_modified: Optional[datetime] = None):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag, last_modified)
+    return response
+
+
+def conditional_get(request: Request, response: Response, validators: Validators) -> Optional[Response]:
+    """
+    Повертає 304, якщо копія клієнта актуальна; інакше ставить ETag і
+    Last-Modified у response і повертає None.
+    """
+    etag, last_modified = validators
+    if request.headers.get("if-none-match") is not None:
+        fresh = etag_matches(request, etag)
+    else:
+        fresh = _not_modified_since(request, last_modified)
+    if fresh:
+        return not_modified(etag, last_modified)
+    set_etag(response, etag, last_modified)
+    return None
+
+
+def if_match_versions(request: Request, entity_id: int) -> Optional[List[datetime]]:
+    """
+    updated_at, які клієнт вважає поточними (з If-Match). None - заголовка
+    немає або він "*". Порожній список - жоден ETag не стосується цієї сутності.
+    """
+    header = request.headers.get("if-match")
+    if not header or header.strip() == "*":
+        return None
+    versions = []
+    for tag in header.split(","):
+        tag_id, _, stamp = _opaque(tag).partition("-")
+        if tag_id == str(entity_id) and stamp.isdigit():
+            versions.append(EPOCH + int(stamp) * MICROSECOND)
+    return versions
+
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(status_code=412, detail="precondition_failed")
@@ -1,37 +1,86 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
+from asyncpg.exceptions import UniqueViolationError
+from fastapi import HTTPException
 from schemas.cars import CarCreate, CarUpdate, CarInDB
 from sqlalchemy.ext.asyncio import AsyncConnection
+from pagination import DEFAULT_PAGE_SIZE
+from bulk import RowResult
+from crud.revenue import APPLY_DELTAS, DELTA_COLUMNS, removed_invoices_deltas
 
-async def get_car_by_id(db: AsyncConnection, car_id: int) -> Optional[CarInDB]:
+async def get_car_row(db: AsyncConnection, car_id: int):
     query = "SELECT * FROM cars WHERE id = :id"
-    row = await db.fetch_one(query, {"id": car_id})
+    return await db.fetch_one(query, {"id": car_id})
+
+async def get_car_by_id(db: AsyncConnection, car_id: int) -> Optional[CarInDB]:
+    row = await get_car_row(db, car_id)
     return CarInDB(**dict(row)) if row else None
 
-async def get_all_cars(db: AsyncConnection, customer_id: Optional[int] = None) -> List[CarInDB]:
+async def get_car_rows(
+    db: AsyncConnection,
+    customer_id: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after_id: Optional[int] = None,
+):
     """
-    Отримує список машин. Якщо вказано customer_id, фільтрує за ним.
+    Отримує сторінку машин (keyset по id). Якщо вказано customer_id, фільтрує за ним.
     """
+    conditions = []
+    params = {"limit": limit}
     if customer_id:
-        query = "SELECT * FROM cars WHERE customer_id = :customer_id ORDER BY id"
-        rows = await db.fetch_all(query, {"customer_id": customer_id})
-    else:
-        query = "SELECT * FROM cars ORDER BY id"
-        rows = await db.fetch_all(query)
-        
+        conditions.append("customer_id = :customer_id")
+        params["customer_id"] = customer_id
+    if after_id is not None:
+        conditions.append("id > :after_id")
+        params["after_id"] = after_id
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT * FROM cars {where} ORDER BY id LIMIT :limit"
+    return await db.fetch_all(query, params)
+
+async def get_all_cars(
+    db: AsyncConnection,
+    customer_id: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after_id: Optional[int] = None,
+) -> List[CarInDB]:
+    rows = await get_car_rows(db, customer_id, limit, after_id)
     return [CarInDB(**dict(row)) for row in rows]
 
 async def create_car(db: AsyncConnection, car: CarCreate) -> CarInDB:
     query = "INSERT INTO cars (customer_id, brand, model, year, vin) VALUES (:customer_id, :brand, :model, :year, :vin) RETURNING *"
-    row = await db.fetch_one(query, car.model_dump())
+    try:
+        row = await db.fetch_one(query, car.model_dump())
+    except UniqueViolationError:
+        # idx_cars_vin унікальний - VIN уже належить іншій машині
+        raise HTTPException(status_code=409, detail="duplicate_vin")
     return CarInDB(**dict(row))
 
-async def update_car(db: AsyncConnection, car_id: int, car: CarUpdate) -> Optional[CarInDB]:
-    query = "UPDATE cars SET customer_id = :customer_id, brand = :brand, model = :model, year = :year, vin = :vin, updated_at = CURRENT_TIMESTAMP WHERE id = :id RETURNING *"
-    row = await db.fetch_one(query, {**car.model_dump(), "id": car_id})
+async def update_car(
+    db: AsyncConnection, car_id: int, car: CarUpdate, if_updated_at: Optional[List[datetime]] = None
+) -> Optional[CarInDB]:
+    """
+    if_updated_at (з If-Match) - оновити лише незмінений з того часу рядок.
+    """
+    params = {**car.model_dump(), "id": car_id}
+    condition = ""
+    if if_updated_at is not None:
+        condition = "AND updated_at = ANY(:if_updated_at)"
+        params["if_updated_at"] = if_updated_at
+    query = f"UPDATE cars SET customer_id = :customer_id, brand = :brand, model = :model, year = :year, vin = :vin, updated_at = CURRENT_TIMESTAMP WHERE id = :id {condition} RETURNING *"
+    try:
+        row = await db.fetch_one(query, params)
+    except UniqueViolationError:
+        raise HTTPException(status_code=409, detail="duplicate_vin")
     return CarInDB(**dict(row)) if row else None
 
 async def delete_car(db: AsyncConnection, car_id: int) -> bool:
-    query = "DELETE FROM cars WHERE id = :id"
+    # Каскадом зникають інвойси авто - їх віднімаємо зі зведення виручки
+    query = f"""
+        WITH invoice AS (SELECT * FROM invoices WHERE car_id = :id),
+        {DELTA_COLUMNS} AS ({removed_invoices_deltas("invoice")}),
+        {APPLY_DELTAS}
+        DELETE FROM cars WHERE id = :id
+    """
     await db.execute(query, {"id": car_id})
     return True
 
@@ -41,3 +90,58 @@ async def get_car_by_vin(db: AsyncConnection, vin: str):
     if row:
         return CarInDB(**dict(row))
     return None
+
+async def bulk_upsert_cars(db: AsyncConnection, rows: List[Tuple[int, CarCreate]]) -> List[RowResult]:
+    """
+    Вставляє або оновлює частину машин одним запитом; VIN - природний ключ.
+    Машини без VIN завжди вставляються.
+    """
+    results = []
+    customer_ids = list({car.customer_id for _, car in rows})
+    existing = await db.fetch_all("SELECT id FROM customers WHERE id = ANY(:ids)", {"ids": customer_ids})
+    existing = {row["id"] for row in existing}
+
+    accepted = []
+    seen_vins = set()
+    for index, car in rows:
+        if car.customer_id not in existing:
+            results.append(RowResult(index=index, status="error", error="customer_not_found"))
+        elif car.vin is not None and car.vin in seen_vins:
+            # ON CONFLICT не може змінити той самий рядок двічі в одному запиті
+            results.append(RowResult(index=index, status="error", error="duplicate_vin_in_request"))
+        else:
+            if car.vin is not None:
+                seen_vins.add(car.vin)
+            accepted.append((index, car))
+    if not accepted:
+        return results
+
+    query = """
+        INSERT INTO cars (customer_id, brand, model, year, vin)
+        SELECT customer_id, brand, model, year, vin
+        FROM unnest(
+            CAST(:customer_id AS INTEGER[]), CAST(:brand AS TEXT[]), CAST(:model AS TEXT[]),
+            CAST(:year AS INTEGER[]), CAST(:vin AS TEXT[])
+        ) WITH ORDINALITY AS t(customer_id, brand, model, year, vin, ord)
+        ORDER BY ord
+        ON CONFLICT (vin) DO UPDATE
+            SET customer_id = EXCLUDED.customer_id,
+                brand = EXCLUDED.brand,
+                model = EXCLUDED.model,
+                year = EXCLUDED.year,
+                updated_at = CURRENT_TIMESTAMP
+        RETURNING id, vin, (xmax = 0) AS inserted
+    """
+    models = [car for _, car in accepted]
+    params = {field: [getattr(m, field) for m in models] for field in ("customer_id", "brand", "model", "year", "vin")}
+    returned = await db.fetch_all(query, params)
+
+    # Оновлені рядки знаходимо за VIN, вставлені - за порядком id з послідовності
+    updated = {row["vin"]: row["id"] for row in returned if not row["inserted"]}
+    inserted_ids = iter(sorted(row["id"] for row in returned if row["inserted"]))
+    for index, car in accepted:
+        if car.vin is not None and car.vin in updated:
+            results.append(RowResult(index=index, status="updated", id=updated[car.vin]))
+        else:
+            results.append(RowResult(index=index, status="created", id=next(inserted_ids)))
+    return results
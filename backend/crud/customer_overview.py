@@ -0,0 +1,82 @@
+from collections import defaultdict
+from typing import Dict, List
+from schemas.cars import CarInDB
+from schemas.customers import CustomerInDB, CustomerOverview
+from schemas.invoice_items import InvoiceItemInDB
+from schemas.invoices import InvoiceWithItems
+from schemas.service_records import ServiceRecordInDB
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+RECENT_SERVICE_RECORDS = 10
+
+
+async def load_customer_overviews(
+    db: AsyncConnection, customer_ids: List[int], recent_records: int = RECENT_SERVICE_RECORDS
+) -> Dict[int, CustomerOverview]:
+    """
+    Завантажує "customer 360" для набору клієнтів пакетно: по одному запиту
+    WHERE ... = ANY(:ids) на кожне відношення, незалежно від кількості
+    авто чи інвойсів (5 запитів на будь-яку кількість клієнтів).
+    """
+    ids = list(dict.fromkeys(customer_ids))
+    customer_rows = await db.fetch_all(
+        """
+        SELECT id, first_name, last_name, phone, email, address, created_at, updated_at
+        FROM customers
+        WHERE id = ANY(:ids)
+        """,
+        {"ids": ids},
+    )
+    if not customer_rows:
+        return {}
+    ids = [row["id"] for row in customer_rows]
+
+    car_rows = await db.fetch_all(
+        "SELECT * FROM cars WHERE customer_id = ANY(:ids) ORDER BY id",
+        {"ids": ids},
+    )
+    invoice_rows = await db.fetch_all(
+        "SELECT * FROM invoices WHERE customer_id = ANY(:ids) ORDER BY id",
+        {"ids": ids},
+    )
+    invoice_ids = [row["id"] for row in invoice_rows]
+    item_rows = await db.fetch_all(
+        "SELECT * FROM invoice_items WHERE invoice_id = ANY(:ids) ORDER BY id",
+        {"ids": invoice_ids},
+    ) if invoice_ids else []
+    record_rows = await db.fetch_all(
+        """
+        SELECT customer_id, id, car_id, service_id, performed_by, date, mileage, notes,
+               invoice_id, created_at, updated_at
+        FROM (
+            SELECT c.customer_id, sr.*,
+                   ROW_NUMBER() OVER (PARTITION BY c.customer_id ORDER BY sr.date DESC, sr.id DESC) AS rn
+            FROM service_records sr
+            JOIN cars c ON c.id = sr.car_id
+            WHERE c.customer_id = ANY(:ids)
+        ) ranked
+        WHERE rn <= :recent
+        ORDER BY customer_id, date DESC, id DESC
+        """,
+        {"ids": ids, "recent": recent_records},
+    )
+
+    items_by_invoice = defaultdict(list)
+    for row in item_rows:
+        items_by_invoice[row["invoice_id"]].append(InvoiceItemInDB(**dict(row)))
+
+    overviews = {
+        row["id"]: CustomerOverview(customer=CustomerInDB(**dict(row)))
+        for row in customer_rows
+    }
+    for row in car_rows:
+        overviews[row["customer_id"]].cars.append(CarInDB(**dict(row)))
+    for row in invoice_rows:
+        overviews[row["customer_id"]].invoices.append(
+            InvoiceWithItems(**dict(row), items=items_by_invoice.get(row["id"], []))
+        )
+    for row in record_rows:
+        record = dict(row)
+        customer_id = record.pop("customer_id")
+        overviews[customer_id].recent_service_records.append(ServiceRecordInDB(**record))
+    return overviews
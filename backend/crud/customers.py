@@ -1,23 +1,45 @@
 from schemas.customers import CustomerCreate, CustomerUpdate, CustomerInDB
 from sqlalchemy.ext.asyncio import AsyncConnection
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
+from pagination import DEFAULT_PAGE_SIZE
+from bulk import RowResult
+from crud.revenue import APPLY_DELTAS, DELTA_COLUMNS, removed_invoices_deltas
 
-async def get_all_customers(db: AsyncConnection) -> List[CustomerInDB]:
-    query = """
+async def get_customer_rows(db: AsyncConnection, limit: int = DEFAULT_PAGE_SIZE, after_id: Optional[int] = None):
+    """
+    Повертає одну сторінку клієнтів (keyset по id) - записи БД без конвертації.
+    """
+    params = {"limit": limit}
+    where = ""
+    if after_id is not None:
+        where = "WHERE id > :after_id"
+        params["after_id"] = after_id
+    query = f"""
         SELECT id, first_name, last_name, phone, email, address, created_at, updated_at
         FROM customers
-        ORDER BY id;
+        {where}
+        ORDER BY id
+        LIMIT :limit;
     """
-    rows = await db.fetch_all(query)
+    return await db.fetch_all(query, params)
+
+async def get_all_customers(
+    db: AsyncConnection, limit: int = DEFAULT_PAGE_SIZE, after_id: Optional[int] = None
+) -> List[CustomerInDB]:
+    rows = await get_customer_rows(db, limit, after_id)
     return [CustomerInDB(**dict(row)) for row in rows]
 
-async def get_customer_by_id(db: AsyncConnection, customer_id: int) -> Optional[CustomerInDB]:
+async def get_customer_row(db: AsyncConnection, customer_id: int):
     query = """
         SELECT id, first_name, last_name, phone, email, address, created_at, updated_at
         FROM customers
         WHERE id = :id;
     """
-    row = await db.fetch_one(query, {"id": customer_id})
+    return await db.fetch_one(query, {"id": customer_id})
+
+async def get_customer_by_id(db: AsyncConnection, customer_id: int) -> Optional[CustomerInDB]:
+    row = await get_customer_row(db, customer_id)
     if row:
         return CustomerInDB(**dict(row))
     return None
@@ -31,39 +53,82 @@ async def create_customer(db: AsyncConnection, customer: CustomerCreate) -> Cust
     row = await db.fetch_one(query, customer.dict())
     return CustomerInDB(**dict(row))
 
-async def update_customer_in_db(db: AsyncConnection, customer_id: int, customer_update: CustomerUpdate):
-    query = """
+async def update_customer_in_db(
+    db: AsyncConnection,
+    customer_id: int,
+    customer_update: CustomerUpdate,
+    if_updated_at: Optional[List[datetime]] = None,
+):
+    """
+    Оновлює клієнта. if_updated_at (з If-Match) - оновити лише якщо рядок
+    не змінювався з того часу; інакше повертає None.
+    """
+    condition = ""
+    params = {}
+    if if_updated_at is not None:
+        condition = "AND updated_at = ANY(:if_updated_at)"
+        params["if_updated_at"] = if_updated_at
+    query = f"""
         UPDATE customers
         SET first_name = :first_name,
             last_name = :last_name,
             phone = :phone,
             email = :email,
-            address = :address
-        WHERE id = :id
+            address = :address,
+            updated_at = now()
+        WHERE id = :id {condition}
         RETURNING id, first_name, last_name, phone, email, address, created_at, updated_at
     """
-    params = {
+    params.update({
         "id": customer_id,
         "first_name": customer_update.first_name,
         "last_name": customer_update.last_name,
         "phone": customer_update.phone,
         "email": customer_update.email,
         "address": customer_update.address,
-    }
+    })
     row = await db.fetch_one(query, params)
     if row:
         return CustomerInDB(**dict(row))
     return None
 
 async def delete_customer_in_db(db: AsyncConnection, customer_id: int) -> bool:
-    result = await db.execute(
-        """
+    # Каскадом зникають інвойси клієнта та його авто - їх віднімаємо зі зведення виручки
+    row = await db.fetch_one(
+        f"""
+        WITH invoice AS (
+            SELECT * FROM invoices WHERE customer_id = :id
+            UNION
+            SELECT invoices.* FROM cars JOIN invoices ON invoices.car_id = cars.id WHERE cars.customer_id = :id
+        ),
+        {DELTA_COLUMNS} AS ({removed_invoices_deltas("invoice")}),
+        {APPLY_DELTAS}
         DELETE FROM customers
         WHERE id = :id
         RETURNING id;
         """,
         {"id": customer_id}
     )
-    row = result.fetchone()
     return row is not None
 
+async def bulk_create_customers(db: AsyncConnection, rows: List[Tuple[int, CustomerCreate]]) -> List[RowResult]:
+    """
+    Вставляє частину клієнтів одним INSERT ... SELECT FROM unnest(...).
+    id з послідовності видаються в порядку вставки, тож відсортовані id
+    відповідають порядку вхідних рядків.
+    """
+    query = """
+        INSERT INTO customers (first_name, last_name, phone, email, address)
+        SELECT first_name, last_name, phone, email, address
+        FROM unnest(
+            CAST(:first_name AS TEXT[]), CAST(:last_name AS TEXT[]), CAST(:phone AS TEXT[]),
+            CAST(:email AS TEXT[]), CAST(:address AS TEXT[])
+        ) WITH ORDINALITY AS t(first_name, last_name, phone, email, address, ord)
+        ORDER BY ord
+        RETURNING id
+    """
+    models = [model for _, model in rows]
+    params = {field: [getattr(m, field) for m in models] for field in ("first_name", "last_name", "phone", "email", "address")}
+    result = await db.fetch_all(query, params)
+    ids = sorted(row["id"] for row in result)
+    return [RowResult(index=index, status="created", id=new_id) for (index, _), new_id in zip(rows, ids)]
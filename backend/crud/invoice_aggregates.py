@@ -0,0 +1,75 @@
+from typing import Dict, Iterable, List, Optional
+
+from domain.models import Invoice, InvoiceLine, InvoiceStatus
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Репозиторій агрегату Invoice: шапка інвойсу разом з позиціями одним запитом
+# (рядок на позицію) у доменні об'єкти domain.models. Позиції кожного інвойсу
+# беруться LATERAL-підзапитом по idx_invoice_items_invoice_id (ORDER BY у ньому
+# не дає планувальнику розгорнути його в hash join) - пакет із сотень інвойсів
+# не переходить на повний перегляд invoice_items. Позиції йдуть одразу за своєю
+# шапкою (ORDER BY i.id, it.id), тож збираються одним проходом.
+
+AGGREGATE_QUERY = """
+    SELECT i.id, i.customer_id, i.car_id, i.worker_id, i.total_amount, i.payment_status,
+           i.work_status, i.created_at,
+           it.id AS line_id, it.service_id AS line_service_id, it.quantity, it.unit_price,
+           s.name AS service_name
+    FROM invoices i
+    LEFT JOIN LATERAL (
+        SELECT id, service_id, quantity, unit_price FROM invoice_items WHERE invoice_id = i.id ORDER BY id
+    ) it ON true
+    LEFT JOIN services s ON s.id = it.service_id
+    WHERE i.id = ANY(:ids)
+    ORDER BY i.id, it.id
+"""
+
+
+def invoices_from_rows(rows: Iterable) -> List[Invoice]:
+    """
+    Рядки AGGREGATE_QUERY -> агрегати. Однакові назви послуг - один рядок str
+    на всі позиції, а не копія на кожну.
+    """
+    invoices: List[Invoice] = []
+    names: Dict[str, str] = {}
+    invoice = None
+    for row in rows:
+        if invoice is None or invoice.id != row["id"]:
+            invoice = Invoice(
+                id=row["id"],
+                customer_id=row["customer_id"],
+                items=[],
+                # Збережений інвойс уже виставлено; оплачений - PAID
+                status=InvoiceStatus.PAID if row["payment_status"] == "paid" else InvoiceStatus.ISSUED,
+                created_at=row["created_at"],
+                car_id=row["car_id"],
+                worker_id=row["worker_id"],
+                total_amount=row["total_amount"],
+                payment_status=row["payment_status"],
+                work_status=row["work_status"],
+            )
+            invoices.append(invoice)
+        if row["line_id"] is not None:
+            name = row["service_name"] or ""
+            invoice.items.append(InvoiceLine(
+                service_name=names.setdefault(name, name),
+                quantity=row["quantity"],
+                unit_price=row["unit_price"],
+                service_id=row["line_service_id"],
+                id=row["line_id"],
+            ))
+    return invoices
+
+
+async def load_invoices(db: AsyncConnection, invoice_ids: List[int]) -> List[Invoice]:
+    """
+    Агрегати для invoice_ids одним запитом, за зростанням id; відсутні id пропускаються.
+    """
+    if not invoice_ids:
+        return []
+    return invoices_from_rows(await db.fetch_all(AGGREGATE_QUERY, {"ids": list(invoice_ids)}))
+
+
+async def load_invoice(db: AsyncConnection, invoice_id: int) -> Optional[Invoice]:
+    invoices = await load_invoices(db, [invoice_id])
+    return invoices[0] if invoices else None
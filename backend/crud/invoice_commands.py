@@ -0,0 +1,187 @@
+import json
+from decimal import Decimal
+from typing import List, Optional
+
+from fastapi import HTTPException
+from crud.revenue import APPLY_DELTAS, DELTA_COLUMNS, invoice_deltas, item_deltas
+from schemas.invoice_items import InvoiceItemInDB
+from schemas.invoices import InvoiceLine, InvoiceWithItems, InvoiceWithItemsCreate
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Команди над інвойсом, кожна - один SQL-оператор (CTE з INSERT/UPDATE).
+# Оператор атомарний сам по собі: або записується все (інвойс, позиції,
+# прив'язка записів), або нічого. Перевірки (послуги існують, записи вільні)
+# стоять в умові першої вставки - якщо вони не пройшли, решта CTE не має з чим
+# працювати і нічого не пише. Записи обслуговування блокуються FOR UPDATE, тож
+# дві паралельні команди не прив'яжуть один запис до двох інвойсів.
+
+# Позиції: ціна з запиту або з каталогу, порядок - як у запиті
+LINES_CTE = """
+    lines AS (
+        SELECT l.ord, l.service_id, l.quantity, COALESCE(l.unit_price, s.price) AS unit_price
+        FROM unnest(
+            CAST(:service_ids AS int[]), CAST(:quantities AS int[]), CAST(:unit_prices AS numeric[])
+        ) WITH ORDINALITY AS l(service_id, quantity, unit_price, ord)
+        JOIN services s ON s.id = l.service_id
+    )
+"""
+
+
+def _line_params(lines: List[InvoiceLine]) -> dict:
+    return {
+        "service_ids": [line.service_id for line in lines],
+        "quantities": [line.quantity for line in lines],
+        "unit_prices": [line.unit_price for line in lines],
+        "line_count": len(lines),
+    }
+
+
+def _items(value) -> List[InvoiceItemInDB]:
+    # json_agg віддає NUMERIC числом - parse_float зберігає точність (40.50, а не 40.5)
+    rows = json.loads(value, parse_float=Decimal) if value else []
+    return [InvoiceItemInDB(**row) for row in rows]
+
+
+async def create_invoice_with_items(
+    db: AsyncConnection, command: InvoiceWithItemsCreate, created_by: Optional[int] = None
+) -> InvoiceWithItems:
+    """
+    Створює інвойс з позиціями і прив'язує записи обслуговування - одним оператором.
+    """
+    record_ids = list(dict.fromkeys(command.service_record_ids))
+    query = f"""
+        WITH {LINES_CTE},
+        records AS (
+            SELECT id FROM service_records
+            WHERE id = ANY(:record_ids) AND car_id = :car_id AND invoice_id IS NULL
+            FOR UPDATE
+        ),
+        invoice AS (
+            INSERT INTO invoices (customer_id, car_id, worker_id, service_id, created_by,
+                                  total_amount, payment_status, work_status)
+            SELECT :customer_id, :car_id, :worker_id,
+                   (SELECT service_id FROM lines ORDER BY ord LIMIT 1), :created_by,
+                   sum(quantity * unit_price), CAST(:payment_status AS payment_status_enum), :work_status
+            FROM lines
+            HAVING count(*) = :line_count AND (SELECT count(*) FROM records) = :record_count
+            RETURNING *
+        ),
+        items AS (
+            INSERT INTO invoice_items (invoice_id, service_id, quantity, unit_price)
+            SELECT invoice.id, lines.service_id, lines.quantity, lines.unit_price
+            FROM invoice, lines
+            ORDER BY lines.ord
+            RETURNING *
+        ),
+        linked AS (
+            UPDATE service_records SET invoice_id = invoice.id, updated_at = now()
+            FROM invoice
+            WHERE service_records.id IN (SELECT id FROM records)
+            RETURNING service_records.id
+        ),
+        {DELTA_COLUMNS} AS ({invoice_deltas("invoice")} UNION ALL {item_deltas("items", "invoice")}),
+        {APPLY_DELTAS}
+        SELECT (SELECT count(*) FROM lines) AS services_found,
+               (SELECT count(*) FROM records) AS records_found,
+               invoice.*,
+               (SELECT json_agg(items ORDER BY items.id) FROM items) AS items,
+               (SELECT count(*) FROM linked) AS linked
+        FROM (SELECT 1) AS one
+        LEFT JOIN invoice ON true
+    """
+    params = {
+        **_line_params(command.items),
+        "customer_id": command.customer_id,
+        "car_id": command.car_id,
+        "worker_id": command.worker_id,
+        "created_by": created_by,
+        "payment_status": command.payment_status,
+        "work_status": command.work_status,
+        "record_ids": record_ids,
+        "record_count": len(record_ids),
+    }
+    row = await db.fetch_one(query, params)
+    if row["id"] is None:
+        if row["services_found"] != len(command.items):
+            raise HTTPException(status_code=422, detail="unknown_service")
+        raise HTTPException(status_code=409, detail="service_record_unavailable")
+    invoice = {k: v for k, v in dict(row).items() if k not in ("services_found", "records_found", "items", "linked")}
+    return InvoiceWithItems(**invoice, items=_items(row["items"]))
+
+
+async def add_invoice_items(db: AsyncConnection, invoice_id: int, lines: List[InvoiceLine]) -> Optional[List[InvoiceItemInDB]]:
+    """
+    Додає пакет позицій до інвойсу і збільшує total_amount на їхню суму - одним
+    оператором. None - інвойсу немає.
+    """
+    query = f"""
+        WITH {LINES_CTE},
+        invoice AS (
+            UPDATE invoices
+            SET total_amount = total_amount + (SELECT sum(quantity * unit_price) FROM lines),
+                updated_at = now()
+            WHERE id = :invoice_id AND (SELECT count(*) FROM lines) = :line_count
+            RETURNING id, worker_id, issue_date
+        ),
+        items AS (
+            INSERT INTO invoice_items (invoice_id, service_id, quantity, unit_price)
+            SELECT invoice.id, lines.service_id, lines.quantity, lines.unit_price
+            FROM invoice, lines
+            ORDER BY lines.ord
+            RETURNING *
+        ),
+        -- Інвойс той самий (units 0), зростає лише його сума
+        {DELTA_COLUMNS} AS (
+            SELECT 'worker', CAST(issue_date AS date), COALESCE(worker_id, 0),
+                   (SELECT sum(quantity * unit_price) FROM lines), 0
+            FROM invoice
+            UNION ALL {item_deltas("items", "invoice")}
+        ),
+        {APPLY_DELTAS}
+        SELECT (SELECT count(*) FROM lines) AS services_found,
+               (SELECT count(*) FROM invoice) AS invoices_found,
+               (SELECT json_agg(items ORDER BY items.id) FROM items) AS items
+    """
+    row = await db.fetch_one(query, {**_line_params(lines), "invoice_id": invoice_id})
+    if row["services_found"] != len(lines):
+        raise HTTPException(status_code=422, detail="unknown_service")
+    if not row["invoices_found"]:
+        return None
+    return _items(row["items"])
+
+
+async def invoice_service_record(db: AsyncConnection, record_id: int) -> Optional[int]:
+    """
+    Виставляє інвойс за одним записом обслуговування (клієнт - власник авто,
+    позиція - послуга запису за ціною каталогу) і прив'язує запис. Повертає id
+    інвойсу або None, якщо запис не знайдено, він уже має інвойс чи немає авто/послуги.
+    """
+    query = f"""
+        WITH record AS (
+            SELECT r.id, r.car_id, r.service_id, r.performed_by, c.customer_id, s.price
+            FROM service_records r
+            JOIN cars c ON c.id = r.car_id
+            JOIN services s ON s.id = r.service_id
+            WHERE r.id = :record_id AND r.invoice_id IS NULL
+            FOR UPDATE OF r
+        ),
+        invoice AS (
+            INSERT INTO invoices (customer_id, car_id, worker_id, service_id, total_amount)
+            SELECT customer_id, car_id, performed_by, service_id, price FROM record
+            RETURNING id, worker_id, service_id, total_amount, issue_date
+        ),
+        item AS (
+            INSERT INTO invoice_items (invoice_id, service_id, quantity, unit_price)
+            SELECT id, service_id, 1, total_amount FROM invoice
+            RETURNING *
+        ),
+        linked AS (
+            UPDATE service_records SET invoice_id = invoice.id, updated_at = now()
+            FROM invoice
+            WHERE service_records.id = :record_id
+        ),
+        {DELTA_COLUMNS} AS ({invoice_deltas("invoice")} UNION ALL {item_deltas("item", "invoice")}),
+        {APPLY_DELTAS}
+        SELECT id FROM invoice
+    """
+    return await db.fetch_val(query, {"record_id": record_id})
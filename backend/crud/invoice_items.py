@@ -1,49 +1,84 @@
 from schemas.invoice_items import InvoiceItemCreate, InvoiceItemUpdate, InvoiceItemInDB
-from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncConnection
+from datetime import datetime
 from typing import List, Optional
+from crud.revenue import APPLY_DELTAS, DELTA_COLUMNS, item_deltas
 
 async def create_invoice_item(db: AsyncConnection, item: InvoiceItemCreate) -> InvoiceItemInDB:
-    query = text("""
-        INSERT INTO invoice_items (invoice_id, service_id, quantity, unit_price, total)
-        VALUES (:invoice_id, :service_id, :quantity, :unit_price, :total)
-        RETURNING *
-    """)
-    result = await db.execute(query, item.dict())
-    row = result.fetchone()
+    # total - згенерована колонка (quantity * unit_price), її не передаємо
+    query = f"""
+        WITH item AS (
+            INSERT INTO invoice_items (invoice_id, service_id, quantity, unit_price)
+            VALUES (:invoice_id, :service_id, :quantity, :unit_price)
+            RETURNING *
+        ),
+        {DELTA_COLUMNS} AS ({item_deltas("item")}),
+        {APPLY_DELTAS}
+        SELECT * FROM item
+    """
+    row = await db.fetch_one(query, item.model_dump(exclude={"total"}))
     return InvoiceItemInDB(**dict(row))
 
+async def get_invoice_item_row(db: AsyncConnection, item_id: int):
+    query = "SELECT * FROM invoice_items WHERE id = :id"
+    return await db.fetch_one(query, {"id": item_id})
+
 async def get_invoice_item_by_id(db: AsyncConnection, item_id: int) -> Optional[InvoiceItemInDB]:
-    query = text("SELECT * FROM invoice_items WHERE id = :id")
-    result = await db.execute(query, {"id": item_id})
-    row = result.fetchone()
+    row = await get_invoice_item_row(db, item_id)
     if row:
         return InvoiceItemInDB(**dict(row))
     return None
 
+async def get_item_rows_by_invoice(db: AsyncConnection, invoice_id: int):
+    query = "SELECT * FROM invoice_items WHERE invoice_id = :invoice_id ORDER BY id"
+    return await db.fetch_all(query, {"invoice_id": invoice_id})
+
 async def get_items_by_invoice(db: AsyncConnection, invoice_id: int) -> List[InvoiceItemInDB]:
-    query = text("SELECT * FROM invoice_items WHERE invoice_id = :invoice_id")
-    result = await db.execute(query, {"invoice_id": invoice_id})
-    rows = result.fetchall()
+    rows = await get_item_rows_by_invoice(db, invoice_id)
     return [InvoiceItemInDB(**dict(row)) for row in rows]
 
-async def update_invoice_item(db: AsyncConnection, item_id: int, item: InvoiceItemUpdate) -> Optional[InvoiceItemInDB]:
-    fields = {k: v for k, v in item.dict(exclude_unset=True).items()}
+async def update_invoice_item(
+    db: AsyncConnection,
+    item_id: int,
+    item: InvoiceItemUpdate,
+    if_updated_at: Optional[List[datetime]] = None,
+) -> Optional[InvoiceItemInDB]:
+    """
+    if_updated_at (з If-Match) - оновити лише незмінений з того часу рядок.
+    """
+    fields = {k: v for k, v in item.model_dump(exclude_unset=True).items() if k != "total"}
     set_clause = ", ".join([f"{k} = :{k}" for k in fields])
     if not set_clause:
-        return await get_invoice_item_by_id(db, item_id)
-    query = text(f"""
-        UPDATE invoice_items SET {set_clause}, updated_at = now()
-        WHERE id = :id RETURNING *
-    """)
+        row = await get_invoice_item_row(db, item_id)
+        if row and (if_updated_at is None or row["updated_at"] in if_updated_at):
+            return InvoiceItemInDB(**dict(row))
+        return None
+    condition = ""
+    if if_updated_at is not None:
+        condition = "AND updated_at = ANY(:if_updated_at)"
+        fields["if_updated_at"] = if_updated_at
+    query = f"""
+        WITH old AS (SELECT * FROM invoice_items WHERE id = :id {condition} FOR UPDATE),
+        item AS (
+            UPDATE invoice_items SET {set_clause}, updated_at = now()
+            FROM old WHERE invoice_items.id = old.id RETURNING invoice_items.*
+        ),
+        {DELTA_COLUMNS} AS ({item_deltas("old", sign=-1)} UNION ALL {item_deltas("item")}),
+        {APPLY_DELTAS}
+        SELECT * FROM item
+    """
     fields["id"] = item_id
-    result = await db.execute(query, fields)
-    row = result.fetchone()
+    row = await db.fetch_one(query, fields)
     if row:
         return InvoiceItemInDB(**dict(row))
     return None
 
 async def delete_invoice_item(db: AsyncConnection, item_id: int) -> bool:
-    query = text("DELETE FROM invoice_items WHERE id = :id")
+    query = f"""
+        WITH item AS (DELETE FROM invoice_items WHERE id = :id RETURNING *),
+        {DELTA_COLUMNS} AS ({item_deltas("item", sign=-1)}),
+        {APPLY_DELTAS}
+        SELECT count(*) FROM item
+    """
     await db.execute(query, {"id": item_id})
-    return True 
\ No newline at end of file
+    return True
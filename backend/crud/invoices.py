@@ -1,16 +1,24 @@
 from schemas.invoices import InvoiceCreate, InvoiceUpdate, InvoiceInDB
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncConnection
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
 from sqlalchemy.future import select
+from pagination import DEFAULT_PAGE_SIZE
+from crud.revenue import APPLY_DELTAS, DELTA_COLUMNS, invoice_deltas, removed_invoices_deltas
 
 
 async def create_invoice(db, invoice: InvoiceCreate) -> InvoiceInDB:
-    query = """
-        INSERT INTO invoices (customer_id, car_id, worker_id, service_id, total_amount, payment_status, work_status)
-        VALUES (:customer_id, :car_id, :worker_id, :service_id, :total_amount, :payment_status, :work_status)
-        RETURNING id, customer_id, car_id, worker_id, service_id, total_amount, payment_status, work_status, 
-                created_at, updated_at, issue_date, due_date, created_by
+    query = f"""
+        WITH invoice AS (
+            INSERT INTO invoices (customer_id, car_id, worker_id, service_id, total_amount, payment_status, work_status)
+            VALUES (:customer_id, :car_id, :worker_id, :service_id, :total_amount, :payment_status, :work_status)
+            RETURNING id, customer_id, car_id, worker_id, service_id, total_amount, payment_status, work_status, 
+                    created_at, updated_at, issue_date, due_date, created_by
+        ),
+        {DELTA_COLUMNS} AS ({invoice_deltas("invoice")}),
+        {APPLY_DELTAS}
+        SELECT * FROM invoice
     """
     params = {
         "customer_id": invoice.customer_id,
@@ -24,28 +32,121 @@ async def create_invoice(db, invoice: InvoiceCreate) -> InvoiceInDB:
     row = await db.fetch_one(query, params)
     return InvoiceInDB(**dict(row))
 
-async def get_invoice_by_id(db, invoice_id):
+async def get_invoice_row(db, invoice_id: int):
     query = "SELECT * FROM invoices WHERE id = :id"
-    row = await db.fetch_one(query, {"id": invoice_id})
+    return await db.fetch_one(query, {"id": invoice_id})
+
+async def get_invoice_by_id(db, invoice_id):
+    row = await get_invoice_row(db, invoice_id)
     if row:
         return InvoiceInDB(**dict(row))
     return None
 
-async def get_all_invoices(db):
-    query = text("SELECT * FROM invoices")
-    result = await db.fetch_all(query)
-    rows = result
+async def get_invoice_rows(
+    db,
+    worker_id: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after_id: Optional[int] = None,
+):
+    """
+    Сторінка інвойсів (keyset по id), опційно лише для одного майстра.
+    """
+    conditions = []
+    params = {"limit": limit}
+    if worker_id is not None:
+        conditions.append("worker_id = :worker_id")
+        params["worker_id"] = worker_id
+    if after_id is not None:
+        conditions.append("id > :after_id")
+        params["after_id"] = after_id
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT * FROM invoices {where} ORDER BY id LIMIT :limit"
+    return await db.fetch_all(query, params)
+
+async def get_all_invoices(
+    db,
+    worker_id: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after_id: Optional[int] = None,
+) -> List[InvoiceInDB]:
+    rows = await get_invoice_rows(db, worker_id, limit, after_id)
     return [InvoiceInDB(**dict(row)) for row in rows]
 
-async def update_invoice(db: AsyncConnection, invoice_id: int, invoice: InvoiceUpdate) -> Optional[InvoiceInDB]:
+INVOICE_EXPORT_COLUMNS = [
+    "id", "customer_id", "car_id", "worker_id", "service_id", "total_amount",
+    "payment_status", "work_status", "issue_date", "due_date", "created_by",
+    "created_at", "updated_at",
+]
+
+async def iter_invoices(
+    db,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    payment_status: Optional[str] = None,
+    work_status: Optional[str] = None,
+    worker_id: Optional[int] = None,
+) -> AsyncIterator[dict]:
+    """
+    Потоково читає інвойси серверним курсором (для експорту).
+    """
+    conditions = []
+    params = {}
+    if date_from is not None:
+        conditions.append("issue_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to is not None:
+        conditions.append("issue_date < :date_to")
+        params["date_to"] = date_to
+    if payment_status is not None:
+        conditions.append("payment_status = CAST(:payment_status AS payment_status_enum)")
+        params["payment_status"] = payment_status
+    if work_status is not None:
+        conditions.append("work_status = :work_status")
+        params["work_status"] = work_status
+    if worker_id is not None:
+        conditions.append("worker_id = :worker_id")
+        params["worker_id"] = worker_id
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT {', '.join(INVOICE_EXPORT_COLUMNS)} FROM invoices {where} ORDER BY id"
+    async for row in db.iterate(query, params):
+        yield dict(row)
+
+async def update_invoice(
+    db: AsyncConnection,
+    invoice_id: int,
+    invoice: InvoiceUpdate,
+    if_updated_at: Optional[List[datetime]] = None,
+) -> Optional[InvoiceInDB]:
+    """
+    if_updated_at (з If-Match) - оновити лише незмінений з того часу рядок.
+    """
     fields = {k: v for k, v in invoice.dict(exclude_unset=True).items()}
     set_clause = ", ".join([f"{k} = :{k}" for k in fields])
     if not set_clause:
-        return await get_invoice_by_id(db, invoice_id)
+        row = await get_invoice_row(db, invoice_id)
+        if row and (if_updated_at is None or row["updated_at"] in if_updated_at):
+            return InvoiceInDB(**dict(row))
+        return None
+    condition = ""
+    if if_updated_at is not None:
+        condition = "AND updated_at = ANY(:if_updated_at)"
+        fields["if_updated_at"] = if_updated_at
     query = f"""
         UPDATE invoices SET {set_clause}, updated_at = now()
-        WHERE id = :id RETURNING *
+        WHERE id = :id {condition} RETURNING *
     """
+    if fields.keys() & {"total_amount", "worker_id"}:
+        # Змінюється виручка майстра: старий рядок зі зведення віднімаємо, новий додаємо
+        query = f"""
+            WITH old AS (SELECT * FROM invoices WHERE id = :id {condition} FOR UPDATE),
+            invoice AS (
+                UPDATE invoices SET {set_clause}, updated_at = now()
+                FROM old WHERE invoices.id = old.id RETURNING invoices.*
+            ),
+            {DELTA_COLUMNS} AS ({invoice_deltas("old", -1)} UNION ALL {invoice_deltas("invoice")}),
+            {APPLY_DELTAS}
+            SELECT * FROM invoice
+        """
     fields["id"] = invoice_id
     row = await db.fetch_one(query, fields)
     if row:
@@ -53,6 +154,11 @@ async def update_invoice(db: AsyncConnection, invoice_id: int, invoice: InvoiceU
     return None
 
 async def delete_invoice(db: AsyncConnection, invoice_id: int) -> bool:
-    query = "DELETE FROM invoices WHERE id = :id"
+    query = f"""
+        WITH invoice AS (DELETE FROM invoices WHERE id = :id RETURNING *),
+        {DELTA_COLUMNS} AS ({removed_invoices_deltas("invoice")}),
+        {APPLY_DELTAS}
+        SELECT count(*) FROM invoice
+    """
     await db.execute(query, {"id": invoice_id})
     return True 
\ No newline at end of file
@@ -0,0 +1,173 @@
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Зведення виручки (revenue_rollup) для /reports.
+#
+# Рядок зведення - (dimension, day, key) -> amount, units:
+# - dimension 'worker': key - worker_id інвойсу (0 - без майстра), amount - сума
+#   total_amount інвойсів за день, units - кількість інвойсів;
+# - dimension 'service': key - service_id позиції (0 - без послуги: у старих
+#   позицій invoice_items.service_id буває NULL), amount - сума позицій,
+#   units - кількість проданих одиниць. День позиції - день її інвойсу.
+#
+# Зведення оновлюється інкрементально в тому ж операторі, що й запис в invoices /
+# invoice_items: запит описує зміну як CTE deltas (новий рядок з плюсом, старий -
+# з мінусом), а APPLY_DELTAS додає їх до зведення. Тригерів немає навмисно -
+# так само, як з catalog_versions, вся логіка запису лежить у crud.
+# Розбіжності (ручні правки в БД, каскадні видалення поза crud) виправляє
+# rebuild_revenue_rollup - див. backfill_revenue.py.
+
+DELTA_COLUMNS = "deltas(dimension, day, key, amount, units)"
+
+# Дельти групуються, щоб кожен рядок зведення оновлювався один раз, і
+# сортуються - паралельні записи блокують рядки зведення в одному порядку
+APPLY_DELTAS = """
+    rollup AS (
+        INSERT INTO revenue_rollup AS r (dimension, day, key, amount, units)
+        SELECT dimension, day, key, sum(amount), sum(units) FROM deltas
+        GROUP BY dimension, day, key
+        ORDER BY dimension, day, key
+        ON CONFLICT (dimension, day, key) DO UPDATE
+        SET amount = r.amount + EXCLUDED.amount, units = r.units + EXCLUDED.units
+    )
+"""
+
+
+def invoice_deltas(invoices: str, sign: int = 1) -> str:
+    """
+    Дельти 'worker' для інвойсів з CTE/таблиці invoices (sign=-1 - віднімання).
+    """
+    return f"""
+        SELECT 'worker', CAST(issue_date AS date), COALESCE(worker_id, 0), {sign} * total_amount, {sign}
+        FROM {invoices}
+    """
+
+
+def item_deltas(items: str, invoices: str = "invoices", sign: int = 1) -> str:
+    """
+    Дельти 'service' для позицій з items; день береться з інвойсу в invoices
+    (інвойс, вставлений у тому ж операторі, видно лише через його CTE).
+    """
+    return f"""
+        SELECT 'service', CAST(inv.issue_date AS date), COALESCE(it.service_id, 0), {sign} * it.total, {sign} * it.quantity
+        FROM {items} it JOIN {invoices} inv ON inv.id = it.invoice_id
+    """
+
+
+def removed_invoices_deltas(invoices: str) -> str:
+    """
+    Дельти для інвойсів, що видаляються (разом з їхніми позиціями - каскадом).
+    """
+    return f"{invoice_deltas(invoices, -1)} UNION ALL {item_deltas('invoice_items', invoices, -1)}"
+
+
+def _day_range(column: str, date_from: Optional[date], date_to: Optional[date], params: dict) -> List[str]:
+    conditions = []
+    if date_from is not None:
+        conditions.append(f"{column} >= CAST(:date_from AS date)")
+        params["date_from"] = date_from
+    if date_to is not None:
+        conditions.append(f"{column} < CAST(:date_to AS date) + 1")
+        params["date_to"] = date_to
+    return conditions
+
+
+REVENUE_QUERIES = {
+    "day": """
+        SELECT day, sum(amount) AS amount, sum(units) AS count
+        FROM revenue_rollup
+        WHERE dimension = 'worker' {conditions}
+        GROUP BY day
+        HAVING sum(units) <> 0 OR sum(amount) <> 0
+        ORDER BY day
+    """,
+    "service": """
+        SELECT NULLIF(r.key, 0) AS service_id, s.name AS service_name, sum(r.amount) AS amount, sum(r.units) AS count
+        FROM revenue_rollup r
+        LEFT JOIN services s ON s.id = r.key
+        WHERE r.dimension = 'service' {conditions}
+        GROUP BY r.key, s.name
+        HAVING sum(r.units) <> 0 OR sum(r.amount) <> 0
+        ORDER BY amount DESC, r.key
+    """,
+    "worker": """
+        SELECT NULLIF(r.key, 0) AS worker_id, u.username AS worker_username,
+               sum(r.amount) AS amount, sum(r.units) AS count
+        FROM revenue_rollup r
+        LEFT JOIN users u ON u.id = r.key
+        WHERE r.dimension = 'worker' {conditions}
+        GROUP BY r.key, u.username
+        HAVING sum(r.units) <> 0 OR sum(r.amount) <> 0
+        ORDER BY amount DESC, r.key
+    """,
+}
+
+
+async def get_revenue(
+    db: AsyncConnection,
+    group_by: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """
+    Виручка за днями, послугами або майстрами - лише зі зведення, без invoices.
+    date_from і date_to включно.
+    """
+    params = {}
+    conditions = _day_range("day", date_from, date_to, params)
+    where = "".join(f" AND {condition}" for condition in conditions)
+    return await db.fetch_all(REVENUE_QUERIES[group_by].format(conditions=where), params)
+
+
+async def rebuild_revenue_rollup(
+    db: AsyncConnection,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> int:
+    """
+    Перераховує зведення за дні [date_from, date_to] з invoices/invoice_items
+    (без меж - повністю). Повертає кількість записаних рядків зведення.
+
+    Один оператор: зайві рядки видаляються, решта перезаписується. Щоб запис,
+    транзакція якого ще не завершилась, не загубився, викликати в транзакції
+    після LOCK TABLE revenue_rollup IN SHARE ROW EXCLUSIVE MODE (так робить
+    backfill_revenue.py).
+    """
+    params = {}
+    invoice_range = _day_range("issue_date", date_from, date_to, params)
+    item_range = _day_range("inv.issue_date", date_from, date_to, params)
+    rollup_range = _day_range("r.day", date_from, date_to, params)
+
+    def where(conditions):
+        return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    query = f"""
+        WITH fresh AS (
+            SELECT 'worker' AS dimension, CAST(issue_date AS date) AS day, COALESCE(worker_id, 0) AS key,
+                   sum(total_amount) AS amount, count(*) AS units
+            FROM invoices {where(invoice_range)}
+            GROUP BY 2, 3
+            UNION ALL
+            SELECT 'service', CAST(inv.issue_date AS date), COALESCE(it.service_id, 0), sum(it.total), sum(it.quantity)
+            FROM invoice_items it JOIN invoices inv ON inv.id = it.invoice_id
+            {where(item_range)}
+            GROUP BY 2, 3
+        ),
+        stale AS (
+            DELETE FROM revenue_rollup r
+            WHERE NOT EXISTS (
+                SELECT 1 FROM fresh f WHERE (f.dimension, f.day, f.key) = (r.dimension, r.day, r.key)
+            ) {"".join(f" AND {condition}" for condition in rollup_range)}
+        ),
+        written AS (
+            INSERT INTO revenue_rollup AS r (dimension, day, key, amount, units)
+            SELECT * FROM fresh
+            ON CONFLICT (dimension, day, key) DO UPDATE
+            SET amount = EXCLUDED.amount, units = EXCLUDED.units
+            RETURNING 1
+        )
+        SELECT count(*) FROM written
+    """
+    return await db.fetch_val(query, params)
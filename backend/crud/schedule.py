@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Зайнятість майстрів для scheduling.py. Інтервал запису - tsrange(date, date +
+# duration хв); під нього є GiST-індекс idx_service_records_busy, тож
+# перетин з періодом шукається індексом, а не переглядом записів за рік.
+BUSY_RANGE = "tsrange(date, date + duration * interval '1 minute')"
+
+
+async def get_mechanics(db: AsyncConnection, mechanic_id: Optional[int] = None):
+    """
+    Майстри (role = 'master') як (id, username), опційно - лише один.
+    """
+    condition = "AND id = :mechanic_id" if mechanic_id is not None else ""
+    query = f"SELECT id, username FROM users WHERE role = 'master' {condition} ORDER BY id"
+    values = {"mechanic_id": mechanic_id} if mechanic_id is not None else {}
+    return [(row["id"], row["username"]) for row in await db.fetch_all(query, values)]
+
+
+async def get_busy_intervals(db: AsyncConnection, date_from: datetime, date_to: datetime, mechanic_ids: List[int]):
+    """
+    Записи майстрів mechanic_ids, що перетинають [date_from, date_to), як
+    (performed_by, starts_at, ends_at) - за майстром і початком.
+    """
+    query = f"""
+        SELECT performed_by, date AS starts_at, date + duration * interval '1 minute' AS ends_at
+        FROM service_records
+        WHERE {BUSY_RANGE} && tsrange(:date_from, :date_to)
+          AND performed_by = ANY(:mechanic_ids)
+        ORDER BY performed_by, date
+    """
+    values = {"date_from": date_from, "date_to": date_to, "mechanic_ids": mechanic_ids}
+    rows = await db.fetch_all(query, values)
+    return [(row["performed_by"], row["starts_at"], row["ends_at"]) for row in rows]
@@ -0,0 +1,117 @@
+import re
+from typing import List, Optional
+from schemas.cars import CarInDB
+from schemas.customers import CustomerInDB
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Пошук клієнтів і авто по індексах-виразах (init_db.sql, idx_*_prefix / idx_*_suffix):
+# префікс імені, прізвища, email, марки, моделі, VIN і цифр телефону, а також
+# суфікс VIN (напр. останні 6 символів) і цифр телефону - через reverse(...).
+# Кожна гілка OR відповідає своєму btree-індексу (text_pattern_ops).
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MIN_DIGITS = 3
+MIN_SUFFIX = 4
+
+PHONE_DIGITS = r"regexp_replace(phone, '\D', '', 'g')"
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def phone_digits(q: str) -> str:
+    # Номер шукаємо по цифрах, лише якщо запит схожий на телефон
+    if re.fullmatch(r"[\d\s()+\-]+", q):
+        return re.sub(r"\D", "", q)
+    return ""
+
+
+async def search_customers(db: AsyncConnection, q: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[CustomerInDB]:
+    """
+    Пошук клієнтів: префікс імені/прізвища/email, цифри телефону (початок або кінець).
+    Кілька слів у запиті мають усі збігтися з іменем або прізвищем.
+    """
+    tokens = q.lower().split()
+    if not tokens:
+        return []
+    first = tokens[0]
+    params = {"q": first, "prefix": escape_like(first) + "%", "limit": limit}
+    branches = [
+        "lower(last_name) LIKE :prefix",
+        "lower(first_name) LIKE :prefix",
+        "lower(email) LIKE :prefix",
+    ]
+    exact = ["lower(last_name) = :q", "lower(first_name) = :q", "lower(email) = :q"]
+
+    digits = phone_digits(q)
+    if len(digits) >= MIN_DIGITS:
+        params["digits"] = digits
+        params["digits_prefix"] = digits + "%"
+        branches.append(f"{PHONE_DIGITS} LIKE :digits_prefix")
+        exact.append(f"{PHONE_DIGITS} = :digits")
+        if len(digits) >= MIN_SUFFIX:
+            params["digits_suffix"] = digits[::-1] + "%"
+            branches.append(f"reverse({PHONE_DIGITS}) LIKE :digits_suffix")
+        # Для телефону інші слова не є окремими токенами імені
+        tokens = [first]
+
+    extra = []
+    for i, token in enumerate(tokens[1:]):
+        params[f"t{i}"] = escape_like(token) + "%"
+        extra.append(f"(lower(first_name) LIKE :t{i} OR lower(last_name) LIKE :t{i})")
+
+    where = "(" + " OR ".join(branches) + ")"
+    if extra:
+        where += " AND " + " AND ".join(extra)
+    query = f"""
+        SELECT id, first_name, last_name, phone, email, address, created_at, updated_at
+        FROM customers
+        WHERE {where}
+        ORDER BY CASE WHEN {" OR ".join(exact)} THEN 0 ELSE 1 END, last_name, first_name, id
+        LIMIT :limit
+    """
+    rows = await db.fetch_all(query, params)
+    return [CustomerInDB(**dict(row)) for row in rows]
+
+
+async def search_cars(
+    db: AsyncConnection, q: str, limit: int = DEFAULT_SEARCH_LIMIT, customer_id: Optional[int] = None
+) -> List[CarInDB]:
+    """
+    Пошук авто: префікс або суфікс VIN (напр. останні 6 символів), префікс марки/моделі.
+    customer_id - лише серед машин цього клієнта.
+    """
+    term = q.strip()
+    if not term:
+        return []
+    vin = escape_like(term.upper().replace(" ", ""))
+    word = escape_like(term.lower())
+    params = {
+        "vin": term.upper().replace(" ", ""),
+        "vin_prefix": vin + "%",
+        "word_prefix": word + "%",
+        "limit": limit,
+    }
+    branches = [
+        "upper(vin) LIKE :vin_prefix",
+        "lower(brand) LIKE :word_prefix",
+        "lower(model) LIKE :word_prefix",
+    ]
+    if len(vin) >= MIN_SUFFIX:
+        params["vin_suffix"] = vin[::-1] + "%"
+        branches.append("reverse(upper(vin)) LIKE :vin_suffix")
+    where = "(" + " OR ".join(branches) + ")"
+    if customer_id:
+        where += " AND customer_id = :customer_id"
+        params["customer_id"] = customer_id
+    query = f"""
+        SELECT * FROM cars
+        WHERE {where}
+        ORDER BY CASE WHEN upper(vin) = :vin THEN 0 WHEN upper(vin) LIKE :vin_prefix THEN 1 ELSE 2 END,
+                 brand, model, id
+        LIMIT :limit
+    """
+    rows = await db.fetch_all(query, params)
+    return [CarInDB(**dict(row)) for row in rows]
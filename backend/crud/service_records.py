@@ -1,29 +1,154 @@
-from typing import List, Optional
-from schemas.service_records import ServiceRecordCreate, ServiceRecordUpdate
-from sqlalchemy import text
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from schemas.service_records import ServiceRecordCreate, ServiceRecordUpdate, ServiceRecordInDB, CarHistoryEntry
 from sqlalchemy.ext.asyncio import AsyncConnection
+from pagination import DEFAULT_PAGE_SIZE
 
-async def get_all_service_records(db: AsyncConnection):
-    query = text("SELECT * FROM service_records ORDER BY date DESC")
-    result = await db.execute(query)
-    return result.mappings().all()
+# Скільки хвилин майстер зайнятий записом - тривалість послуги на момент запису
+# (зміна послуги в каталозі не зсуває вже заплановані роботи, див. crud/schedule.py)
+BOOKED_DURATION = "COALESCE((SELECT duration FROM services WHERE id = :service_id), 0)"
 
-async def get_service_record_by_id(db: AsyncConnection, record_id: int):
-    query = text("SELECT * FROM service_records WHERE id = :id")
-    result = await db.execute(query, {"id": record_id})
-    return result.mappings().first()
+async def get_service_record_rows(
+    db: AsyncConnection,
+    limit: int = DEFAULT_PAGE_SIZE,
+    before_date: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+):
+    """
+    Сторінка записів від найновіших (keyset по (date, id) у зворотному порядку).
+    """
+    params = {"limit": limit}
+    where = ""
+    if before_date is not None and before_id is not None:
+        where = "WHERE (date, id) < (:before_date, :before_id)"
+        params["before_date"] = before_date
+        params["before_id"] = before_id
+    query = f"SELECT * FROM service_records {where} ORDER BY date DESC, id DESC LIMIT :limit"
+    return await db.fetch_all(query, params)
 
-async def create_service_record(db: AsyncConnection, record: ServiceRecordCreate):
-    query = text("""
-        INSERT INTO service_records (car_id, service_id, performed_by, date, mileage, notes, invoice_id)
-        VALUES (:car_id, :service_id, :performed_by, :date, :mileage, :notes, :invoice_id)
+async def get_all_service_records(
+    db: AsyncConnection,
+    limit: int = DEFAULT_PAGE_SIZE,
+    before_date: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+) -> List[ServiceRecordInDB]:
+    rows = await get_service_record_rows(db, limit, before_date, before_id)
+    return [ServiceRecordInDB(**dict(row)) for row in rows]
+
+async def get_car_history(
+    db: AsyncConnection,
+    car_id: int,
+    limit: int = DEFAULT_PAGE_SIZE,
+    before_date: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+) -> List[CarHistoryEntry]:
+    """
+    Історія обслуговування авто одним запитом: послуга, майстер, статус
+    інвойсу та приріст пробігу відносно попереднього запису.
+    """
+    params = {"car_id": car_id, "limit": limit}
+    keyset = ""
+    if before_date is not None and before_id is not None:
+        keyset = "AND (sr.date, sr.id) < (:before_date, :before_id)"
+        params["before_date"] = before_date
+        params["before_id"] = before_id
+    query = f"""
+        SELECT sr.id, sr.date, sr.mileage, sr.notes, sr.service_id, sr.performed_by, sr.invoice_id,
+               s.name AS service_name, s.price AS service_price,
+               u.username AS mechanic_username,
+               i.payment_status AS invoice_payment_status, i.work_status AS invoice_work_status,
+               sr.mileage - prev.mileage AS mileage_delta
+        FROM service_records sr
+        LEFT JOIN services s ON s.id = sr.service_id
+        LEFT JOIN users u ON u.id = sr.performed_by
+        LEFT JOIN invoices i ON i.id = sr.invoice_id
+        LEFT JOIN LATERAL (
+            SELECT p.mileage
+            FROM service_records p
+            WHERE p.car_id = sr.car_id
+              AND p.mileage IS NOT NULL
+              AND (p.date, p.id) < (sr.date, sr.id)
+            ORDER BY p.date DESC, p.id DESC
+            LIMIT 1
+        ) prev ON true
+        WHERE sr.car_id = :car_id {keyset}
+        ORDER BY sr.date DESC, sr.id DESC
+        LIMIT :limit
+    """
+    rows = await db.fetch_all(query, params)
+    return [CarHistoryEntry(**dict(row)) for row in rows]
+
+SERVICE_RECORD_EXPORT_COLUMNS = [
+    "id", "car_id", "service_id", "performed_by", "date", "mileage", "notes",
+    "invoice_id", "created_at", "updated_at",
+]
+
+async def iter_service_records(
+    db: AsyncConnection,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    invoiced: Optional[bool] = None,
+    car_id: Optional[int] = None,
+    performed_by: Optional[int] = None,
+) -> AsyncIterator[dict]:
+    """
+    Потоково читає записи обслуговування серверним курсором (для експорту).
+    """
+    conditions = []
+    params = {}
+    if date_from is not None:
+        conditions.append("date >= :date_from")
+        params["date_from"] = date_from
+    if date_to is not None:
+        conditions.append("date < :date_to")
+        params["date_to"] = date_to
+    if invoiced is True:
+        conditions.append("invoice_id IS NOT NULL")
+    elif invoiced is False:
+        conditions.append("invoice_id IS NULL")
+    if car_id is not None:
+        conditions.append("car_id = :car_id")
+        params["car_id"] = car_id
+    if performed_by is not None:
+        conditions.append("performed_by = :performed_by")
+        params["performed_by"] = performed_by
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT {', '.join(SERVICE_RECORD_EXPORT_COLUMNS)} FROM service_records {where} ORDER BY date, id"
+    async for row in db.iterate(query, params):
+        yield dict(row)
+
+async def get_service_record_row(db: AsyncConnection, record_id: int):
+    query = "SELECT * FROM service_records WHERE id = :id"
+    return await db.fetch_one(query, {"id": record_id})
+
+async def get_service_record_by_id(db: AsyncConnection, record_id: int) -> Optional[ServiceRecordInDB]:
+    row = await get_service_record_row(db, record_id)
+    return ServiceRecordInDB(**dict(row)) if row else None
+
+async def create_service_record(db: AsyncConnection, record: ServiceRecordCreate) -> ServiceRecordInDB:
+    query = f"""
+        INSERT INTO service_records (car_id, service_id, performed_by, date, mileage, notes, invoice_id, duration)
+        VALUES (:car_id, :service_id, :performed_by, :date, :mileage, :notes, :invoice_id, {BOOKED_DURATION})
         RETURNING *
-    """)
-    result = await db.execute(query, record.dict())
-    return result.mappings().first()
+    """
+    row = await db.fetch_one(query, record.dict())
+    return ServiceRecordInDB(**dict(row))
 
-async def update_service_record(db: AsyncConnection, record_id: int, record: ServiceRecordUpdate):
-    query = text("""
+async def update_service_record(
+    db: AsyncConnection,
+    record_id: int,
+    record: ServiceRecordUpdate,
+    if_updated_at: Optional[List[datetime]] = None,
+) -> Optional[ServiceRecordInDB]:
+    """
+    if_updated_at (з If-Match) - оновити лише незмінений з того часу рядок.
+    """
+    values = record.dict()
+    condition = ""
+    if if_updated_at is not None:
+        condition = "AND updated_at = ANY(:if_updated_at)"
+        values["if_updated_at"] = if_updated_at
+    query = f"""
         UPDATE service_records
         SET car_id = :car_id,
             service_id = :service_id,
@@ -32,16 +157,17 @@ async def update_service_record(db: AsyncConnection, record_id: int, record: Ser
             mileage = :mileage,
             notes = :notes,
             invoice_id = :invoice_id,
+            -- Тривалість перечитується з каталогу лише при зміні послуги
+            duration = CASE WHEN service_id = :service_id THEN duration ELSE {BOOKED_DURATION} END,
             updated_at = CURRENT_TIMESTAMP
-        WHERE id = :id
+        WHERE id = :id {condition}
         RETURNING *
-    """)
-    values = record.dict()
+    """
     values["id"] = record_id
-    result = await db.execute(query, values)
-    return result.mappings().first()
+    row = await db.fetch_one(query, values)
+    return ServiceRecordInDB(**dict(row)) if row else None
 
-async def delete_service_record(db: AsyncConnection, record_id: int):
-    query = text("DELETE FROM service_records WHERE id = :id")
-    result = await db.execute(query, {"id": record_id})
-    return result.rowcount > 0
+async def delete_service_record(db: AsyncConnection, record_id: int) -> bool:
+    query = "DELETE FROM service_records WHERE id = :id RETURNING id"
+    row = await db.fetch_one(query, {"id": record_id})
+    return row is not None
@@ -1,6 +1,44 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
 from schemas.services import ServiceCreate, ServiceUpdate, ServiceInDB
 from sqlalchemy.ext.asyncio import AsyncConnection
+from bulk import RowResult
+from crud.revenue import APPLY_DELTAS, DELTA_COLUMNS, item_deltas
+
+# Кожен запис у services в тому ж операторі піднімає версію каталогу
+# (catalog_versions) - за нею services_catalog.py бачить зміни з будь-якого воркера.
+BUMP_VERSION = """
+    bump AS (UPDATE catalog_versions SET version = version + 1 WHERE name = 'services')
+"""
+
+# Позиції інвойсів з послугою видаляються каскадом - віднімаємо їх зі зведення виручки
+REMOVE_ITEMS = f"""
+    item AS (SELECT * FROM invoice_items WHERE service_id = :id),
+    {DELTA_COLUMNS} AS ({item_deltas("item", sign=-1)}),
+    {APPLY_DELTAS}
+"""
+
+
+async def load_services_catalog(db: AsyncConnection) -> Tuple[Optional[int], List[ServiceInDB]]:
+    """
+    Версія каталогу та всі послуги одним запитом (один знімок).
+    """
+    query = """
+        SELECT v.version, s.*
+        FROM catalog_versions v
+        LEFT JOIN services s ON true
+        WHERE v.name = 'services'
+        ORDER BY s.id
+    """
+    rows = await db.fetch_all(query)
+    if not rows:
+        return None, []
+    services = [ServiceInDB(**dict(row)) for row in rows if row["id"] is not None]
+    return rows[0]["version"], services
+
+
+async def get_services_version(db: AsyncConnection) -> Optional[int]:
+    return await db.fetch_val("SELECT version FROM catalog_versions WHERE name = 'services'")
 
 
 async def get_all_services(db: AsyncConnection) -> List[ServiceInDB]:
@@ -18,7 +56,8 @@ async def get_service_by_id(db: AsyncConnection, service_id: int) -> Optional[Se
 
 
 async def create_service(db: AsyncConnection, service: ServiceCreate) -> ServiceInDB:
-    query = """
+    query = f"""
+        WITH {BUMP_VERSION}
         INSERT INTO services (name, description, price, duration)
         VALUES (:name, :description, :price, :duration)
         RETURNING *;
@@ -27,9 +66,18 @@ async def create_service(db: AsyncConnection, service: ServiceCreate) -> Service
     return ServiceInDB(**dict(row))
 
 
-async def update_service(db: AsyncConnection, service_id: int, service: ServiceUpdate) -> Optional[ServiceInDB]:
-    query = "UPDATE services SET name = :name, description = :description, price = :price, duration = :duration, updated_at = CURRENT_TIMESTAMP WHERE id = :id RETURNING *;"
+async def update_service(
+    db: AsyncConnection, service_id: int, service: ServiceUpdate, if_updated_at: Optional[List[datetime]] = None
+) -> Optional[ServiceInDB]:
+    """
+    if_updated_at (з If-Match) - оновити лише незмінений з того часу рядок.
+    """
     values = service.dict()
+    condition = ""
+    if if_updated_at is not None:
+        condition = "AND updated_at = ANY(:if_updated_at)"
+        values["if_updated_at"] = if_updated_at
+    query = f"WITH {BUMP_VERSION} UPDATE services SET name = :name, description = :description, price = :price, duration = :duration, updated_at = CURRENT_TIMESTAMP WHERE id = :id {condition} RETURNING *;"
     values["id"] = service_id
     row = await db.fetch_one(query, values)
     if row:
@@ -38,11 +86,33 @@ async def update_service(db: AsyncConnection, service_id: int, service: ServiceU
 
 
 async def delete_service(db: AsyncConnection, service_id: int) -> bool:
-    query = "DELETE FROM services WHERE id = :id;"
-    result = await db.execute(query, {"id": service_id})
-    return result.rowcount > 0
+    query = f"WITH {BUMP_VERSION}, {REMOVE_ITEMS} DELETE FROM services WHERE id = :id RETURNING id"
+    row = await db.fetch_one(query, {"id": service_id})
+    return row is not None
 
 
 async def delete_service_from_db(db: AsyncConnection, service_id: int):
-    query = "DELETE FROM services WHERE id = :id"
+    query = f"WITH {BUMP_VERSION}, {REMOVE_ITEMS} DELETE FROM services WHERE id = :id"
     await db.execute(query, {"id": service_id})
+
+
+async def bulk_create_services(db: AsyncConnection, rows: List[Tuple[int, ServiceCreate]]) -> List[RowResult]:
+    """
+    Вставляє частину послуг одним INSERT ... SELECT FROM unnest(...).
+    """
+    query = f"""
+        WITH {BUMP_VERSION}
+        INSERT INTO services (name, description, price, duration)
+        SELECT name, description, price, duration
+        FROM unnest(
+            CAST(:name AS TEXT[]), CAST(:description AS TEXT[]),
+            CAST(:price AS NUMERIC[]), CAST(:duration AS INTEGER[])
+        ) WITH ORDINALITY AS t(name, description, price, duration, ord)
+        ORDER BY ord
+        RETURNING id
+    """
+    models = [model for _, model in rows]
+    params = {field: [getattr(m, field) for m in models] for field in ("name", "description", "price", "duration")}
+    result = await db.fetch_all(query, params)
+    ids = sorted(row["id"] for row in result)
+    return [RowResult(index=index, status="created", id=new_id) for (index, _), new_id in zip(rows, ids)]
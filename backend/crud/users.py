@@ -1,6 +1,5 @@
 from schemas.users import UserCreate, UserInDB
 from sqlalchemy.ext.asyncio import AsyncConnection
-from passlib.context import CryptContext
 from typing import Optional
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
@@ -8,22 +7,18 @@ from jose import JWTError, jwt
 from datetime import datetime
 from auth.jwt import SECRET_KEY, ALGORITHM
 from db import get_db
+from auth.passwords import password_hasher
+from auth.principal_cache import principal_cache
+from pagination import DEFAULT_PAGE_SIZE
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 async def create_user(db: AsyncConnection, user: UserCreate) -> UserInDB:
     existing_user = await get_user_by_username(db, user.username)
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     query = """
         INSERT INTO users (username, email, role, password_hash, created_at, updated_at)
         VALUES (:username, :email, :role, :password_hash, now(), now())
@@ -48,6 +43,17 @@ async def get_user_by_username(db: AsyncConnection, username: str) -> Optional[d
         return dict(row)
     return None
 
+async def get_principal(db: AsyncConnection, username: str) -> Optional[dict]:
+    """
+    get_user_by_username через кеш принципалів (для автентифікації запитів).
+    """
+    user = principal_cache.get(username)
+    if user is None:
+        user = await get_user_by_username(db, username)
+        if user is not None:
+            principal_cache.put(username, user)
+    return user
+
 async def get_user_by_id(db: AsyncConnection, user_id: int) -> Optional[UserInDB]:
     query = """
         SELECT id, username, email, role, is_active, created_at, updated_at, password_hash
@@ -59,13 +65,23 @@ async def get_user_by_id(db: AsyncConnection, user_id: int) -> Optional[UserInDB
         return UserInDB(**dict(row))
     return None
 
-async def get_all_users(db: AsyncConnection):
-    query = """
+async def get_user_rows(db: AsyncConnection, limit: int = DEFAULT_PAGE_SIZE, after_id: Optional[int] = None):
+    params = {"limit": limit}
+    where = ""
+    if after_id is not None:
+        where = "WHERE id > :after_id"
+        params["after_id"] = after_id
+    query = f"""
         SELECT id, username, email, role, is_active, created_at, updated_at, password_hash
         FROM users
+        {where}
         ORDER BY id
+        LIMIT :limit
     """
-    rows = await db.fetch_all(query)
+    return await db.fetch_all(query, params)
+
+async def get_all_users(db: AsyncConnection, limit: int = DEFAULT_PAGE_SIZE, after_id: Optional[int] = None):
+    rows = await get_user_rows(db, limit, after_id)
     return [UserInDB(**dict(row)) for row in rows]
 
 async def get_current_user(
@@ -85,7 +101,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = await get_user_by_username(db, username)
+    user = await get_principal(db, username)
     if user is None:
         raise credentials_exception
     # We need to convert the dict to a Pydantic model here
@@ -101,11 +117,12 @@ async def update_user_in_db(db, user_id: int, user_update):
     if not fields:
         return None
     query = f"""
-        UPDATE users SET {', '.join(fields)}
+        UPDATE users SET {', '.join(fields)}, updated_at = now()
         WHERE id = :user_id
         RETURNING id, username, email, role, is_active, created_at, updated_at, password_hash
     """
     row = await db.fetch_one(query, params)
+    principal_cache.invalidate_user(user_id)
     if row:
         from schemas.users import UserInDB
         return UserInDB(**dict(row))
@@ -114,3 +131,4 @@ async def update_user_in_db(db, user_id: int, user_update):
 async def delete_user_from_db(db, user_id: int):
     query = "DELETE FROM users WHERE id = :user_id"
     await db.execute(query, {"user_id": user_id})
+    principal_cache.invalidate_user(user_id)
@@ -1,28 +1,73 @@
 import os
+from typing import Optional
+
 from databases import Database
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+
+from db_pool import PooledDatabase, pool_options
+from query_stats import InstrumentedDatabase
+from replica import ReplicaMonitor, choose_database
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL is not set in the environment variables.")
+# Необов'язкова репліка для читань (див. replica.py)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# Об'єкти підключення створює configure_database - при старті застосунку чи
+# скрипта, а не при імпорті модуля. Розміри пулу, таймаути і метрики - у
+# db_pool.py (змінні DB_POOL_*, DB_STATEMENT_TIMEOUT_MS)
+database: Optional[PooledDatabase] = None
+replica_database: Optional[PooledDatabase] = None
+replica_monitor: Optional[ReplicaMonitor] = None
+
 
-database = Database(DATABASE_URL)
+def configure_database(url: Optional[str] = None, replica_url: Optional[str] = None) -> PooledDatabase:
+    """
+    Створює database (і репліку, якщо задана) без підключення - один раз на
+    процес, наступні виклики повертають уже створений. Типово - з DATABASE_URL
+    і DATABASE_REPLICA_URL.
+    """
+    global database, replica_database, replica_monitor
+    if database is not None:
+        return database
+    url = url or DATABASE_URL
+    if not url:
+        raise ValueError("DATABASE_URL is not set in the environment variables.")
+    replica_url = replica_url or DATABASE_REPLICA_URL
+    if replica_url:
+        replica_database = PooledDatabase(replica_url, **pool_options())
+        replica_monitor = ReplicaMonitor(replica_database)
+    database = PooledDatabase(url, **pool_options())
+    return database
 
 
 # Викликається у FastAPI при старті/завершенні
-async def connect_to_db():
+async def connect_to_db(url: Optional[str] = None, replica_url: Optional[str] = None):
+    configure_database(url, replica_url)
     if not database.is_connected:
         await database.connect()
+    if replica_database is not None and not replica_database.is_connected:
+        await replica_database.connect()
+        await replica_monitor.check()
+        replica_monitor.start()
 
 
 async def disconnect_from_db():
-    if database.is_connected:
+    if replica_database is not None and replica_database.is_connected:
+        await replica_monitor.stop()
+        await replica_database.disconnect()
+    if database is not None and database.is_connected:
         await database.disconnect()
 
 
-# Залежність для injection у ендпоінти
-async def get_db() -> Database:
-    return database
+def replica_configured() -> bool:
+    return replica_database is not None
+
+
+# Залежність для injection у ендпоінти: GET/HEAD - репліка (якщо вона є і не
+# відстає), решта - primary. Кожен запит через неї міряється (query_stats.py)
+async def get_db(request: Request) -> Database:
+    chosen = choose_database(request, database, replica_database, replica_monitor)
+    return InstrumentedDatabase(chosen, "replica" if chosen is replica_database else "primary")
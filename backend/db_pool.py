@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+from typing import Dict
+
+from databases import Database
+from opentelemetry import metrics
+
+# Пул з'єднань з БД: налаштування і метрики.
+#
+# databases бере з'єднання з пулу asyncpg на кожен запит (або транзакцію), тож
+# саме тут видно, звідки затримка: черга на з'єднання (пул замалий) чи повільний
+# SQL. Пул обгортається після підключення: acquire отримує таймаут і міряється,
+# а з'єднання старші за DB_POOL_MAX_LIFETIME закриваються при поверненні в пул
+# (asyncpg сам відкриє нове при наступному acquire).
+
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 10))
+POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 30 * 60))
+POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", 5 * 60))
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30_000))
+
+meter = metrics.get_meter(__name__)
+acquire_histogram = meter.create_histogram(
+    "db.pool.acquire_time",
+    unit="ms",
+    description="Time spent waiting for a pooled database connection",
+)
+acquire_timeouts_counter = meter.create_counter(
+    "db.pool.acquire_timeouts",
+    description="Connection acquisitions that gave up after DB_POOL_ACQUIRE_TIMEOUT",
+)
+recycled_counter = meter.create_counter(
+    "db.pool.recycled",
+    description="Connections closed after reaching DB_POOL_MAX_LIFETIME",
+)
+
+
+class PoolTimeout(Exception):
+    """
+    За DB_POOL_ACQUIRE_TIMEOUT не звільнилося жодне з'єднання.
+    """
+
+
+class InstrumentedPool:
+    """
+    Обгортка над asyncpg.Pool з тим самим інтерфейсом acquire/release, яким
+    користується databases. Решта атрибутів передається пулу як є.
+    """
+
+    def __init__(self, pool, acquire_timeout: float = POOL_ACQUIRE_TIMEOUT, max_lifetime: float = POOL_MAX_LIFETIME):
+        self._pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.waiting = 0
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    @property
+    def size(self) -> int:
+        return self._pool.get_size()
+
+    @property
+    def in_use(self) -> int:
+        return self._pool.get_size() - self._pool.get_idle_size()
+
+    async def acquire(self):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            connection = await self._pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            acquire_timeouts_counter.add(1)
+            raise PoolTimeout(f"no database connection available within {self.acquire_timeout}s")
+        finally:
+            self.waiting -= 1
+            acquire_histogram.record((time.perf_counter() - started) * 1000)
+        return connection
+
+    async def release(self, connection):
+        opened = _opened.get(connection.get_server_pid())
+        if opened is not None and time.monotonic() - opened > self.max_lifetime:
+            recycled_counter.add(1)
+            await connection.close()
+        return await self._pool.release(connection)
+
+
+# pid серверного процесу -> коли відкрито з'єднання (для DB_POOL_MAX_LIFETIME)
+_opened: Dict[int, float] = {}
+
+
+async def _on_connect(connection):
+    pid = connection.get_server_pid()
+    _opened[pid] = time.monotonic()
+    connection.add_termination_listener(lambda _: _opened.pop(pid, None))
+
+
+def pool_options() -> dict:
+    """
+    Параметри asyncpg.create_pool для Database(DATABASE_URL, **pool_options()).
+    """
+    return {
+        "min_size": POOL_MIN_SIZE,
+        "max_size": POOL_MAX_SIZE,
+        "max_inactive_connection_lifetime": POOL_MAX_IDLE,
+        "init": _on_connect,
+        "server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT_MS)},
+    }
+
+
+class PooledDatabase(Database):
+    """
+    Database, чий пул після підключення обгорнутий InstrumentedPool.
+    """
+
+    pool: InstrumentedPool = None
+
+    async def connect(self) -> None:
+        if self.is_connected:
+            return
+        await super().connect()
+        # databases не дає свого хука на acquire, тому підміняємо пул бекенда
+        self.pool = InstrumentedPool(self._backend._pool)
+        self._backend._pool = self.pool
+        _observed.append(self)
+
+    async def disconnect(self) -> None:
+        if self.is_connected and self.pool is not None:
+            self._backend._pool = self.pool._pool
+            _observed.remove(self)
+            self.pool = None
+        await super().disconnect()
+
+
+_observed = []
+
+
+def _observe(attribute):
+    def callback(options):
+        return [
+            metrics.Observation(getattr(database.pool, attribute))
+            for database in _observed
+        ]
+    return callback
+
+
+meter.create_observable_gauge(
+    "db.pool.size", callbacks=[_observe("size")], description="Open connections in the pool",
+)
+meter.create_observable_gauge(
+    "db.pool.in_use", callbacks=[_observe("in_use")], description="Connections currently checked out",
+)
+meter.create_observable_gauge(
+    "db.pool.waiting", callbacks=[_observe("waiting")], description="Requests waiting for a connection",
+)
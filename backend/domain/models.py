@@ -1,8 +1,13 @@
 from dataclasses import dataclass, field
 from datetime import datetime
+from decimal import Decimal
 from typing import List, Optional
 from enum import Enum
 
+# Сутності - dataclass(slots=True): без __dict__ на кожен екземпляр, тож агрегат
+# з тисячами позицій (crud/invoice_aggregates.py) займає помітно менше пам'яті.
+# Гроші - Decimal, як NUMERIC у БД: сума позицій збігається з total_amount до копійки.
+
 # --- Value Objects & Enums ---
 
 class InvoiceStatus(Enum):
@@ -13,7 +18,7 @@ class InvoiceStatus(Enum):
 
 # --- CRM Context ---
 
-@dataclass
+@dataclass(slots=True)
 class Car:
     vin: str
     make: str
@@ -25,7 +30,7 @@ class Car:
         # Тут може бути логіка валідації (пробіг не може бути меншим за попередній)
         pass
 
-@dataclass
+@dataclass(slots=True)
 class Customer:
     id: int
     first_name: str
@@ -38,14 +43,14 @@ class Customer:
 
 # --- Service Operations Context ---
 
-@dataclass
+@dataclass(slots=True)
 class ServiceItem:
     id: int
     name: str
     price: float
     duration_minutes: int
 
-@dataclass
+@dataclass(slots=True)
 class ServiceRecord:
     id: int
     car_vin: str
@@ -60,31 +65,39 @@ class ServiceRecord:
 
 # --- Billing Context ---
 
-@dataclass
+@dataclass(slots=True)
 class InvoiceLine:
     service_name: str
     quantity: int
-    unit_price: float
+    unit_price: Decimal
+    service_id: Optional[int] = None
+    id: Optional[int] = None
 
     @property
-    def total(self) -> float:
+    def total(self) -> Decimal:
         return self.quantity * self.unit_price
 
-@dataclass
+@dataclass(slots=True)
 class Invoice:
     id: int
     customer_id: int
     items: List[InvoiceLine] = field(default_factory=list)
     status: InvoiceStatus = InvoiceStatus.DRAFT
     created_at: datetime = field(default_factory=datetime.now)
+    car_id: Optional[int] = None
+    worker_id: Optional[int] = None
+    # Сума, збережена в БД (invoices.total_amount); calculate_total - з позицій
+    total_amount: Decimal = Decimal(0)
+    payment_status: str = "unpaid"
+    work_status: str = "new"
 
     def add_item(self, item: InvoiceLine):
         if self.status != InvoiceStatus.DRAFT:
             raise Exception("Cannot add items to issued invoice")
         self.items.append(item)
 
-    def calculate_total(self) -> float:
-        return sum(item.total for item in self.items)
+    def calculate_total(self) -> Decimal:
+        return sum((item.total for item in self.items), Decimal(0))
 
     def issue(self):
         # Логіка фіналізації рахунку
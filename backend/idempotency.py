@@ -0,0 +1,307 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from fastapi import Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Ідемпотентність POST-запитів за заголовком Idempotency-Key.
+#
+# Перший запит з ключем "захоплює" його і виконується; відповідь зберігається
+# на IDEMPOTENCY_TTL секунд. Паралельні запити з тим самим ключем чекають на
+# результат першого (у межах воркера - через Future, між воркерами - опитуванням
+# таблиці idempotency_keys) і отримують ту саму відповідь.
+#
+# IDEMPOTENCY_BACKEND=memory - словник у процесі (один воркер),
+# IDEMPOTENCY_BACKEND=postgres - таблиця idempotency_keys (кілька воркерів).
+
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", 24 * 60 * 60))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10000))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 30))
+# Через скільки секунд незавершений ключ вважається "осиротілим" (воркер впав)
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+POLL_INTERVAL = 0.05
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    body: Any
+
+
+class IdempotencyStore(ABC):
+    """
+    Базова логіка: захоплення ключа, очікування паралельних запитів, збереження
+    результату. Конкретні сховища реалізують _try_claim / _save / _delete_pending.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, wait_timeout: float = IDEMPOTENCY_WAIT_TIMEOUT):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        """
+        Повертає збережену відповідь, якщо ключ уже виконано, або None,
+        якщо ключ захоплено поточним запитом і його треба виконати.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            local = self._inflight.get(key)
+            if local is not None:
+                # Той самий воркер уже виконує цей ключ - чекаємо на нього
+                remaining = deadline - time.monotonic()
+                try:
+                    await asyncio.wait_for(asyncio.shield(local), max(remaining, 0))
+                except asyncio.TimeoutError:
+                    raise HTTPException(409, "idempotency_key_in_progress")
+                continue
+
+            claimed, stored = await self._try_claim(key, fingerprint)
+            if claimed:
+                self._inflight[key] = asyncio.get_running_loop().create_future()
+                return None
+            if stored is not None:
+                return stored
+            # Ключ виконується в іншому воркері
+            if time.monotonic() >= deadline:
+                raise HTTPException(409, "idempotency_key_in_progress")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def complete(self, key: str, response: StoredResponse):
+        try:
+            await self._save(key, response)
+        finally:
+            self._wake(key)
+
+    async def release(self, key: str):
+        """
+        Звільняє ключ без результату (запит упав), щоб повтор міг виконатися.
+        """
+        try:
+            await self._delete_pending(key)
+        finally:
+            self._wake(key)
+
+    def _wake(self, key: str):
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    @abstractmethod
+    async def _try_claim(self, key: str, fingerprint: str):
+        """
+        (True, None) - ключ захоплено; (False, StoredResponse) - вже виконано;
+        (False, None) - виконується деінде.
+        """
+
+    @abstractmethod
+    async def _save(self, key: str, response: StoredResponse):
+        pass
+
+    @abstractmethod
+    async def _delete_pending(self, key: str):
+        pass
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS, **kwargs):
+        super().__init__(ttl=ttl, **kwargs)
+        self.max_keys = max_keys
+        # key -> [expires_at, fingerprint, StoredResponse | None]; порядок = порядок захоплення
+        self._entries: OrderedDict = OrderedDict()
+
+    async def _try_claim(self, key: str, fingerprint: str):
+        now = time.monotonic()
+        self._evict(now)
+        entry = self._entries.get(key)
+        if entry is not None:
+            _, stored_fingerprint, stored = entry
+            if stored_fingerprint != fingerprint:
+                raise HTTPException(422, "idempotency_key_reused")
+            return False, stored
+        self._entries[key] = [now + self.ttl, fingerprint, None]
+        return True, None
+
+    async def _save(self, key: str, response: StoredResponse):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[2] = response
+
+    async def _delete_pending(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] is None:
+            del self._entries[key]
+
+    def _evict(self, now: float):
+        # TTL однаковий для всіх ключів, тож найстаріші записи завжди на початку
+        while self._entries:
+            key, (expires_at, _, stored) = next(iter(self._entries.items()))
+            expired = expires_at < now
+            if not expired and len(self._entries) < self.max_keys:
+                break
+            if stored is None and not expired:
+                # Незавершений запит не витісняємо, він скоро завершиться
+                break
+            self._entries.popitem(last=False)
+
+
+class PostgresIdempotencyStore(IdempotencyStore):
+    """
+    Сховище в таблиці idempotency_keys - спільне для всіх воркерів.
+    """
+
+    def __init__(self, database, lock_timeout: float = IDEMPOTENCY_LOCK_TIMEOUT, purge_probability: float = 0.01, **kwargs):
+        super().__init__(**kwargs)
+        self.database = database
+        self.lock_timeout = lock_timeout
+        self.purge_probability = purge_probability
+
+    async def _try_claim(self, key: str, fingerprint: str):
+        if random.random() < self.purge_probability:
+            await self.database.execute("DELETE FROM idempotency_keys WHERE expires_at < now()")
+        # Вставляємо ключ; прострочений або "осиротілий" запис перезахоплюємо
+        row = await self.database.fetch_one(
+            """
+            INSERT INTO idempotency_keys (key, fingerprint, created_at, expires_at)
+            VALUES (:key, :fingerprint, now(), now() + make_interval(secs => :ttl))
+            ON CONFLICT (key) DO UPDATE
+                SET fingerprint = EXCLUDED.fingerprint,
+                    status_code = NULL,
+                    response = NULL,
+                    created_at = EXCLUDED.created_at,
+                    expires_at = EXCLUDED.expires_at
+                WHERE idempotency_keys.expires_at < now()
+                   OR (idempotency_keys.status_code IS NULL
+                       AND idempotency_keys.created_at < now() - make_interval(secs => :lock_timeout))
+            RETURNING key
+            """,
+            {"key": key, "fingerprint": fingerprint, "ttl": self.ttl, "lock_timeout": self.lock_timeout},
+        )
+        if row is not None:
+            return True, None
+        row = await self.database.fetch_one(
+            "SELECT fingerprint, status_code, response FROM idempotency_keys WHERE key = :key",
+            {"key": key},
+        )
+        if row is None:
+            # Запис щойно видалили (release) - пробуємо ще раз
+            return False, None
+        if row["fingerprint"] != fingerprint:
+            raise HTTPException(422, "idempotency_key_reused")
+        if row["status_code"] is None:
+            return False, None
+        return False, StoredResponse(row["status_code"], json.loads(row["response"]))
+
+    async def _save(self, key: str, response: StoredResponse):
+        await self.database.execute(
+            """
+            UPDATE idempotency_keys
+            SET status_code = :status_code, response = CAST(:response AS JSONB)
+            WHERE key = :key
+            """,
+            {"key": key, "status_code": response.status_code, "response": json.dumps(response.body)},
+        )
+
+    async def _delete_pending(self, key: str):
+        await self.database.execute(
+            "DELETE FROM idempotency_keys WHERE key = :key AND status_code IS NULL",
+            {"key": key},
+        )
+
+
+def _create_store() -> IdempotencyStore:
+    if IDEMPOTENCY_BACKEND == "postgres":
+        from db import configure_database
+        return PostgresIdempotencyStore(configure_database())
+    if IDEMPOTENCY_BACKEND == "memory":
+        return MemoryIdempotencyStore()
+    raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {IDEMPOTENCY_BACKEND}")
+
+
+# Створюється при першому запиті з Idempotency-Key: postgres-сховищу потрібна БД
+idempotency_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global idempotency_store
+    if idempotency_store is None:
+        idempotency_store = _create_store()
+    return idempotency_store
+
+
+class IdempotencyContext:
+    """
+    Те, що отримує ендпоінт: збережена відповідь (replay) або право виконати
+    запит і зберегти результат через respond().
+    """
+
+    def __init__(self, store: Optional[IdempotencyStore], key: Optional[str], replay: Optional[StoredResponse] = None):
+        self.store = store
+        self.key = key
+        self.replay = replay
+        self.completed = False
+
+    def replay_response(self) -> JSONResponse:
+        return JSONResponse(
+            content=self.replay.body,
+            status_code=self.replay.status_code,
+            headers={REPLAY_HEADER: "true"},
+        )
+
+    async def respond(self, body: Any, status_code: int = 200):
+        """
+        Зберігає результат під ключем. Без ключа повертає body без змін.
+        """
+        if self.key is None:
+            return body
+        content = jsonable_encoder(body)
+        await self.store.complete(self.key, StoredResponse(status_code, content))
+        self.completed = True
+        return JSONResponse(content=content, status_code=status_code)
+
+
+def request_fingerprint(request: Request, body: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.url.path.encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def idempotency(required: bool = False):
+    """
+    Залежність для POST-ендпоінтів. Якщо required, запит без
+    Idempotency-Key отримує 400.
+    """
+    async def dependency(
+        request: Request,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    ):
+        if not idempotency_key:
+            if required:
+                raise HTTPException(status_code=400, detail="idempotency_key_required")
+            yield IdempotencyContext(None, None)
+            return
+
+        fingerprint = request_fingerprint(request, await request.body())
+        store = get_idempotency_store()
+        replay = await store.claim(idempotency_key, fingerprint)
+        context = IdempotencyContext(store, idempotency_key, replay)
+        try:
+            yield context
+        finally:
+            if replay is None and not context.completed:
+                await store.release(idempotency_key)
+
+    return dependency
@@ -1,171 +1,200 @@
-import time
+import asyncio
 import uuid
-import os
+import time
 from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware  # <--- 1. ДОДАНО ІМПОРТ
-from passlib.context import CryptContext
 import logging
-from opentelemetry import trace
-
-# ... (Ваші OpenTelemetry імпорти залишаються без змін) ...
-from opentelemetry._logs import set_logger_provider
-from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler
-from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
-from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
 from opentelemetry.sdk.resources import Resource
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.metrics import set_meter_provider
-from opentelemetry.sdk.metrics import MeterProvider
-from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
 
 # Local Imports
-from db import connect_to_db, disconnect_from_db, database
-from routers import customers, cars, services, auth, invoices, invoice_items, users
-from shared_state import rate_limit_store
-
-# --- Constants ---
-WINDOW_MS = 2000
-MAX_REQUESTS = 30
-
-# ... (OpenTelemetry Setup залишається без змін) ...
-resource = Resource(attributes={
-    "service.name": os.getenv("OTEL_SERVICE_NAME", "sto-crm-backend"),
-    "deployment.environment": os.getenv("APP_ENV", "development")
-})
-otlp_endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://collector:4318")
-
-# Traces, Metrics, Logs setup... (без змін)
-trace_provider = TracerProvider(resource=resource)
-trace_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{otlp_endpoint}/v1/traces")))
-trace.set_tracer_provider(trace_provider)
-
-metric_reader = PeriodicExportingMetricReader(
-    OTLPMetricExporter(endpoint=f"{otlp_endpoint}/v1/metrics"),
-    export_interval_millis=2000
-)
-meter_provider = MeterProvider(resource=resource, metric_readers=[metric_reader])
-set_meter_provider(meter_provider)
-
-logger_provider = LoggerProvider(resource=resource)
-logger_provider.add_log_record_processor(BatchLogRecordProcessor(OTLPLogExporter(endpoint=f"{otlp_endpoint}/v1/logs")))
-set_logger_provider(logger_provider)
-
-handler = LoggingHandler(level=logging.NOTSET, logger_provider=logger_provider)
-logging.getLogger().addHandler(handler)
-logging.getLogger().setLevel(logging.INFO)
+from db import configure_database, connect_to_db, disconnect_from_db, replica_configured
+from replica import READ_METHODS, remember_write
+from db_pool import POOL_MIN_SIZE, PoolTimeout
+from request_logging import RequestLoggingMiddleware, install_queue_logging, uninstall_queue_logging
+from telemetry import start_telemetry
+from routers import customers, cars, services, auth, invoices, invoice_items, users, service_records, search, reports, schedule, debug
+from rate_limit import RateLimit, RateLimitMiddleware, TokenBucketLimiter
+from pagination import NEXT_CURSOR_HEADER
+from auth.passwords import password_hasher
+from services_catalog import services_catalog
+from settings import Settings
+
+# Застосунок збирає create_app(settings). Імпорт модуля нічого не підключає:
+# телеметрія (з потоками експортерів) і пул БД створюються в lifespan, тобто в
+# кожному воркері вже після fork. Після старту lifespan у фоні прогріває пул і
+# кеш каталогу послуг; до кінця прогріву /ready відповідає 503, /health - одразу.
+
+# Між невдалими спробами прогріву (БД ще недоступна)
+WARM_UP_RETRY_S = 1.0
+
+
+def build_rate_limiter(settings: Settings) -> TokenBucketLimiter:
+    # Жорсткіші ліміти для важких спискових ендпоінтів та експортів
+    list_limit = RateLimit(max_requests=15, window_ms=settings.rate_limit_window_ms)
+    export_limit = RateLimit(max_requests=5, window_ms=60_000)
+    route_limits = {
+        ("GET", "/customers/"): list_limit,
+        ("GET", "/cars/"): list_limit,
+        ("GET", "/invoices/"): list_limit,
+        ("GET", "/service-records/"): list_limit,
+        ("GET", "/users/"): list_limit,
+        ("GET", "/invoices/export"): export_limit,
+        ("GET", "/service-records/export"): export_limit,
+    }
+    return TokenBucketLimiter(
+        default=RateLimit(max_requests=settings.rate_limit_max_requests, window_ms=settings.rate_limit_window_ms),
+        overrides=route_limits,
+    )
+
+
+async def warm_up(app: FastAPI):
+    """
+    Відкриває й перевіряє POOL_MIN_SIZE з'єднань пулу і завантажує каталог
+    послуг, після чого /ready відповідає 200. Недоступна БД - повтор через
+    WARM_UP_RETRY_S.
+    """
+    database = configure_database()
+    while True:
+        try:
+            await asyncio.gather(*(database.fetch_val("SELECT 1") for _ in range(POOL_MIN_SIZE)))
+            await services_catalog.current(database)
+            break
+        except Exception as exc:
+            logging.warning(f"Warm-up failed, retrying: {exc}")
+            await asyncio.sleep(WARM_UP_RETRY_S)
+    app.state.ready = True
+    logging.info(
+        "Backend ready in %.0f ms, telemetry mode: %s",
+        (time.perf_counter() - app.state.started_at) * 1000, app.state.settings.telemetry_mode,
+    )
 
 
 # --- FastAPI App ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await connect_to_db()
+    settings: Settings = app.state.settings
+    app.state.started_at = time.perf_counter()
+    # Режим (otlp / memory / off), семплінг трейсів з хвоста і метрики експорту - telemetry.py
+    resource = Resource(attributes={
+        "service.name": settings.service_name,
+        "deployment.environment": settings.environment,
+    })
+    telemetry = start_telemetry(settings.telemetry_mode, resource, settings.otlp_endpoint)
+    # Обробник логів працює у фоновому потоці, запити лише кладуть записи в чергу
+    log_listener = install_queue_logging(telemetry.log_handler)
+    logging.getLogger().setLevel(logging.INFO)
+    log_listener.start()
+    await connect_to_db(settings.database_url, settings.database_replica_url)
+    warming = asyncio.create_task(warm_up(app))
     yield
+    app.state.ready = False
+    warming.cancel()
+    await asyncio.gather(warming, return_exceptions=True)
     await disconnect_from_db()
-
-
-app = FastAPI(
-    title="CRM для СТО",
-    description="System for Car Service",
-    version="1.0.0",
-    lifespan=lifespan
-)
-
-# --- 2. CORS CONFIGURATION (НОВИЙ БЛОК) ---
-# Це виправить помилку 405 для OPTIONS запитів
-origins = [
-    "http://localhost:3000",  # React / Next.js за замовчуванням
-    "http://127.0.0.1:3000",
-    "http://localhost:5173",  # Vite за замовчуванням
-    "http://localhost:8080",
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,  # Дозволені джерела
-    allow_credentials=True,  # Дозволяє cookies/authorization headers
-    allow_methods=["*"],  # Дозволяє всі методи (GET, POST, OPTIONS, PUT, DELETE)
-    allow_headers=["*"],  # Дозволяє всі заголовки
-)
-# ------------------------------------------
-
-# Instrument FastAPI
-FastAPIInstrumentor.instrument_app(app, meter_provider=meter_provider)
-
-
-# --- Middlewares ---
-@app.middleware("http")
-async def structured_logging_middleware(request: Request, call_next):
-    # ... (Ваш код логування без змін) ...
-    start_time = time.time()
-    span = trace.get_current_span()
-    trace_id = span.get_span_context().trace_id
-    span_id = span.get_span_context().span_id
-
-    response = await call_next(request)
-
-    duration = time.time() - start_time
-
-    log_details = {
-        "http.method": request.method,
-        "http.url": str(request.url),
-        "http.status_code": response.status_code,
-        "http.duration_ms": round(duration * 1000, 2),
-        "http.client_ip": request.client.host,
-        "trace_id": format(trace_id, 'x'),
-        "span_id": format(span_id, 'x'),
-    }
-
-    message = f'{request.client.host} - "{request.method} {request.url.path} HTTP/1.1" {response.status_code}'
-
-    if 400 <= response.status_code < 500:
-        logging.warning(message, extra=log_details)
-    elif response.status_code >= 500:
-        logging.error(message, extra=log_details)
-    else:
-        logging.info(message, extra=log_details)
-
-    return response
-
-
-# ... (other middlewares & handlers) ...
-
-@app.exception_handler(Exception)
-async def unified_error_handler(request: Request, exc: Exception):
-    logging.error(f"Unhandled exception for {request.method} {request.url.path}: {exc}", exc_info=True)
-    return JSONResponse(status_code=500, content={"error": "internal_error"})
-
-
-# --- Routers ---
-app.include_router(customers.router)
-app.include_router(cars.router)
-app.include_router(services.router)
-app.include_router(auth.router)
-app.include_router(invoices.router)
-app.include_router(invoice_items.router)
-app.include_router(users.router)
-
-
-# --- Endpoints ---
-@app.get("/")
-async def root():
-    return {"message": "CRM API is running"}
-
-
-@app.get("/health")
-async def health_check():
-    return {"status": "ok"}
-
-
-@app.get("/error")
-async def trigger_error():
-    logging.error("This is a simulated error endpoint.")
-    return JSONResponse(status_code=500, content={"error": "simulated_error"})
-
-
-logging.info("Backend service started and configured for OTLP logging.")
\ No newline at end of file
+    password_hasher.shutdown()
+    uninstall_queue_logging(log_listener)
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    settings = settings or Settings.from_env()
+    app = FastAPI(
+        title="CRM для СТО",
+        description="System for Car Service",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    app.state.settings = settings
+    app.state.ready = False
+    app.state.rate_limiter = build_rate_limiter(settings)
+
+    # Rate limiting додається перед CORS, щоб відповіді 429 теж мали CORS-заголовки
+    app.add_middleware(RateLimitMiddleware, limiter=app.state.rate_limiter, exempt_paths=["/health", "/ready"])
+
+    # --- 2. CORS CONFIGURATION (НОВИЙ БЛОК) ---
+    # Це виправить помилку 405 для OPTIONS запитів
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_origins,  # Дозволені джерела
+        allow_credentials=True,  # Дозволяє cookies/authorization headers
+        allow_methods=["*"],  # Дозволяє всі методи (GET, POST, OPTIONS, PUT, DELETE)
+        allow_headers=["*"],  # Дозволяє всі заголовки
+        expose_headers=[NEXT_CURSOR_HEADER, "Retry-After", "ETag", "Last-Modified"],  # Курсор пагінації, Retry-After і валідатори кешу мають бути видимими для фронтенду
+    )
+    # ------------------------------------------
+
+    # Instrument FastAPI: глобальні провайдери з'являться в lifespan, до того
+    # інструментація пише в no-op проксі OpenTelemetry
+    if settings.telemetry_mode != "off":
+        FastAPIInstrumentor.instrument_app(app)
+
+    # --- Middlewares ---
+    # Логування запитів: семплінг, ліниве форматування, черга (request_logging.py)
+    app.add_middleware(RequestLoggingMiddleware)
+
+    @app.middleware("http")
+    async def read_your_writes_middleware(request: Request, call_next):
+        response = await call_next(request)
+        # Після запису клієнт якийсь час читає з primary, а не з репліки, що відстає
+        if replica_configured() and request.method not in READ_METHODS and response.status_code < 500:
+            remember_write(response)
+        return response
+
+    # ... (other middlewares & handlers) ...
+
+    @app.exception_handler(PoolTimeout)
+    async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+        # Пул вичерпано - клієнт може повторити трохи згодом
+        logging.warning(f"Database pool exhausted for {request.method} {request.url.path}: {exc}")
+        return JSONResponse(status_code=503, content={"error": "database_busy"}, headers={"Retry-After": "1"})
+
+    @app.exception_handler(Exception)
+    async def unified_error_handler(request: Request, exc: Exception):
+        logging.error(f"Unhandled exception for {request.method} {request.url.path}: {exc}", exc_info=True)
+        return JSONResponse(status_code=500, content={"error": "internal_error"})
+
+    # --- Routers ---
+    app.include_router(customers.router)
+    app.include_router(cars.router)
+    app.include_router(services.router)
+    app.include_router(auth.router)
+    app.include_router(invoices.router)
+    app.include_router(invoice_items.router)
+    app.include_router(users.router)
+    app.include_router(service_records.router)
+    app.include_router(search.router)
+    app.include_router(reports.router)
+    app.include_router(schedule.router)
+    app.include_router(debug.router)
+
+    # --- Endpoints ---
+    @app.get("/")
+    async def root():
+        return {"message": "CRM API is running"}
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "ok"}
+
+    @app.get("/ready")
+    async def readiness_check(request: Request):
+        # Трафік на воркер - лише після прогріву пулу й кешів (warm_up)
+        if not request.app.state.ready:
+            return JSONResponse(status_code=503, content={"status": "starting"})
+        return {"status": "ready"}
+
+    @app.get("/error")
+    async def trigger_error():
+        logging.error("This is a simulated error endpoint.")
+        return JSONResponse(status_code=500, content={"error": "simulated_error"})
+
+    return app
+
+
+# Для uvicorn main:app; інші налаштування (тести, бенчмарки) - create_app(Settings(...))
+app = create_app()
+rate_limiter = app.state.rate_limiter
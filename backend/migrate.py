@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import hashlib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Версійні міграції схеми. Файли migrations/NNNN_назва.sql застосовуються по
+# порядку, кожен рівно один раз; застосовані версії записуються в schema_migrations.
+# Одночасний запуск з кількох контейнерів серіалізується advisory lock-ом.
+#
+# База, створена з init_db.sql до появи міграцій (таблиці є, schema_migrations
+# немає), вважається базовою схемою 0001 - решта міграцій доганяє її до поточної.
+#
+#     python migrate.py            # застосувати нові міграції
+#     python migrate.py --status   # показати застосовані та очікувані
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+# Міграція з цим першим рядком виконується поза транзакцією (CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+CONCURRENT_INDEX = re.compile(
+    r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I
+)
+BASELINE_VERSION = 1
+LOCK_KEY = 0x53544F4D  # "STOM"
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+    def statements(self) -> List[str]:
+        # Спершу прибираємо рядки-коментарі: у них теж може трапитися ";"
+        code = "\n".join(line for line in self.sql.splitlines() if not line.strip().startswith("--"))
+        return [statement.strip() for statement in code.split(";") if statement.strip()]
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in sorted(directory.glob("*.sql")):
+        match = FILE_PATTERN.match(path.name)
+        if not match:
+            raise MigrationError(f"Invalid migration file name: {path.name}")
+        migrations.append(Migration(int(match[1]), match[2], path.read_text(encoding="utf-8")))
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise MigrationError("Duplicate migration versions")
+    return migrations
+
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+
+async def _applied(conn) -> Dict[int, str]:
+    if await conn.fetchval("SELECT to_regclass('schema_migrations') IS NULL"):
+        return {}
+    rows = await conn.fetch("SELECT version, checksum FROM schema_migrations")
+    return {row["version"]: row["checksum"] for row in rows}
+
+
+async def _record(conn, migration: Migration):
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)",
+        migration.version, migration.name, migration.checksum,
+    )
+
+
+async def _index_invalid(conn, name: str) -> Optional[bool]:
+    """
+    None - індексу немає; True - він лишився INVALID після збою CONCURRENTLY.
+    """
+    return await conn.fetchval(
+        "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)", name
+    )
+
+
+async def _run_no_transaction(conn, migration: Migration):
+    # Після збою CREATE INDEX CONCURRENTLY індекс лишається INVALID, і повторний
+    # IF NOT EXISTS його пропустив би - такий індекс видаляємо і будуємо заново.
+    # Решта операторів мають бути ідемпотентними (IF NOT EXISTS).
+    indexes = []
+    for statement in migration.statements():
+        match = CONCURRENT_INDEX.match(statement)
+        if match:
+            indexes.append(match[1])
+            if await _index_invalid(conn, match[1]):
+                await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match[1]}")
+        await conn.execute(statement)
+    invalid = [name for name in indexes if await _index_invalid(conn, name)]
+    if invalid:
+        raise MigrationError(
+            f"Migration {migration.version:04d}_{migration.name} left invalid indexes: {', '.join(invalid)}"
+        )
+
+
+def _check_checksums(applied: Dict[int, str], migrations: List[Migration]):
+    for migration in migrations:
+        checksum = applied.get(migration.version)
+        if checksum is not None and checksum != migration.checksum:
+            raise MigrationError(
+                f"Migration {migration.version:04d}_{migration.name} was changed after it was applied"
+            )
+
+
+async def _migrate(conn, migrations: List[Migration]) -> List[Migration]:
+    legacy = await conn.fetchval(
+        "SELECT to_regclass('schema_migrations') IS NULL AND to_regclass('customers') IS NOT NULL"
+    )
+    await conn.execute(CREATE_MIGRATIONS_TABLE)
+    if legacy and migrations and migrations[0].version == BASELINE_VERSION:
+        await _record(conn, migrations[0])
+
+    applied = await _applied(conn)
+    _check_checksums(applied, migrations)
+    done = []
+    for migration in migrations:
+        if migration.version in applied:
+            continue
+        if migration.transactional:
+            async with conn.transaction():
+                await conn.execute(migration.sql)
+                await _record(conn, migration)
+        else:
+            await _run_no_transaction(conn, migration)
+            await _record(conn, migration)
+        done.append(migration)
+    return done
+
+
+async def migrate(database, migrations: Optional[List[Migration]] = None) -> List[Migration]:
+    """
+    Застосовує всі ще не застосовані міграції. Повертає список застосованих.
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    async with database.connection() as connection:
+        conn = connection.raw_connection
+        await conn.execute("SELECT pg_advisory_lock($1)", LOCK_KEY)
+        # Індекси на великих таблицях будуються довше за DB_STATEMENT_TIMEOUT_MS пулу
+        await conn.execute("SET statement_timeout = 0")
+        try:
+            return await _migrate(conn, migrations)
+        finally:
+            await conn.execute("RESET statement_timeout")
+            await conn.execute("SELECT pg_advisory_unlock($1)", LOCK_KEY)
+
+
+async def migration_status(database, migrations: Optional[List[Migration]] = None) -> List[Tuple[Migration, bool]]:
+    migrations = load_migrations() if migrations is None else migrations
+    async with database.connection() as connection:
+        applied = await _applied(connection.raw_connection)
+    _check_checksums(applied, migrations)
+    return [(migration, migration.version in applied) for migration in migrations]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Застосовує міграції схеми БД")
+    parser.add_argument("--status", action="store_true", help="лише показати стан міграцій")
+    args = parser.parse_args()
+
+    from db import configure_database
+    database = configure_database()
+    await database.connect()
+    try:
+        if args.status:
+            for migration, applied in await migration_status(database):
+                mark = "applied" if applied else "pending"
+                print(f"{migration.version:04d}_{migration.name}: {mark}")
+        else:
+            done = await migrate(database)
+            for migration in done:
+                print(f"applied {migration.version:04d}_{migration.name}")
+            if not done:
+                print("schema is up to date")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+-- Початкова схема (init_db.sql до появи міграцій)
+
+-- Create Users table
+CREATE TABLE users (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(100) UNIQUE NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    role VARCHAR(20) CHECK (role IN ('admin', 'master', 'manager')) NOT NULL DEFAULT 'master',
+    is_active BOOLEAN DEFAULT TRUE,
+    last_login TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create Customers table
+CREATE TABLE customers (
+    id SERIAL PRIMARY KEY,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    phone VARCHAR(20),
+    email VARCHAR(100),
+    address VARCHAR(255),
+    created_by INT REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create Cars table
+CREATE TABLE cars (
+    id SERIAL PRIMARY KEY,
+    customer_id INTEGER REFERENCES customers(id) ON DELETE CASCADE,
+    brand TEXT,
+    model TEXT,
+    year INTEGER,
+    vin TEXT,
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now()
+);
+
+-- Create Services table
+CREATE TABLE services (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    price NUMERIC(10,2) NOT NULL,
+    duration INT NOT NULL, -- in minutes
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+
+
+-- Create ENUM for payment status
+CREATE TYPE payment_status_enum AS ENUM ('unpaid', 'partial', 'paid');
+
+-- Create Invoices table
+CREATE TABLE invoices (
+    id SERIAL PRIMARY KEY,
+    customer_id INTEGER REFERENCES customers(id) ON DELETE CASCADE,
+    car_id INTEGER REFERENCES cars(id) ON DELETE CASCADE,
+    total_amount NUMERIC(10,2) NOT NULL,
+    issue_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    due_date TIMESTAMP,
+    payment_status payment_status_enum DEFAULT 'unpaid',
+    work_status VARCHAR(20) DEFAULT 'new',
+    created_by INT REFERENCES users(id),
+    worker_id INT REFERENCES users(id),
+    service_id INTEGER REFERENCES services(id),
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now()
+);
+
+-- Create Invoice Items table
+CREATE TABLE invoice_items (
+    id SERIAL PRIMARY KEY,
+    invoice_id INTEGER REFERENCES invoices(id) ON DELETE CASCADE,
+    service_id INTEGER REFERENCES services(id) ON DELETE CASCADE,
+    quantity INT NOT NULL,
+    unit_price NUMERIC(10,2) NOT NULL,
+    total NUMERIC(10,2) GENERATED ALWAYS AS (quantity * unit_price) STORED,
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now()
+);
+-- Create Service Records table
+CREATE TABLE service_records (
+    id SERIAL PRIMARY KEY,
+    car_id INTEGER REFERENCES cars(id) ON DELETE CASCADE,
+    service_id INTEGER REFERENCES services(id) ON DELETE CASCADE,
+    performed_by INT REFERENCES users(id),
+    date TIMESTAMP NOT NULL,
+    mileage INT,
+    notes TEXT,
+    invoice_id INTEGER REFERENCES invoices(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now()
+);
+-- Додаємо індекси
+CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_cars_vin ON cars(vin);
+CREATE INDEX IF NOT EXISTS idx_customers_created_at ON customers(created_at);
+CREATE INDEX IF NOT EXISTS idx_cars_created_at ON cars(created_at);
+CREATE INDEX IF NOT EXISTS idx_services_created_at ON services(created_at);
+CREATE INDEX IF NOT EXISTS idx_invoices_created_at ON invoices(created_at);
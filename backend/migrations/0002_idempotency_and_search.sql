@@ -0,0 +1,34 @@
+-- Ідемпотентність (IDEMPOTENCY_BACKEND=postgres) і унікальний VIN для bulk upsert.
+-- Індекси історії авто та пошуку - в 0003 (CONCURRENTLY, поза транзакцією)
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status_code INT,
+    response JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+
+-- Неунікальний idx_cars_vin з базової схеми замінюємо унікальним (ON CONFLICT (vin)).
+-- У живій базі VIN могли повторюватися - тоді зупиняємось зі списком дублікатів,
+-- а не з помилкою CREATE UNIQUE INDEX; їх треба об'єднати або виправити вручну.
+DO $$
+DECLARE
+    duplicates TEXT;
+BEGIN
+    SELECT string_agg(format('%s (ids %s)', vin, ids), ', ')
+    INTO duplicates
+    FROM (
+        SELECT vin, string_agg(id::text, ', ' ORDER BY id) AS ids
+        FROM cars WHERE vin IS NOT NULL
+        GROUP BY vin HAVING count(*) > 1
+        ORDER BY vin LIMIT 20
+    ) d;
+    IF duplicates IS NOT NULL THEN
+        RAISE EXCEPTION 'cars.vin must be unique before migration 0002, duplicate VINs: %', duplicates
+            USING HINT = 'SELECT vin, array_agg(id) FROM cars WHERE vin IS NOT NULL GROUP BY vin HAVING count(*) > 1';
+    END IF;
+END $$;
+DROP INDEX IF EXISTS idx_cars_vin;
+CREATE UNIQUE INDEX idx_cars_vin ON cars(vin);
@@ -0,0 +1,38 @@
+-- migrate: no-transaction
+-- Індекси під фільтри CRUD-запитів і під зовнішні ключі (каскадні видалення та
+-- перевірки FK при видаленні батьківського рядка). CONCURRENTLY - щоб не блокувати
+-- запис у живій базі, тому міграція виконується поза транзакцією.
+
+-- GET /cars?customer_id=, огляд клієнта; cars.customer_id ON DELETE CASCADE
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cars_customer_id ON cars(customer_id, id);
+-- GET /invoices?worker_id=, експорт за майстром
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoices_worker_id ON invoices(worker_id, id);
+-- Огляд клієнта; invoices.customer_id ON DELETE CASCADE
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoices_customer_id ON invoices(customer_id, id);
+-- Експорт за періодом
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoices_issue_date ON invoices(issue_date, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoices_car_id ON invoices(car_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoices_service_id ON invoices(service_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoices_created_by ON invoices(created_by);
+-- Позиції інвойсу; invoice_items.invoice_id ON DELETE CASCADE
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoice_items_invoice_id ON invoice_items(invoice_id, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoice_items_service_id ON invoice_items(service_id);
+-- GET /service-records (date DESC, id DESC) та експорт за періодом
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_records_date ON service_records(date, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_records_service_id ON service_records(service_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_records_invoice_id ON service_records(invoice_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_records_performed_by ON service_records(performed_by, date, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_created_by ON customers(created_by);
+
+-- Історія авто (crud/cars.py)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_records_car_id_date ON service_records(car_id, date, id);
+-- Пошук за префіксом/суфіксом (crud/search.py)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_last_name_prefix ON customers (lower(last_name) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_first_name_prefix ON customers (lower(first_name) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_email_prefix ON customers (lower(email) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_phone_digits_prefix ON customers (regexp_replace(phone, '\D', '', 'g') text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_phone_digits_suffix ON customers (reverse(regexp_replace(phone, '\D', '', 'g')) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cars_vin_prefix ON cars (upper(vin) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cars_vin_suffix ON cars (reverse(upper(vin)) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cars_brand_prefix ON cars (lower(brand) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cars_model_prefix ON cars (lower(model) text_pattern_ops);
@@ -0,0 +1,7 @@
+-- Версії довідників для кешу в процесі (services_catalog.py). Починаються з
+-- поточного часу в мс, щоб після перестворення бази не збігтися зі старими
+CREATE TABLE IF NOT EXISTS catalog_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT (extract(epoch FROM clock_timestamp()) * 1000)::BIGINT
+);
+INSERT INTO catalog_versions (name) VALUES ('services') ON CONFLICT (name) DO NOTHING;
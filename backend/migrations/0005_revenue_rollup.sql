@@ -0,0 +1,19 @@
+-- Зведення виручки для /reports (crud/revenue.py). Далі його підтримують crud-
+-- запити, що пишуть invoices та invoice_items, а тут заповнюється наявна історія
+CREATE TABLE IF NOT EXISTS revenue_rollup (
+    dimension TEXT NOT NULL,
+    day DATE NOT NULL,
+    key INT NOT NULL,
+    amount NUMERIC(14,2) NOT NULL DEFAULT 0,
+    units INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, day, key)
+);
+INSERT INTO revenue_rollup (dimension, day, key, amount, units)
+SELECT 'worker', CAST(issue_date AS date), COALESCE(worker_id, 0), sum(total_amount), count(*)
+FROM invoices
+GROUP BY 2, 3
+UNION ALL
+SELECT 'service', CAST(inv.issue_date AS date), COALESCE(it.service_id, 0), sum(it.total), sum(it.quantity)
+FROM invoice_items it JOIN invoices inv ON inv.id = it.invoice_id
+GROUP BY 2, 3
+ON CONFLICT (dimension, day, key) DO NOTHING;
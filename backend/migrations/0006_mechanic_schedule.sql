@@ -0,0 +1,6 @@
+-- Зайнятість майстрів для /schedule/availability (crud/schedule.py): запис займає
+-- майстра на тривалість послуги, зафіксовану при записі. Наявні записи отримують
+-- поточну тривалість своїх послуг.
+ALTER TABLE service_records ADD COLUMN IF NOT EXISTS duration INT NOT NULL DEFAULT 0;
+UPDATE service_records r SET duration = s.duration FROM services s WHERE s.id = r.service_id AND r.duration = 0;
+CREATE INDEX IF NOT EXISTS idx_service_records_busy ON service_records USING gist (tsrange(date, date + duration * interval '1 minute'));
@@ -0,0 +1,97 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+
+from fastapi import HTTPException, Query, Response
+
+# Keyset (cursor) пагінація для спискових ендпоінтів.
+# Тіло відповіді лишається масивом, а курсор наступної сторінки
+# повертається в заголовку X-Next-Cursor.
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: dict) -> str:
+    """
+    Пакує значення ключа останнього рядка в непрозорий курсор.
+    """
+    payload = {
+        k: v.isoformat() if isinstance(v, datetime) else v
+        for k, v in values.items()
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[dict]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="invalid_cursor")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="invalid_cursor")
+    return values
+
+
+@dataclass
+class PageParams:
+    limit: int
+    after: Optional[dict] = None
+
+    @property
+    def fetch_limit(self) -> int:
+        # Беремо на один рядок більше, щоб знати, чи є наступна сторінка
+        return self.limit + 1
+
+    def after_id(self) -> Optional[int]:
+        if not self.after:
+            return None
+        try:
+            return int(self.after["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="invalid_cursor")
+
+    def after_date_id(self) -> tuple:
+        if not self.after:
+            return None, None
+        try:
+            return datetime.fromisoformat(self.after["date"]), int(self.after["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="invalid_cursor")
+
+
+def page_params(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+) -> PageParams:
+    return PageParams(limit=limit, after=decode_cursor(cursor))
+
+
+def id_key(item: Any) -> dict:
+    return {"id": item.id}
+
+
+def date_id_key(item: Any) -> dict:
+    return {"date": item.date, "id": item.id}
+
+
+def finalize_page(
+    response: Response,
+    items: List[Any],
+    page: PageParams,
+    key: Callable[[Any], dict] = id_key,
+) -> List[Any]:
+    """
+    Обрізає зайвий рядок і виставляє курсор наступної сторінки, якщо вона є.
+    """
+    if len(items) > page.limit:
+        items = items[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(items[-1]))
+    return items
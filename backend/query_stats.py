@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Deque, Dict, List, Optional
+
+from opentelemetry import metrics, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+# Статистика SQL-запитів з crud-модулів.
+#
+# get_db віддає ендпоінтам не сам Database, а InstrumentedDatabase: кожен
+# fetch_*/execute/iterate отримує спан (дочірній до спану запиту) і точку в
+# гістограмі db.query.duration. Запити групуються за відбитком (fingerprint) -
+# SQL без значень: літерали й :параметри замінено на ?, списки IN (?, ?, ...) -
+# на IN (?), пробіли стиснуто. Відбиток рахується один раз на текст запиту.
+#
+# Для /debug/queries у пам'яті процесу зберігаються:
+# - підсумки за відбитками (виклики, помилки, сумарний і найдовший час);
+# - кільцевий буфер останніх DB_SLOW_QUERY_LOG_SIZE запитів, довших за
+#   DB_SLOW_QUERY_MS, - з типами параметрів (не значеннями) і, якщо
+#   DB_SLOW_QUERY_EXPLAIN=1, планом EXPLAIN (без ANALYZE, тобто запит не
+#   виконується вдруге; один раз на відбиток, у фоні).
+
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("DB_SLOW_QUERY_LOG_SIZE", 100))
+SLOW_QUERY_EXPLAIN = os.getenv("DB_SLOW_QUERY_EXPLAIN", "0") == "1"
+# Скільки різних відбитків тримати в підсумках
+MAX_FINGERPRINTS = 1000
+
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+duration_histogram = meter.create_histogram(
+    "db.query.duration",
+    unit="ms",
+    description="SQL query latency by normalized query fingerprint",
+)
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAM = re.compile(r"(?<!:):\w+")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+_TARGET = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+([a-z_][\w.]*)", re.I)
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    id: str
+    statement: str
+    operation: str
+    span_name: str
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> Fingerprint:
+    statement = _COMMENT.sub(" ", query)
+    statement = _STRING.sub("?", statement)
+    statement = _PARAM.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _SPACE.sub(" ", statement).strip()
+    statement = _IN_LIST.sub("(?)", statement)
+    operation = statement.split(" ", 1)[0].upper() if statement else ""
+    target = _TARGET.search(statement)
+    return Fingerprint(
+        id=hashlib.sha1(statement.encode()).hexdigest()[:16],
+        statement=statement,
+        operation=operation,
+        span_name=f"{operation} {target.group(1)}" if target else operation,
+    )
+
+
+def param_shapes(values: Optional[dict]) -> Dict[str, str]:
+    """
+    Типи параметрів замість значень (у значеннях можуть бути персональні дані).
+    """
+    shapes = {}
+    for name, value in (values or {}).items():
+        if isinstance(value, (list, tuple)):
+            shapes[name] = f"{type(value).__name__}[{len(value)}]"
+        else:
+            shapes[name] = type(value).__name__
+    return shapes
+
+
+@dataclass
+class FingerprintStats:
+    fingerprint: Fingerprint
+    calls: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+
+@dataclass
+class SlowQuery:
+    fingerprint: Fingerprint
+    duration_ms: float
+    params: Dict[str, str]
+    database: str
+    at: datetime
+    plan: Optional[str] = None
+
+
+@dataclass
+class QueryStats:
+    slow_ms: float = SLOW_QUERY_MS
+    explain: bool = SLOW_QUERY_EXPLAIN
+    by_fingerprint: Dict[str, FingerprintStats] = field(default_factory=dict)
+    slow: Deque[SlowQuery] = field(default_factory=lambda: deque(maxlen=SLOW_QUERY_LOG_SIZE))
+    _explained: set = field(default_factory=set)
+    _explaining: set = field(default_factory=set)
+
+    def record(self, database, role: str, query: Fingerprint, text: str, values, duration_ms: float, failed: bool):
+        stats = self.by_fingerprint.get(query.id)
+        if stats is None and len(self.by_fingerprint) < MAX_FINGERPRINTS:
+            stats = self.by_fingerprint[query.id] = FingerprintStats(query)
+        if stats is not None:
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+        if duration_ms < self.slow_ms:
+            return
+        entry = SlowQuery(query, duration_ms, param_shapes(values), role, datetime.now(timezone.utc))
+        self.slow.append(entry)
+        if self.explain and not failed and query.id not in self._explained:
+            self._explained.add(query.id)
+            task = asyncio.get_running_loop().create_task(self._explain(database, entry, text, values))
+            self._explaining.add(task)
+            task.add_done_callback(self._explaining.discard)
+
+    async def _explain(self, database, entry: SlowQuery, text: str, values):
+        try:
+            rows = await database.fetch_all(f"EXPLAIN {text}", values)
+            entry.plan = "\n".join(row[0] for row in rows)
+        except Exception as exc:
+            logging.warning(f"EXPLAIN failed for query {entry.fingerprint.id}: {exc}")
+            entry.plan = f"EXPLAIN failed: {exc}"
+
+    def top(self, limit: int) -> List[FingerprintStats]:
+        return sorted(self.by_fingerprint.values(), key=lambda stats: stats.total_ms, reverse=True)[:limit]
+
+    def clear(self):
+        self.by_fingerprint.clear()
+        self.slow.clear()
+        self._explained.clear()
+
+
+query_stats = QueryStats()
+
+
+class _Measure:
+    """
+    Спан, гістограма і QueryStats навколо одного запиту.
+    """
+
+    __slots__ = ("db", "text", "values", "query", "span", "started")
+
+    def __init__(self, db: "InstrumentedDatabase", query, values):
+        self.db = db
+        self.text = query if isinstance(query, str) else str(query)
+        self.values = values
+        self.query = fingerprint(self.text)
+
+    def __enter__(self):
+        # Спан не стає поточним: iterate віддає рядки між yield, і чужий
+        # контекст не має жити в коді, що їх споживає
+        self.span = tracer.start_span(self.query.span_name, kind=SpanKind.CLIENT, attributes={
+            "db.system": "postgresql",
+            "db.statement": self.query.statement,
+            "db.query.fingerprint": self.query.id,
+            "db.instance": self.db.role,
+        })
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        # GeneratorExit - споживач iterate зупинився раніше, це не помилка запиту
+        failed = exc is not None and not isinstance(exc, GeneratorExit)
+        if failed:
+            self.span.record_exception(exc)
+            self.span.set_status(Status(StatusCode.ERROR))
+        self.span.end()
+        duration_histogram.record(duration_ms, {"db.query.fingerprint": self.query.id, "error": failed})
+        query_stats.record(self.db.database, self.db.role, self.query, self.text, self.values, duration_ms, failed)
+        return False
+
+
+class InstrumentedDatabase:
+    """
+    Database з get_db з вимірюванням кожного запиту. Решта атрибутів
+    (transaction, connection, ...) - самого Database.
+    """
+
+    __slots__ = ("database", "role")
+
+    def __init__(self, database, role: str = "primary"):
+        self.database = database
+        self.role = role
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+    async def fetch_all(self, query, values: Optional[dict] = None):
+        with _Measure(self, query, values):
+            return await self.database.fetch_all(query, values)
+
+    async def fetch_one(self, query, values: Optional[dict] = None):
+        with _Measure(self, query, values):
+            return await self.database.fetch_one(query, values)
+
+    async def fetch_val(self, query, values: Optional[dict] = None, column=0):
+        with _Measure(self, query, values):
+            return await self.database.fetch_val(query, values, column=column)
+
+    async def execute(self, query, values: Optional[dict] = None):
+        with _Measure(self, query, values):
+            return await self.database.execute(query, values)
+
+    async def execute_many(self, query, values: list):
+        with _Measure(self, query, values[0] if values else None):
+            return await self.database.execute_many(query, values)
+
+    async def iterate(self, query, values: Optional[dict] = None):
+        # Час - до останнього рядка, разом з тим, як довго їх споживали
+        with _Measure(self, query, values):
+            async for row in self.database.iterate(query, values):
+                yield row
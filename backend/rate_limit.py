@@ -0,0 +1,123 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from auth.jwt import decode_access_token
+
+# Token bucket rate limiter. Кожен клієнт (JWT "sub" або IP) має відро на
+# max_requests токенів, яке наповнюється рівномірно за window_ms. Важкі
+# ендпоінти мають окремі, жорсткіші відра. Вартість перевірки - O(1).
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    max_requests: int
+    window_ms: int
+
+    @property
+    def window_s(self) -> float:
+        return self.window_ms / 1000
+
+    @property
+    def refill_per_s(self) -> float:
+        return self.max_requests / self.window_s
+
+
+class TokenBucketLimiter:
+    def __init__(
+        self,
+        default: RateLimit,
+        overrides: Optional[Dict[Tuple[str, str], RateLimit]] = None,
+        max_buckets: int = 10000,
+    ):
+        self.default = default
+        # (method, path без кінцевого "/") -> RateLimit
+        self.overrides = {(m, p.rstrip("/")): limit for (m, p), limit in (overrides or {}).items()}
+        self.max_buckets = max_buckets
+        # (client key, route) -> [tokens, last_seen, RateLimit]; порядок = LRU
+        self._buckets: OrderedDict = OrderedDict()
+
+    def hit(self, client_key: str, method: str, path: str) -> float:
+        """
+        Списує токен. Повертає 0, якщо запит дозволено, інакше - скільки
+        секунд чекати до наступного токена.
+        """
+        route = (method, path.rstrip("/"))
+        limit = self.overrides.get(route)
+        bucket_key = (client_key, route if limit else None)
+        limit = limit or self.default
+        now = time.monotonic()
+
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = [float(limit.max_requests), now, limit]
+            self._buckets[bucket_key] = bucket
+            self._evict(now)
+        else:
+            self._buckets.move_to_end(bucket_key)
+            bucket[0] = min(limit.max_requests, bucket[0] + (now - bucket[1]) * limit.refill_per_s)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / limit.refill_per_s
+
+    def clear(self):
+        self._buckets.clear()
+
+    def _evict(self, now: float):
+        # Відро, яке простояло повне вікно, вже повне - його можна забути
+        while self._buckets:
+            _, (_, last_seen, limit) = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.max_buckets and now - last_seen < limit.window_s:
+                break
+            self._buckets.popitem(last=False)
+
+
+def client_key(scope) -> str:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                payload = decode_access_token(token)
+                if payload and payload.get("sub"):
+                    return f"user:{payload['sub']}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware: 429 + Retry-After, коли відро клієнта порожнє.
+    """
+
+    def __init__(self, app, limiter: TokenBucketLimiter, exempt_paths: Iterable[str] = ()):
+        self.app = app
+        self.limiter = limiter
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = self.limiter.hit(client_key(scope), scope["method"], scope["path"])
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        body = b'{"error":"rate_limited"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from fastapi import Request, Response
+from opentelemetry import metrics
+
+# Маршрутизація читань на репліку.
+#
+# GET/HEAD ідуть на репліку (DATABASE_REPLICA_URL), усе інше - на primary. Читання
+# лишаються на primary, якщо:
+# - клієнт щойно щось змінив: відповідь на запис ставить cookie PRIMARY_COOKIE
+#   на DB_READ_YOUR_WRITES_SECONDS (cookie, а не пам'ять процесу, бо наступний
+#   запит може потрапити на інший воркер);
+# - відставання репліки більше за DB_REPLICA_MAX_LAG секунд або вона недоступна -
+#   ReplicaMonitor перевіряє це у фоні кожні DB_REPLICA_CHECK_INTERVAL секунд.
+
+READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 5))
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 2))
+REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 1))
+PRIMARY_COOKIE = "db_primary_until"
+READ_METHODS = {"GET", "HEAD"}
+
+# Відставання: 0, якщо все отримане вже застосовано (інакше простій primary
+# виглядав би як відставання), і NULL - якщо це не репліка
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+meter = metrics.get_meter(__name__)
+routed_counter = meter.create_counter(
+    "db.routed_reads",
+    description="Read requests by the database they were routed to",
+)
+_monitors = []
+meter.create_observable_gauge(
+    "db.replica.lag",
+    unit="s",
+    callbacks=[lambda options: [metrics.Observation(m.lag) for m in _monitors if m.lag is not None]],
+    description="Replication lag seen by the last replica check",
+)
+
+
+class ReplicaMonitor:
+    """
+    Періодично міряє відставання репліки; healthy - чи можна зараз з неї читати.
+    """
+
+    def __init__(self, database, max_lag: float = REPLICA_MAX_LAG, interval: float = REPLICA_CHECK_INTERVAL):
+        self.database = database
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag: Optional[float] = None
+        self.healthy = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self) -> bool:
+        try:
+            lag = await self.database.fetch_val(LAG_QUERY)
+        except Exception as exc:  # недоступна репліка - не привід падати запитам
+            logging.warning(f"Replica check failed: {exc}")
+            self.lag, self.healthy = None, False
+            return False
+        # NULL - окремий інстанс без реплікації (напр. у тестах): відставання немає
+        self.lag = float(lag or 0)
+        healthy = self.lag <= self.max_lag
+        if healthy != self.healthy:
+            logging.warning(f"Replica {'back in use' if healthy else 'bypassed'}, lag {self.lag:.1f}s")
+        self.healthy = healthy
+        return healthy
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            _monitors.append(self)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            _monitors.remove(self)
+
+
+def recently_wrote(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def remember_write(response: Response):
+    """
+    Наступні DB_READ_YOUR_WRITES_SECONDS цей клієнт читає з primary.
+    """
+    until = time.time() + READ_YOUR_WRITES_SECONDS
+    response.set_cookie(
+        PRIMARY_COOKIE, f"{until:.3f}", max_age=int(READ_YOUR_WRITES_SECONDS) + 1, httponly=True, samesite="lax"
+    )
+
+
+def choose_database(request: Request, primary, replica, monitor: Optional[ReplicaMonitor]):
+    if replica is None or request.method not in READ_METHODS:
+        return primary
+    if recently_wrote(request):
+        target = "primary_after_write"
+    elif monitor is None or not monitor.healthy:
+        target = "primary_replica_lag"
+    else:
+        target = "replica"
+    routed_counter.add(1, {"target": target})
+    return replica if target == "replica" else primary
@@ -0,0 +1,190 @@
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from opentelemetry import context, metrics, trace
+
+# Логування запитів без витрат на шляху запиту.
+#
+# - Семплінг: успішні відповіді (< 400) пишуться з імовірністю LOG_SAMPLE_RATE,
+#   помилки (4xx/5xx) і запити довші за LOG_SLOW_REQUEST_MS - завжди. Рішення
+#   приймається до того, як щось форматується, тож відкинутий запис нічого не коштує.
+# - Ліниве форматування: middleware кладе в запис лише сирі значення (RequestLog),
+#   а URL, hex trace_id і текст повідомлення збираються вже у фоновому потоці.
+# - Черга: усі записи кореневого логера йдуть через QueueHandler у потік
+#   QueueListener, який і віддає їх OTel LoggingHandler-у. Черга обмежена
+#   (LOG_QUEUE_SIZE): якщо потік не встигає, записи відкидаються (logs.dropped),
+#   а запит не чекає. Контекст трасування запам'ятовується при записі і
+#   відновлюється в потоці - trace_id/span_id у логах ті самі.
+
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
+LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", 1000))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10_000))
+
+REQUEST_MESSAGE = '%s - "%s %s HTTP/1.1" %s'
+
+meter = metrics.get_meter(__name__)
+dropped_counter = meter.create_counter(
+    "logs.dropped",
+    description="Log records dropped because the logging queue was full",
+)
+
+
+class RequestLog:
+    """
+    Сирі дані запиту; атрибути логу з них рахує ExpandingHandler у фоновому потоці.
+    """
+
+    __slots__ = ("method", "scheme", "host", "path", "query", "client_ip", "status_code", "duration_ms",
+                 "span_context", "sample_rate")
+
+    def __init__(self, scope, status_code: int, duration_ms: float, span_context, sample_rate: float):
+        client = scope.get("client")
+        self.method = scope["method"]
+        self.scheme = scope.get("scheme", "http")
+        self.host = next((value for name, value in scope["headers"] if name == b"host"), b"")
+        self.path = scope["path"]
+        self.query = scope.get("query_string", b"")
+        self.client_ip = client[0] if client else None
+        self.status_code = status_code
+        self.duration_ms = duration_ms
+        self.span_context = span_context
+        self.sample_rate = sample_rate
+
+    def url(self) -> str:
+        url = f"{self.scheme}://{self.host.decode('latin-1')}{self.path}"
+        return f"{url}?{self.query.decode('latin-1')}" if self.query else url
+
+    def attributes(self) -> dict:
+        return {
+            "http.method": self.method,
+            "http.url": self.url(),
+            "http.status_code": self.status_code,
+            "http.duration_ms": round(self.duration_ms, 2),
+            "http.client_ip": self.client_ip,
+            "trace_id": format(self.span_context.trace_id, "x"),
+            "span_id": format(self.span_context.span_id, "x"),
+            "log.sample_rate": self.sample_rate,
+        }
+
+
+def sample_rate_for(status_code: int, duration_ms: float) -> float:
+    """
+    Частка таких запитів, що потрапляє в лог: помилки й повільні - усі.
+    """
+    if status_code >= 400 or duration_ms >= LOG_SLOW_REQUEST_MS:
+        return 1.0
+    return LOG_SAMPLE_RATE
+
+
+class RequestLoggingMiddleware:
+    """
+    ASGI middleware (без BaseHTTPMiddleware - він сам по собі помітно дорожчий
+    за логування): один запис на запит, зі статусом відповіді і тривалістю до
+    відправки тіла.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.log(scope, status_code, (time.perf_counter() - started) * 1000)
+
+    def log(self, scope, status_code: int, duration_ms: float):
+        sample_rate = sample_rate_for(status_code, duration_ms)
+        if sample_rate < 1 and random.random() >= sample_rate:
+            return
+        # log.sample_rate: кожен записаний успішний запит представляє 1 / sample_rate таких
+        entry = RequestLog(scope, status_code, duration_ms, trace.get_current_span().get_span_context(), sample_rate)
+        level = logging.ERROR if status_code >= 500 else logging.WARNING if status_code >= 400 else logging.INFO
+        logging.log(
+            level, REQUEST_MESSAGE, entry.client_ip, entry.method, entry.path, status_code,
+            extra={"request_log": entry},
+        )
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler, що не форматує запис у потоці запиту і не чекає на повну чергу.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Стандартний prepare форматує повідомлення тут і прибирає exc_info; ми
+        # лише запам'ятовуємо контекст трасування, решту зробить ExpandingHandler
+        record.otel_context = context.get_current()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_counter.add(1)
+
+
+class ExpandingHandler(logging.Handler):
+    """
+    Фоновий бік черги: розгортає RequestLog в атрибути, відновлює контекст
+    трасування і передає запис цільовому обробнику (OTel LoggingHandler).
+    """
+
+    def __init__(self, target: logging.Handler):
+        super().__init__(level=target.level)
+        self.target = target
+
+    def emit(self, record: logging.LogRecord):
+        entry: Optional[RequestLog] = record.__dict__.pop("request_log", None)
+        if entry is not None:
+            record.__dict__.update(entry.attributes())
+        captured = record.__dict__.pop("otel_context", None)
+        token = context.attach(captured) if captured is not None else None
+        try:
+            self.target.handle(record)
+        finally:
+            if token is not None:
+                context.detach(token)
+
+    def flush(self):
+        self.target.flush()
+
+
+def install_queue_logging(target: logging.Handler, logger: logging.Logger = None, queue_size: int = LOG_QUEUE_SIZE):
+    """
+    Підключає target до логера (типово кореневого) через чергу і фоновий
+    потік. Повертає QueueListener: start() - при старті застосунку, stop() - при
+    зупинці (дописує все, що лишилось у черзі). До start() записи чекають у черзі.
+    """
+    logger = logger or logging.getLogger()
+    log_queue = queue.Queue(maxsize=queue_size)
+    logger.addHandler(NonBlockingQueueHandler(log_queue))
+    return QueueListener(log_queue, ExpandingHandler(target), respect_handler_level=True)
+
+
+def uninstall_queue_logging(listener: QueueListener, logger: logging.Logger = None):
+    """
+    Відключає чергу install_queue_logging від логера і дописує те, що в ній лишилось.
+    """
+    logger = logger or logging.getLogger()
+    for handler in list(logger.handlers):
+        if isinstance(handler, NonBlockingQueueHandler) and handler.queue is listener.queue:
+            logger.removeHandler(handler)
+    listener.stop()
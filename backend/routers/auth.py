@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncConnection
 from schemas.users import UserCreate, UserLogin, Token, UserInDB
-from crud.users import create_user, get_user_by_username, verify_password
+from crud.users import create_user, get_user_by_username
+from auth.passwords import password_hasher
 from auth.jwt import create_access_token
 from db import get_db
 from auth.deps import require_role
@@ -25,7 +26,7 @@ async def register(
 @router.post("/login", response_model=Token)
 async def login(user: UserLogin, db: AsyncConnection = Depends(get_db)):
     db_user = await get_user_by_username(db, user.username)
-    if not db_user or not verify_password(user.password, db_user["password_hash"]):
+    if not db_user or not await password_hasher.verify(user.password, db_user["password_hash"]):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     if not db_user["is_active"]:
         raise HTTPException(status_code=403, detail="User is inactive")
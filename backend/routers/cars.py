@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncConnection
 from typing import List, Optional
 from db import get_db
+from pagination import PageParams, page_params, finalize_page, date_id_key
+from schemas.service_records import CarHistoryEntry
+from crud.service_records import get_car_history
+from bulk import BulkResult, run_bulk
+from crud.search import search_cars
 from schemas.cars import CarCreate, CarUpdate, CarInDB
 from crud.cars import (
-    get_car_by_id, get_all_cars, create_car, update_car, delete_car, get_car_by_vin
+    get_car_by_id, get_car_row, get_car_rows, create_car, update_car, delete_car, get_car_by_vin,
+    bulk_upsert_cars
+)
+from serialization import RowSerializer, fast_json_enabled
+from conditional import (
+    conditional_get, entity_validators, list_validators, if_match_versions, precondition_failed, set_etag
 )
 
 router = APIRouter(
@@ -12,29 +22,83 @@ router = APIRouter(
     tags=["Cars"]
 )
 
+# Рядки БД одразу в JSON, без повторної валідації (serialization.py)
+rows_json = RowSerializer(CarInDB, fast=fast_json_enabled("cars"))
+
 @router.get("/", response_model=List[CarInDB])
-async def read_cars(customer_id: Optional[int] = None, db: AsyncConnection = Depends(get_db)):
+async def read_cars(
+    request: Request,
+    response: Response,
+    customer_id: Optional[int] = None,
+    q: Optional[str] = None,
+    page: PageParams = Depends(page_params),
+    db: AsyncConnection = Depends(get_db)
+):
     """
-    Отримує список всіх машин, або фільтрує їх за customer_id, якщо він вказаний.
+    Отримує сторінку машин, або фільтрує їх за customer_id, якщо він вказаний.
+    Курсор наступної сторінки повертається в заголовку X-Next-Cursor.
+    З параметром q - пошук за VIN (початок або кінець), маркою чи моделлю (з
+    урахуванням customer_id): одна сторінка найрелевантніших збігів, без курсора.
     """
-    return await get_all_cars(db, customer_id=customer_id)
+    if q:
+        if page.after is not None:
+            raise HTTPException(status_code=400, detail="cursor_not_supported_with_q")
+        return await search_cars(db, q, limit=page.limit, customer_id=customer_id)
+    rows = await get_car_rows(db, customer_id=customer_id, limit=page.fetch_limit, after_id=page.after_id())
+    rows = finalize_page(response, rows, page)
+    if (unchanged := conditional_get(request, response, list_validators(rows))):
+        return unchanged
+    return rows_json.many(response, rows)
 
 @router.get("/{car_id}", response_model=CarInDB)
-async def read_car(car_id: int, db: AsyncConnection = Depends(get_db)):
-    car = await get_car_by_id(db, car_id)
-    if not car:
+async def read_car(car_id: int, request: Request, response: Response, db: AsyncConnection = Depends(get_db)):
+    row = await get_car_row(db, car_id)
+    if not row:
         raise HTTPException(status_code=404, detail="Car not found")
-    return car
+    if (unchanged := conditional_get(request, response, entity_validators(row))):
+        return unchanged
+    return rows_json.one(response, row)
+
+@router.get("/{car_id}/history", response_model=List[CarHistoryEntry])
+async def read_car_history(
+    car_id: int,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: AsyncConnection = Depends(get_db)
+):
+    """
+    Історія обслуговування авто від найновіших записів, сторінками по даті.
+    """
+    before_date, before_id = page.after_date_id()
+    history = await get_car_history(
+        db, car_id, limit=page.fetch_limit, before_date=before_date, before_id=before_id
+    )
+    if not history and page.after is None and not await get_car_by_id(db, car_id):
+        raise HTTPException(status_code=404, detail="Car not found")
+    return finalize_page(response, history, page, key=date_id_key)
 
 @router.post("/", response_model=CarInDB, status_code=201)
 async def create_new_car(car: CarCreate, db: AsyncConnection = Depends(get_db)):
     return await create_car(db, car)
 
+@router.post("/bulk", response_model=BulkResult)
+async def bulk_upsert(request: Request, db: AsyncConnection = Depends(get_db)):
+    """
+    Пакетне створення/оновлення машин (upsert за VIN): JSON-масив або NDJSON.
+    """
+    return await run_bulk(request, db, CarCreate, bulk_upsert_cars)
+
 @router.put("/{car_id}", response_model=CarInDB)
-async def update_existing_car(car_id: int, car: CarUpdate, db: AsyncConnection = Depends(get_db)):
-    updated = await update_car(db, car_id, car)
+async def update_existing_car(
+    car_id: int, car: CarUpdate, request: Request, response: Response, db: AsyncConnection = Depends(get_db)
+):
+    expected = if_match_versions(request, car_id)
+    updated = await update_car(db, car_id, car, if_updated_at=expected)
     if not updated:
+        if expected is not None and await get_car_row(db, car_id):
+            raise precondition_failed()
         raise HTTPException(status_code=404, detail="Car not found")
+    set_etag(response, *entity_validators(updated))
     return updated
 
 @router.delete("/{car_id}", status_code=204)
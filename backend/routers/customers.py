@@ -1,49 +1,123 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from schemas.customers import CustomerCreate, CustomerUpdate, CustomerInDB
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from typing import List, Optional
+from schemas.customers import (
+    CustomerCreate, CustomerUpdate, CustomerInDB, CustomerOverview, CustomerOverviewRequest
+)
 from crud.customers import (
     get_customer_by_id,
-    get_all_customers,
+    get_customer_row,
+    get_customer_rows,
     create_customer,
     update_customer_in_db,
     delete_customer_in_db,
+    bulk_create_customers,
 )
+from crud.customer_overview import load_customer_overviews
+from bulk import BulkResult, run_bulk
+from crud.search import search_customers
 from db import get_db
 from sqlalchemy.ext.asyncio import AsyncConnection
 from schemas.users import User
 from auth.deps import get_current_user
+from pagination import PageParams, page_params, finalize_page
+from serialization import RowSerializer, fast_json_enabled
+from conditional import (
+    conditional_get, entity_validators, list_validators, if_match_versions, precondition_failed, set_etag
+)
 
 router = APIRouter(
     prefix="/customers",
     tags=["Customers"]
 )
 
+# Рядки БД одразу в JSON, без повторної валідації (serialization.py)
+rows_json = RowSerializer(CustomerInDB, fast=fast_json_enabled("customers"))
+
 @router.get("/", response_model=List[CustomerInDB])
-async def read_customers(db: AsyncConnection = Depends(get_db)):
-    return await get_all_customers(db)
+async def read_customers(
+    request: Request,
+    response: Response,
+    q: Optional[str] = None,
+    page: PageParams = Depends(page_params),
+    db: AsyncConnection = Depends(get_db)
+):
+    if q:
+        # Пошук повертає одну сторінку найрелевантніших збігів, без курсора
+        if page.after is not None:
+            raise HTTPException(status_code=400, detail="cursor_not_supported_with_q")
+        return await search_customers(db, q, limit=page.limit)
+    rows = await get_customer_rows(db, limit=page.fetch_limit, after_id=page.after_id())
+    rows = finalize_page(response, rows, page)
+    if (unchanged := conditional_get(request, response, list_validators(rows))):
+        return unchanged
+    return rows_json.many(response, rows)
+
+@router.post("/bulk", response_model=BulkResult)
+async def bulk_create(request: Request, db: AsyncConnection = Depends(get_db)):
+    """
+    Пакетне створення клієнтів: JSON-масив або NDJSON, результат по кожному рядку.
+    """
+    return await run_bulk(request, db, CustomerCreate, bulk_create_customers)
+
+@router.post("/overview", response_model=List[CustomerOverview])
+async def read_customer_overviews(request: CustomerOverviewRequest, db: AsyncConnection = Depends(get_db)):
+    """
+    Пакетний "customer 360" для багатьох клієнтів (у порядку запиту, без неіснуючих).
+    """
+    overviews = await load_customer_overviews(db, request.ids)
+    return [overviews[i] for i in dict.fromkeys(request.ids) if i in overviews]
+
+@router.get("/{customer_id}/overview", response_model=CustomerOverview)
+async def read_customer_overview(
+    customer_id: int, request: Request, response: Response, db: AsyncConnection = Depends(get_db)
+):
+    overviews = await load_customer_overviews(db, [customer_id])
+    if customer_id not in overviews:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    overview = overviews[customer_id]
+    # Змінюється разом з будь-якою частиною: клієнтом, авто, інвойсами, позиціями, записами
+    parts = [overview.customer, *overview.cars, *overview.invoices, *overview.recent_service_records]
+    parts += [item for invoice in overview.invoices for item in invoice.items]
+    if (unchanged := conditional_get(request, response, list_validators(parts))):
+        return unchanged
+    return overview
 
 @router.get("/{customer_id}", response_model=CustomerInDB)
-async def read_customer(customer_id: int, db: AsyncConnection = Depends(get_db)):
-    customer = await get_customer_by_id(db, customer_id)
-    if not customer:
+async def read_customer(customer_id: int, request: Request, response: Response, db: AsyncConnection = Depends(get_db)):
+    row = await get_customer_row(db, customer_id)
+    if not row:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return customer
+    if (unchanged := conditional_get(request, response, entity_validators(row))):
+        return unchanged
+    return rows_json.one(response, row)
 
 @router.post("/", response_model=CustomerInDB, status_code=201)
 async def create_new_customer(customer: CustomerCreate, db: AsyncConnection = Depends(get_db)):
     return await create_customer(db, customer)
 
 @router.put("/{customer_id}", response_model=CustomerInDB)
-async def update_existing_customer(customer_id: int, customer: CustomerUpdate, db: AsyncConnection = Depends(get_db)):
-    updated = await update_customer_in_db(db, customer_id, customer)
+async def update_existing_customer(
+    customer_id: int,
+    customer: CustomerUpdate,
+    request: Request,
+    response: Response,
+    db: AsyncConnection = Depends(get_db)
+):
+    expected = if_match_versions(request, customer_id)
+    updated = await update_customer_in_db(db, customer_id, customer, if_updated_at=expected)
     if not updated:
+        if expected is not None and await get_customer_row(db, customer_id):
+            raise precondition_failed()
         raise HTTPException(status_code=404, detail="Customer not found")
+    set_etag(response, *entity_validators(updated))
     return updated
 
 @router.patch("/{customer_id}", response_model=CustomerInDB)
 async def update_customer(
     customer_id: int,
     customer_update: CustomerUpdate,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: AsyncConnection = Depends(get_db)
 ):
@@ -52,7 +126,14 @@ async def update_customer(
     customer = await get_customer_by_id(db, customer_id)
     if not customer:
         raise HTTPException(404, "Клієнта не знайдено")
-    return await update_customer_in_db(db, customer_id, customer_update)
+    expected = if_match_versions(request, customer_id)
+    updated = await update_customer_in_db(db, customer_id, customer_update, if_updated_at=expected)
+    if not updated:
+        if expected is not None:
+            raise precondition_failed()
+        raise HTTPException(404, "Клієнта не знайдено")
+    set_etag(response, *entity_validators(updated))
+    return updated
 
 @router.delete("/{customer_id}", status_code=204)
 async def delete_customer(
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, Query
+from auth.deps import require_role
+from query_stats import query_stats
+from schemas.debug import QueriesReport, QueryFingerprint, SlowQuery
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["Debug"]
+)
+
+@router.get("/queries", response_model=QueriesReport)
+async def get_query_stats(
+    limit: int = Query(20, ge=1, le=1000),
+    admin=Depends(require_role("admin"))
+):
+    """
+    SQL-запити цього воркера (query_stats.py): підсумки за відбитками і останні
+    повільні запити з типами параметрів та планом EXPLAIN, якщо він увімкнений.
+    """
+    return QueriesReport(
+        slow_query_ms=query_stats.slow_ms,
+        fingerprints=[
+            QueryFingerprint(
+                fingerprint=stats.fingerprint.id,
+                operation=stats.fingerprint.operation,
+                statement=stats.fingerprint.statement,
+                calls=stats.calls,
+                errors=stats.errors,
+                total_ms=round(stats.total_ms, 3),
+                mean_ms=round(stats.total_ms / stats.calls, 3),
+                max_ms=round(stats.max_ms, 3),
+            )
+            for stats in query_stats.top(limit)
+        ],
+        slow=[
+            SlowQuery(
+                fingerprint=entry.fingerprint.id,
+                statement=entry.fingerprint.statement,
+                duration_ms=round(entry.duration_ms, 3),
+                params=entry.params,
+                database=entry.database,
+                at=entry.at,
+                plan=entry.plan,
+            )
+            for entry in reversed(query_stats.slow)
+        ],
+    )
+
+@router.delete("/queries", status_code=204)
+async def reset_query_stats(admin=Depends(require_role("admin"))):
+    query_stats.clear()
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncConnection
 from typing import List
 from schemas.invoice_items import InvoiceItemCreate, InvoiceItemUpdate, InvoiceItemInDB
 from crud.invoice_items import (
-    create_invoice_item, get_invoice_item_by_id, get_items_by_invoice,
+    create_invoice_item, get_invoice_item_row, get_item_rows_by_invoice,
     update_invoice_item, delete_invoice_item
 )
+from serialization import RowSerializer, fast_json_enabled
+from conditional import (
+    conditional_get, entity_validators, list_validators, if_match_versions, precondition_failed, set_etag
+)
 from db import get_db
 
 router = APIRouter(
@@ -13,26 +17,40 @@ router = APIRouter(
     tags=["Invoice Items"]
 )
 
+# Рядки БД одразу в JSON, без повторної валідації (serialization.py)
+rows_json = RowSerializer(InvoiceItemInDB, fast=fast_json_enabled("invoice_items"))
+
 @router.post("/", response_model=InvoiceItemInDB, status_code=201)
 async def create(item: InvoiceItemCreate, db: AsyncConnection = Depends(get_db)):
     return await create_invoice_item(db, item)
 
 @router.get("/by-invoice/{invoice_id}", response_model=List[InvoiceItemInDB])
-async def by_invoice(invoice_id: int, db: AsyncConnection = Depends(get_db)):
-    return await get_items_by_invoice(db, invoice_id)
+async def by_invoice(invoice_id: int, request: Request, response: Response, db: AsyncConnection = Depends(get_db)):
+    rows = await get_item_rows_by_invoice(db, invoice_id)
+    if (unchanged := conditional_get(request, response, list_validators(rows))):
+        return unchanged
+    return rows_json.many(response, rows)
 
 @router.get("/{item_id}", response_model=InvoiceItemInDB)
-async def read(item_id: int, db: AsyncConnection = Depends(get_db)):
-    item = await get_invoice_item_by_id(db, item_id)
-    if not item:
+async def read(item_id: int, request: Request, response: Response, db: AsyncConnection = Depends(get_db)):
+    row = await get_invoice_item_row(db, item_id)
+    if not row:
         raise HTTPException(404, "Invoice item not found")
-    return item
+    if (unchanged := conditional_get(request, response, entity_validators(row))):
+        return unchanged
+    return rows_json.one(response, row)
 
 @router.patch("/{item_id}", response_model=InvoiceItemInDB)
-async def update(item_id: int, item: InvoiceItemUpdate, db: AsyncConnection = Depends(get_db)):
-    updated = await update_invoice_item(db, item_id, item)
+async def update(
+    item_id: int, item: InvoiceItemUpdate, request: Request, response: Response, db: AsyncConnection = Depends(get_db)
+):
+    expected = if_match_versions(request, item_id)
+    updated = await update_invoice_item(db, item_id, item, if_updated_at=expected)
     if not updated:
+        if expected is not None and await get_invoice_item_row(db, item_id):
+            raise precondition_failed()
         raise HTTPException(404, "Invoice item not found")
+    set_etag(response, *entity_validators(updated))
     return updated
 
 @router.delete("/{item_id}", status_code=204)
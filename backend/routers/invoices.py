@@ -1,61 +1,108 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncConnection
-from typing import List, Any
-from schemas.invoices import InvoiceCreate, InvoiceUpdate, InvoiceInDB
+from typing import List, Any, Optional
+from datetime import datetime
+from schemas.invoices import (
+    InvoiceCreate, InvoiceUpdate, InvoiceInDB, InvoiceItemsBatch, InvoiceLine, InvoiceWithItems,
+    InvoiceWithItemsCreate
+)
 from schemas.users import User
 from crud.invoices import (
-    create_invoice, get_invoice_by_id, get_all_invoices,
-    update_invoice as crud_update_invoice, delete_invoice
+    create_invoice, get_invoice_by_id, get_invoice_row, get_invoice_rows,
+    update_invoice as crud_update_invoice, delete_invoice,
+    iter_invoices, INVOICE_EXPORT_COLUMNS
 )
 from db import get_db
-from crud.invoice_items import create_invoice_item
-from schemas.invoice_items import InvoiceItemCreate
+from crud.invoice_commands import add_invoice_items, create_invoice_with_items
+from schemas.invoice_items import InvoiceItemInDB
 from crud.users import get_current_user
-from sqlalchemy import text
+from pagination import PageParams, page_params, finalize_page
+from serialization import RowSerializer, fast_json_enabled
+from conditional import (
+    conditional_get, entity_validators, list_validators, if_match_versions, precondition_failed, set_etag
+)
+from streaming import export_response
+from idempotency import IdempotencyContext, idempotency
 
 router = APIRouter(
     prefix="/invoices",
     tags=["Invoices"]
 )
 
+# Рядки БД одразу в JSON, без повторної валідації (serialization.py)
+rows_json = RowSerializer(InvoiceInDB, fast=fast_json_enabled("invoices"))
+
 @router.post("/", response_model=InvoiceInDB, status_code=201)
 async def create(
     invoice: InvoiceCreate,
     current_user: User = Depends(get_current_user),
-    db: AsyncConnection = Depends(get_db)
+    db: AsyncConnection = Depends(get_db),
+    idem: IdempotencyContext = Depends(idempotency())
 ) -> Any:
     if current_user.role == "master":
         raise HTTPException(403, "Masters cannot create invoices")
-    return await create_invoice(db, invoice)
+    if idem.replay:
+        return idem.replay_response()
+    new_invoice = await create_invoice(db, invoice)
+    return await idem.respond(new_invoice, status_code=201)
 
 @router.get("/", response_model=List[InvoiceInDB])
 async def get_invoices(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
     current_user: User = Depends(get_current_user),
     db: AsyncConnection = Depends(get_db)
 ):
-    if current_user.role == "master":
-        # Показати лише свої інвойси
-        query = """
-            SELECT * FROM invoices WHERE worker_id = :worker_id
-        """
-        rows = await db.fetch_all(query, {"worker_id": current_user.id})
-        return [InvoiceInDB(**dict(row)) for row in rows]
-    else:
-        # Адмін/менеджер бачить всі
-        return await get_all_invoices(db)
+    # Майстер бачить лише свої інвойси, адмін/менеджер - всі
+    worker_id = current_user.id if current_user.role == "master" else None
+    rows = await get_invoice_rows(
+        db, worker_id=worker_id, limit=page.fetch_limit, after_id=page.after_id()
+    )
+    rows = finalize_page(response, rows, page)
+    if (unchanged := conditional_get(request, response, list_validators(rows))):
+        return unchanged
+    return rows_json.many(response, rows)
+
+@router.get("/export")
+async def export_invoices(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    payment_status: Optional[str] = Query(None, pattern="^(unpaid|partial|paid)$"),
+    work_status: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncConnection = Depends(get_db)
+):
+    """
+    Потоковий експорт інвойсів у NDJSON або CSV (фільтр за issue_date та статусами).
+    """
+    worker_id = current_user.id if current_user.role == "master" else None
+    rows = iter_invoices(
+        db,
+        date_from=date_from,
+        date_to=date_to,
+        payment_status=payment_status,
+        work_status=work_status,
+        worker_id=worker_id,
+    )
+    return export_response(rows, format, INVOICE_EXPORT_COLUMNS, "invoices")
 
 @router.get("/{invoice_id}", response_model=InvoiceInDB)
-async def read(invoice_id: int, db: AsyncConnection = Depends(get_db)):
-    query = text("SELECT * FROM invoices WHERE id = :id")
-    result = await db.fetch_one(query, {"id": invoice_id})
-    if not result:
+async def read(invoice_id: int, request: Request, response: Response, db: AsyncConnection = Depends(get_db)):
+    row = await get_invoice_row(db, invoice_id)
+    if not row:
         raise HTTPException(404, "Invoice not found")
-    return InvoiceInDB(**dict(result))
+    if (unchanged := conditional_get(request, response, entity_validators(row))):
+        return unchanged
+    return rows_json.one(response, row)
 
 @router.patch("/{invoice_id}", response_model=InvoiceInDB)
 async def update_invoice(
     invoice_id: int,
     update_data: InvoiceUpdate,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: AsyncConnection = Depends(get_db)
 ) -> Any:
@@ -70,28 +117,67 @@ async def update_invoice(
         allowed_fields = {"work_status", "payment_status"}
         filtered_data = {k: v for k, v in update_data.dict().items() if k in allowed_fields}
         update_data = InvoiceUpdate(**filtered_data)
-    
-    return await crud_update_invoice(db, invoice_id, update_data)
+
+    expected = if_match_versions(request, invoice_id)
+    updated = await crud_update_invoice(db, invoice_id, update_data, if_updated_at=expected)
+    if not updated:
+        if expected is not None:
+            raise precondition_failed()
+        raise HTTPException(404, "Invoice not found")
+    set_etag(response, *entity_validators(updated))
+    return updated
 
 @router.delete("/{invoice_id}", status_code=204)
 async def delete(invoice_id: int, db: AsyncConnection = Depends(get_db)):
     await delete_invoice(db, invoice_id)
 
-@router.post("/invoices", response_model=InvoiceInDB)
-async def create_invoice_with_item(invoice: InvoiceCreate, db=Depends(get_db)) -> Any:
-    # 1. Створюємо інвойс (без service_id)
-    invoice_data = invoice.dict().copy()
-    service_id = invoice_data.pop("service_id")  # Витягуємо service_id
-    new_invoice = await create_invoice(db, InvoiceCreate(**invoice_data))
-
-    # 2. Додаємо перший invoice_item
-    item = InvoiceItemCreate(
-        invoice_id=new_invoice.id,
-        service_id=service_id,
-        quantity=1,
-        unit_price=invoice.total,  # або діставай ціну з сервісу
-        total=invoice.total
+@router.post("/invoices", response_model=InvoiceWithItems, status_code=201)
+async def create_invoice_with_item(
+    invoice: InvoiceCreate,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+) -> Any:
+    """
+    Інвойс з однією позицією (послуга інвойсу на всю суму). Для кількох позицій - POST /invoices/with-items.
+    """
+    if current_user.role == "master":
+        raise HTTPException(403, "Masters cannot create invoices")
+    command = InvoiceWithItemsCreate(
+        **invoice.model_dump(exclude={"service_id", "total_amount"}),
+        items=[InvoiceLine(service_id=invoice.service_id, unit_price=invoice.total_amount)],
     )
-    await create_invoice_item(db, item)
+    return await create_invoice_with_items(db, command, created_by=current_user.id)
 
-    return new_invoice 
\ No newline at end of file
+@router.post("/with-items", response_model=InvoiceWithItems, status_code=201)
+async def create_with_items(
+    command: InvoiceWithItemsCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncConnection = Depends(get_db),
+    idem: IdempotencyContext = Depends(idempotency())
+) -> Any:
+    """
+    Інвойс з N позиціями і прив'язкою записів обслуговування - атомарно, одним запитом до БД.
+    """
+    if current_user.role == "master":
+        raise HTTPException(403, "Masters cannot create invoices")
+    if idem.replay:
+        return idem.replay_response()
+    invoice = await create_invoice_with_items(db, command, created_by=current_user.id)
+    return await idem.respond(invoice, status_code=201)
+
+@router.post("/{invoice_id}/items:batch", response_model=List[InvoiceItemInDB], status_code=201)
+async def add_items_batch(
+    invoice_id: int,
+    batch: InvoiceItemsBatch,
+    current_user: User = Depends(get_current_user),
+    db: AsyncConnection = Depends(get_db)
+) -> Any:
+    """
+    Додає позиції до інвойсу і збільшує його total_amount - атомарно, одним запитом до БД.
+    """
+    if current_user.role == "master":
+        raise HTTPException(403, "Masters cannot change invoice items")
+    items = await add_invoice_items(db, invoice_id, batch.items)
+    if items is None:
+        raise HTTPException(404, "Invoice not found")
+    return items
@@ -0,0 +1,40 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncConnection
+from db import get_db
+from schemas.reports import RevenueGroupBy, RevenueReport, RevenueRow
+from schemas.users import User
+from crud.revenue import get_revenue
+from crud.users import get_current_user
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["Reports"]
+)
+
+@router.get("/revenue", response_model=RevenueReport, response_model_exclude_none=True)
+async def revenue_report(
+    group_by: RevenueGroupBy = "day",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncConnection = Depends(get_db)
+):
+    """
+    Виручка за днями, послугами або майстрами за період [from, to] (дати включно).
+    Рахується зі зведення revenue_rollup, а не з інвойсів (crud/revenue.py).
+    """
+    if current_user.role == "master":
+        raise HTTPException(403, "Masters cannot view revenue reports")
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise HTTPException(422, "'from' must not be after 'to'")
+    rows = [RevenueRow(**dict(row)) for row in await get_revenue(db, group_by, date_from, date_to)]
+    return RevenueReport(
+        group_by=group_by,
+        date_from=date_from,
+        date_to=date_to,
+        total=sum((row.amount for row in rows), Decimal(0)),
+        rows=rows,
+    )
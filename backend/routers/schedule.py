@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncConnection
+from db import get_db
+from schemas.schedule import Availability, MechanicSlots, TimeSlot
+from schemas.users import User
+from crud.schedule import get_busy_intervals, get_mechanics
+from crud.users import get_current_user
+from scheduling import any_mechanic_free, availability
+
+router = APIRouter(
+    prefix="/schedule",
+    tags=["Schedule"]
+)
+
+MAX_WINDOW = timedelta(days=31)
+
+def _naive(value: datetime) -> datetime:
+    # Час у БД - TIMESTAMP без зони (UTC), так само його пише asyncpg
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+@router.get("/availability", response_model=Availability)
+async def get_availability(
+    date_from: datetime = Query(..., alias="from"),
+    date_to: datetime = Query(..., alias="to"),
+    duration: int = Query(60, ge=1, le=24 * 60, description="тривалість роботи, хв"),
+    mechanic_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncConnection = Depends(get_db)
+):
+    """
+    Вільні вікна довжиною від duration хвилин у [from, to) - для кожного майстра
+    (або лише mechanic_id) і для "будь-якого майстра".
+    """
+    date_from, date_to = _naive(date_from), _naive(date_to)
+    if date_to <= date_from:
+        raise HTTPException(422, "'to' must be after 'from'")
+    if date_to - date_from > MAX_WINDOW:
+        raise HTTPException(422, f"Window is limited to {MAX_WINDOW.days} days")
+    mechanics = await get_mechanics(db, mechanic_id)
+    if mechanic_id is not None and not mechanics:
+        raise HTTPException(404, "Mechanic not found")
+    busy = await get_busy_intervals(db, date_from, date_to, [mechanic for mechanic, _ in mechanics])
+    free = availability(mechanics, busy, date_from, date_to, timedelta(minutes=duration))
+    return Availability(
+        date_from=date_from,
+        date_to=date_to,
+        duration=duration,
+        mechanics=[
+            MechanicSlots(
+                mechanic_id=mechanic.mechanic_id,
+                username=mechanic.username,
+                free=[TimeSlot(start=start, end=end) for start, end in mechanic.free],
+            )
+            for mechanic in free
+        ],
+        any=[TimeSlot(start=start, end=end) for start, end in any_mechanic_free(free)],
+    )
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncConnection
+from db import get_db
+from schemas.search import SearchResults
+from crud.search import search_customers, search_cars, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+
+router = APIRouter(
+    prefix="/search",
+    tags=["Search"]
+)
+
+@router.get("/", response_model=SearchResults)
+async def search(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    db: AsyncConnection = Depends(get_db)
+):
+    """
+    Пошук для ресепшену: клієнти (ім'я, телефон, email) та авто (VIN, марка, модель).
+    """
+    return SearchResults(
+        customers=await search_customers(db, q, limit=limit),
+        cars=await search_cars(db, q, limit=limit),
+    )
@@ -1,47 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
 from schemas.service_records import ServiceRecordCreate, ServiceRecordUpdate, ServiceRecordInDB
 from crud.service_records import (
-    get_all_service_records,
+    get_service_record_rows,
+    get_service_record_row,
     get_service_record_by_id,
     create_service_record,
     update_service_record,
     delete_service_record,
+    iter_service_records,
+    SERVICE_RECORD_EXPORT_COLUMNS,
 )
 from db import get_db
 from sqlalchemy.ext.asyncio import AsyncConnection
-from crud.invoices import create_invoice
-from crud.invoice_items import create_invoice_item
-from crud.cars import get_car_by_id
-from crud.services import get_service_by_id
+from crud.invoice_commands import invoice_service_record
 from datetime import datetime
-from decimal import Decimal
+from pagination import PageParams, page_params, finalize_page, date_id_key
+from streaming import export_response
+from idempotency import IdempotencyContext, idempotency
+from serialization import RowSerializer, fast_json_enabled
+from conditional import (
+    conditional_get, entity_validators, list_validators, if_match_versions, precondition_failed, set_etag
+)
 
 router = APIRouter( 
     prefix="/service-records",
     tags=["Service Records"]
 )
 
+# Рядки БД одразу в JSON, без повторної валідації (serialization.py)
+rows_json = RowSerializer(ServiceRecordInDB, fast=fast_json_enabled("service_records"))
+
 @router.get("/", response_model=List[ServiceRecordInDB])
-async def read_records(db: AsyncConnection = Depends(get_db)):
-    return await get_all_service_records(db)
+async def read_records(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: AsyncConnection = Depends(get_db)
+):
+    before_date, before_id = page.after_date_id()
+    rows = await get_service_record_rows(
+        db, limit=page.fetch_limit, before_date=before_date, before_id=before_id
+    )
+    rows = finalize_page(response, rows, page, key=date_id_key)
+    if (unchanged := conditional_get(request, response, list_validators(rows))):
+        return unchanged
+    return rows_json.many(response, rows)
+
+@router.get("/export")
+async def export_records(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    invoiced: Optional[bool] = None,
+    car_id: Optional[int] = None,
+    performed_by: Optional[int] = None,
+    db: AsyncConnection = Depends(get_db)
+):
+    """
+    Потоковий експорт записів обслуговування у NDJSON або CSV.
+    """
+    rows = iter_service_records(
+        db,
+        date_from=date_from,
+        date_to=date_to,
+        invoiced=invoiced,
+        car_id=car_id,
+        performed_by=performed_by,
+    )
+    return export_response(rows, format, SERVICE_RECORD_EXPORT_COLUMNS, "service_records")
 
 @router.get("/{record_id}", response_model=ServiceRecordInDB)
-async def read_record(record_id: int, db: AsyncConnection = Depends(get_db)):
-    record = await get_service_record_by_id(db, record_id)
-    if not record:
+async def read_record(record_id: int, request: Request, response: Response, db: AsyncConnection = Depends(get_db)):
+    row = await get_service_record_row(db, record_id)
+    if not row:
         raise HTTPException(status_code=404, detail="Service record not found")
-    return record
+    if (unchanged := conditional_get(request, response, entity_validators(row))):
+        return unchanged
+    return rows_json.one(response, row)
 
 @router.post("/", response_model=ServiceRecordInDB, status_code=201)
-async def create_record(record: ServiceRecordCreate, db: AsyncConnection = Depends(get_db)):
-    return await create_service_record(db, record)
+async def create_record(
+    record: ServiceRecordCreate,
+    db: AsyncConnection = Depends(get_db),
+    idem: IdempotencyContext = Depends(idempotency())
+):
+    if idem.replay:
+        return idem.replay_response()
+    new_record = await create_service_record(db, record)
+    return await idem.respond(new_record, status_code=201)
 
 @router.put("/{record_id}", response_model=ServiceRecordInDB)
-async def update_record(record_id: int, record: ServiceRecordUpdate, db: AsyncConnection = Depends(get_db)):
-    updated = await update_service_record(db, record_id, record)
+async def update_record(
+    record_id: int,
+    record: ServiceRecordUpdate,
+    request: Request,
+    response: Response,
+    db: AsyncConnection = Depends(get_db)
+):
+    expected = if_match_versions(request, record_id)
+    updated = await update_service_record(db, record_id, record, if_updated_at=expected)
     if not updated:
+        if expected is not None and await get_service_record_row(db, record_id):
+            raise precondition_failed()
         raise HTTPException(status_code=404, detail="Service record not found")
+    set_etag(response, *entity_validators(updated))
     return updated
 
 @router.delete("/{record_id}", status_code=204)
@@ -52,40 +115,16 @@ async def delete_record(record_id: int, db: AsyncConnection = Depends(get_db)):
 
 @router.post("/{record_id}/create-invoice", response_model=None, status_code=201)
 async def create_invoice_for_record(record_id: int, db: AsyncConnection = Depends(get_db)):
-    # 1. Отримати service_record
-    record = await get_service_record_by_id(db, record_id)
-    if not record:
-        raise HTTPException(404, "Service record not found")
-    if record.invoice_id:
-        raise HTTPException(400, "Invoice already exists for this record")
-
-    # 2. Отримати car, service
-    car = await get_car_by_id(db, record.car_id)
-    service = await get_service_by_id(db, record.service_id)
-    if not car or not service:
+    """
+    Інвойс за записом обслуговування: інвойс, позиція і прив'язка запису - одним оператором.
+    """
+    invoice_id = await invoice_service_record(db, record_id)
+    if invoice_id is None:
+        # Команда нічого не записала - з'ясовуємо чому (лише на шляху помилки)
+        record = await get_service_record_by_id(db, record_id)
+        if not record:
+            raise HTTPException(404, "Service record not found")
+        if record.invoice_id:
+            raise HTTPException(400, "Invoice already exists for this record")
         raise HTTPException(400, "Car or service not found")
-
-    # 3. Створити invoice
-    invoice_data = {
-        "customer_id": car.customer_id,
-        "status": "unpaid",
-        "issued_at": datetime.utcnow(),
-        "due_date": datetime.utcnow(),
-        "total": Decimal(service.price)
-    }
-    invoice = await create_invoice(db, invoice_data)
-
-    # 4. Створити invoice_item
-    item_data = {
-        "invoice_id": invoice.id,
-        "service_id": service.id,
-        "quantity": 1,
-        "unit_price": Decimal(service.price),
-        "total": Decimal(service.price)
-    }
-    await create_invoice_item(db, item_data)
-
-    # 5. Оновити service_record (invoice_id)
-    await update_service_record(db, record_id, {"invoice_id": invoice.id})
-
-    return {"invoice_id": invoice.id}
+    return {"invoice_id": invoice_id}
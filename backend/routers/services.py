@@ -1,19 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from schemas.services import ServiceCreate, ServiceUpdate, ServiceInDB
 from typing import List
 from db import get_db
 from crud.services import (
-    get_all_services,
     get_service_by_id,
     create_service,
     update_service,
     delete_service,
     delete_service_from_db,
+    bulk_create_services,
 )
 from databases import Database
 from schemas.users import User
 from crud.users import get_current_user
 from sqlalchemy.ext.asyncio import AsyncConnection
+from bulk import BulkResult, run_bulk
+from conditional import (
+    conditional_get, entity_validators, etag_matches, if_match_versions, not_modified, precondition_failed,
+    set_etag, weak_etag
+)
+from services_catalog import services_catalog
 
 router = APIRouter(
     prefix="/services",
@@ -21,15 +27,26 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[ServiceInDB])
-async def read_services(db: Database = Depends(get_db)):
-    return await get_all_services(db)
+async def read_services(request: Request, response: Response, db: Database = Depends(get_db)):
+    """
+    Каталог послуг з кешу процесу; ETag - версія каталогу.
+    """
+    catalog = await services_catalog.current(db)
+    etag = weak_etag("services", catalog.version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return catalog.services
 
 
 @router.get("/{service_id}", response_model=ServiceInDB)
-async def read_service(service_id: int, db: Database = Depends(get_db)):
-    service = await get_service_by_id(db, service_id)
+async def read_service(service_id: int, request: Request, response: Response, db: Database = Depends(get_db)):
+    catalog = await services_catalog.current(db)
+    service = catalog.get(service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
+    if (unchanged := conditional_get(request, response, entity_validators(service))):
+        return unchanged
     return service
 
 
@@ -38,11 +55,25 @@ async def create_new_service(service: ServiceCreate, db: Database = Depends(get_
     return await create_service(db, service)
 
 
+@router.post("/bulk", response_model=BulkResult)
+async def bulk_create(request: Request, db: Database = Depends(get_db)):
+    """
+    Пакетне створення послуг: JSON-масив або NDJSON.
+    """
+    return await run_bulk(request, db, ServiceCreate, bulk_create_services)
+
+
 @router.put("/{service_id}", response_model=ServiceInDB)
-async def update_existing_service(service_id: int, service: ServiceUpdate, db: Database = Depends(get_db)):
-    updated = await update_service(db, service_id, service)
+async def update_existing_service(
+    service_id: int, service: ServiceUpdate, request: Request, response: Response, db: Database = Depends(get_db)
+):
+    expected = if_match_versions(request, service_id)
+    updated = await update_service(db, service_id, service, if_updated_at=expected)
     if not updated:
+        if expected is not None and await get_service_by_id(db, service_id):
+            raise precondition_failed()
         raise HTTPException(status_code=404, detail="Service not found")
+    set_etag(response, *entity_validators(updated))
     return updated
 
 
@@ -62,6 +93,8 @@ async def delete_service(
 async def update_service_endpoint(
     service_id: int,
     service_update: ServiceUpdate,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: AsyncConnection = Depends(get_db)
 ):
@@ -72,4 +105,11 @@ async def update_service_endpoint(
         raise HTTPException(404, "Послугу не знайдено")
     print("service_update:", service_update)
     print("service_update.dict():", service_update.dict())
-    return await update_service(db, service_id, service_update)
+    expected = if_match_versions(request, service_id)
+    updated = await update_service(db, service_id, service_update, if_updated_at=expected)
+    if not updated:
+        if expected is not None:
+            raise precondition_failed()
+        raise HTTPException(404, "Послугу не знайдено")
+    set_etag(response, *entity_validators(updated))
+    return updated
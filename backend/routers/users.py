@@ -1,21 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncConnection
-from fastapi.responses import JSONResponse
 
 from auth.deps import get_current_user
 from db import get_db
 from schemas.users import UserCreate, UserInDB, User, UserUpdate
-from crud.users import create_user, get_all_users, get_user_by_id, update_user_in_db, delete_user_from_db
-from shared_state import idem_store # Import from shared state
+from crud.users import create_user, get_user_rows, get_user_by_id, update_user_in_db, delete_user_from_db
+from idempotency import IdempotencyContext, idempotency
+from pagination import PageParams, page_params, finalize_page
+from serialization import RowSerializer, fast_json_enabled
+from conditional import conditional_get, list_validators
 
 router = APIRouter(
     prefix="/users",
     tags=["users"]
 )
 
+# Рядки БД одразу в JSON, без повторної валідації (serialization.py)
+rows_json = RowSerializer(UserInDB, fast=fast_json_enabled("users"))
+
 @router.get("/", response_model=list[UserInDB])
-async def get_users(db: AsyncConnection = Depends(get_db)):
-    return await get_all_users(db)
+async def get_users(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: AsyncConnection = Depends(get_db)
+):
+    rows = await get_user_rows(db, limit=page.fetch_limit, after_id=page.after_id())
+    rows = finalize_page(response, rows, page)
+    if (unchanged := conditional_get(request, response, list_validators(rows))):
+        return unchanged
+    return rows_json.many(response, rows)
 
 @router.get("/error")
 async def trigger_error():
@@ -29,26 +43,17 @@ async def create_new_user(
     request: Request,
     user: UserCreate,
     db: AsyncConnection = Depends(get_db),
-    idempotency_key: str = Header(None, alias="Idempotency-Key")
+    idem: IdempotencyContext = Depends(idempotency(required=True))
 ):
     """
     Створює нового користувача з підтримкою ідемпотентності.
     """
-    if not idempotency_key:
-        raise HTTPException(status_code=400, detail="idempotency_key_required")
-
-    if idempotency_key in idem_store:
-        stored = idem_store[idempotency_key]
-        return JSONResponse(content=stored["response"], status_code=stored["status"])
+    if idem.replay:
+        return idem.replay_response()
 
     try:
         new_user = await create_user(db, user)
-        response_data = new_user.model_dump()
-        status_code = 201
-
-        idem_store[idempotency_key] = {"status": status_code, "response": response_data}
-        
-        return JSONResponse(content=response_data, status_code=status_code)
+        return await idem.respond(new_user.model_dump(), status_code=201)
 
     except HTTPException as e:
         error_response = {
@@ -56,11 +61,7 @@ async def create_new_user(
             "details": e.detail,
             "request_id": getattr(request.state, "request_id", None)
         }
-        status_code = e.status_code
-        
-        idem_store[idempotency_key] = {"status": status_code, "response": error_response}
-        
-        return JSONResponse(content=error_response, status_code=status_code)
+        return await idem.respond(error_response, status_code=e.status_code)
 
 
 @router.get("/me")
@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, List, Tuple
+
+# Вільні вікна майстрів.
+#
+# Зайнятість майстра - записи обслуговування: [date, date + duration хв).
+# Записи, що перетинають запитаний період, БД знаходить GiST-індексом по
+# tsrange (crud/schedule.py), а тут вони, вже відсортовані за майстром і
+# початком, зливаються одним проходом, і проміжки між ними довжиною від
+# length стають вільними вікнами.
+
+Interval = Tuple[datetime, datetime]
+
+
+@dataclass
+class MechanicAvailability:
+    mechanic_id: int
+    username: str
+    free: List[Interval]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """
+    Зливає інтервали, що перетинаються або стикаються. Вхід - за зростанням початку.
+    """
+    merged: List[Interval] = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_slots(busy: Iterable[Interval], start: datetime, end: datetime, length: timedelta) -> List[Interval]:
+    """
+    Проміжки [start, end) поза busy довжиною не менше length.
+    busy - за зростанням початку (можуть перетинатися).
+    """
+    slots = []
+    cursor = start
+    for busy_start, busy_end in merge_intervals(busy):
+        gap_end = min(busy_start, end)
+        if gap_end - cursor >= length:
+            slots.append((cursor, gap_end))
+        cursor = max(cursor, busy_end)
+        if cursor >= end or busy_start >= end:
+            return slots
+    if end - cursor >= length:
+        slots.append((cursor, end))
+    return slots
+
+
+def availability(
+    mechanics: List[Tuple[int, str]],
+    busy_rows: Iterable,
+    start: datetime,
+    end: datetime,
+    length: timedelta,
+) -> List[MechanicAvailability]:
+    """
+    Вільні вікна кожного майстра. busy_rows - (performed_by, starts_at, ends_at),
+    відсортовані за майстром і початком; майстер без записів вільний весь період.
+    """
+    busy: Dict[int, List[Interval]] = {
+        mechanic_id: [(row[1], row[2]) for row in rows]
+        for mechanic_id, rows in groupby(busy_rows, key=lambda row: row[0])
+    }
+    return [
+        MechanicAvailability(mechanic_id, username, free_slots(busy.get(mechanic_id, ()), start, end, length))
+        for mechanic_id, username in mechanics
+    ]
+
+
+def any_mechanic_free(mechanics: List[MechanicAvailability]) -> List[Interval]:
+    """
+    Час, коли хоча б один майстер має вільне вікно потрібної довжини.
+    """
+    return merge_intervals(sorted(slot for mechanic in mechanics for slot in mechanic.free))
@@ -1,6 +1,9 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, EmailStr, ConfigDict, Field
+from typing import List, Optional
 from datetime import datetime
+from schemas.cars import CarInDB
+from schemas.invoices import InvoiceWithItems
+from schemas.service_records import ServiceRecordInDB
 
 class CustomerBase(BaseModel):
     first_name: str
@@ -21,3 +24,12 @@ class CustomerInDB(CustomerBase):
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+class CustomerOverview(BaseModel):
+    customer: CustomerInDB
+    cars: List[CarInDB] = []
+    invoices: List[InvoiceWithItems] = []
+    recent_service_records: List[ServiceRecordInDB] = []
+
+class CustomerOverviewRequest(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=100)
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from datetime import datetime
+
+class QueryFingerprint(BaseModel):
+    fingerprint: str
+    operation: str
+    statement: str
+    calls: int
+    errors: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+
+class SlowQuery(BaseModel):
+    fingerprint: str
+    statement: str
+    duration_ms: float
+    # Назва параметра -> тип (list[N] для списків), без значень
+    params: Dict[str, str]
+    database: str
+    at: datetime
+    plan: Optional[str] = None
+
+class QueriesReport(BaseModel):
+    slow_query_ms: float
+    # За сумарним часом, найдорожчі першими
+    fingerprints: List[QueryFingerprint]
+    # Найновіші першими
+    slow: List[SlowQuery]
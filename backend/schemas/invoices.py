@@ -1,7 +1,9 @@
-from pydantic import ConfigDict, BaseModel
+from pydantic import ConfigDict, BaseModel, Field
 from typing import Optional
 from datetime import datetime
 from decimal import Decimal
+from typing import List
+from schemas.invoice_items import InvoiceItemInDB
 
 class InvoiceBase(BaseModel):
     customer_id: int
@@ -33,3 +35,30 @@ class InvoiceInDB(InvoiceBase):
     created_by: Optional[int]
 
     model_config = ConfigDict(from_attributes=True)
+
+class InvoiceWithItems(InvoiceInDB):
+    items: List[InvoiceItemInDB] = []
+
+
+class InvoiceLine(BaseModel):
+    service_id: int
+    quantity: int = Field(1, ge=1)
+    unit_price: Optional[Decimal] = None  # None - ціна з каталогу послуг
+
+
+class InvoiceWithItemsCreate(BaseModel):
+    """
+    Інвойс разом з позиціями; total_amount - сума позицій. service_record_ids -
+    записи обслуговування цього авто, які ще не мають інвойсу.
+    """
+    customer_id: int
+    car_id: int
+    worker_id: int
+    payment_status: str = "unpaid"
+    work_status: str = "new"
+    items: List[InvoiceLine] = Field(min_length=1, max_length=500)
+    service_record_ids: List[int] = Field(default_factory=list, max_length=500)
+
+
+class InvoiceItemsBatch(BaseModel):
+    items: List[InvoiceLine] = Field(min_length=1, max_length=500)
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from datetime import date
+from decimal import Decimal
+
+RevenueGroupBy = Literal["day", "service", "worker"]
+
+class RevenueRow(BaseModel):
+    # Заповнені лише поля групування: day, service_* або worker_*
+    day: Optional[date] = None
+    service_id: Optional[int] = None
+    service_name: Optional[str] = None
+    worker_id: Optional[int] = None
+    worker_username: Optional[str] = None
+    amount: Decimal
+    # Інвойси (day, worker) або продані одиниці послуги (service)
+    count: int
+
+class RevenueReport(BaseModel):
+    group_by: RevenueGroupBy
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    total: Decimal
+    rows: List[RevenueRow]
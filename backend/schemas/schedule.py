@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import List
+from datetime import datetime
+
+class TimeSlot(BaseModel):
+    start: datetime
+    end: datetime
+
+class MechanicSlots(BaseModel):
+    mechanic_id: int
+    username: str
+    free: List[TimeSlot]
+
+class Availability(BaseModel):
+    date_from: datetime
+    date_to: datetime
+    duration: int
+    # Вікна кожного майстра і час, коли вільний хоча б один з них
+    mechanics: List[MechanicSlots]
+    any: List[TimeSlot]
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import List
+from schemas.cars import CarInDB
+from schemas.customers import CustomerInDB
+
+class SearchResults(BaseModel):
+    customers: List[CustomerInDB] = []
+    cars: List[CarInDB] = []
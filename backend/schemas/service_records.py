@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from decimal import Decimal
 
 class ServiceRecordBase(BaseModel):
     car_id: int
@@ -24,3 +25,18 @@ class ServiceRecordInDB(ServiceRecordBase):
 
     class Config:
         from_attributes = True
+
+class CarHistoryEntry(BaseModel):
+    id: int
+    date: datetime
+    mileage: Optional[int] = None
+    mileage_delta: Optional[int] = None
+    notes: Optional[str] = None
+    service_id: int
+    service_name: Optional[str] = None
+    service_price: Optional[Decimal] = None
+    performed_by: Optional[int] = None
+    mechanic_username: Optional[str] = None
+    invoice_id: Optional[int] = None
+    invoice_payment_status: Optional[str] = None
+    invoice_work_status: Optional[str] = None
@@ -0,0 +1,129 @@
+import json
+import os
+import types
+import typing
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Iterable, List, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel, EmailStr
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - без orjson працює повільніший json
+    orjson = None
+
+# Швидка серіалізація рядків БД у JSON, без Pydantic.
+#
+# Звичайний шлях: рядок -> CarInDB(**dict(row)) -> FastAPI ще раз валідує його
+# проти response_model -> json.dumps. На великих списках це дорожче за сам SQL.
+# Тут рядок одразу перетворюється на bytes: для кожного поля моделі заздалегідь
+# вибрано перетворення, яке дає той самий JSON, що й Pydantic (float з NUMERIC -
+# число, Decimal - рядок, datetime - ISO 8601), а колонки поза моделлю відкидаються.
+#
+# Вмикається для роутерів змінною FAST_JSON: "all" (типово), "off" або список
+# роутерів через кому, напр. "cars,invoices".
+
+FAST_JSON = os.getenv("FAST_JSON", "all")
+JSON_MEDIA_TYPE = "application/json"
+
+
+def fast_json_enabled(router: str) -> bool:
+    setting = FAST_JSON.strip().lower()
+    if setting in ("all", "1", "true"):
+        return True
+    if setting in ("off", "0", "false", ""):
+        return False
+    return router in {name.strip() for name in setting.split(",")}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default)
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _to_float(value):
+    return None if value is None else float(value)
+
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+
+# None - значення йде в JSON як є (orjson сам пише datetime у тому ж форматі, що Pydantic)
+_CONVERTERS = {
+    int: None,
+    str: None,
+    bool: None,
+    datetime: None,
+    date: None,
+    float: _to_float,
+    Decimal: _to_str,
+}
+
+
+def _field_type(annotation):
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType) and len(args) == 1:
+        return args[0]
+    return annotation
+
+
+def _converter(model: Type[BaseModel], name: str, annotation) -> Optional[Callable]:
+    field_type = _field_type(annotation)
+    if field_type in _CONVERTERS:
+        return _CONVERTERS[field_type]
+    if field_type is EmailStr:
+        return None  # у БД лежить уже нормалізована при записі адреса
+    raise TypeError(f"{model.__name__}.{name}: unsupported field type {annotation!r} for fast JSON")
+
+
+class RowSerializer:
+    """
+    Перетворює рядки БД на JSON-відповідь у форматі model. Якщо fast=False,
+    повертає моделі, і FastAPI серіалізує їх звичним шляхом.
+    """
+
+    def __init__(self, model: Type[BaseModel], fast: bool = True):
+        self.model = model
+        self.fast = fast
+        self.fields = [
+            (name, _converter(model, name, field.annotation))
+            for name, field in model.model_fields.items()
+        ]
+
+    def to_dict(self, row) -> dict:
+        return {
+            name: row[name] if convert is None else convert(row[name])
+            for name, convert in self.fields
+        }
+
+    def encode(self, rows: Iterable[Any]) -> bytes:
+        return dumps([self.to_dict(row) for row in rows])
+
+    def encode_one(self, row) -> bytes:
+        return dumps(self.to_dict(row))
+
+    def _response(self, content: bytes, response: Response) -> Response:
+        # Заголовки, виставлені в ендпоінті (ETag, X-Next-Cursor), переносимо
+        return Response(content, media_type=JSON_MEDIA_TYPE, headers=dict(response.headers))
+
+    def many(self, response: Response, rows: List[Any]):
+        if not self.fast:
+            return [self.model(**dict(row)) for row in rows]
+        return self._response(self.encode(rows), response)
+
+    def one(self, response: Response, row):
+        if not self.fast:
+            return self.model(**dict(row))
+        return self._response(self.encode_one(row), response)
@@ -0,0 +1,72 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from opentelemetry import metrics
+
+from crud.services import get_services_version, load_services_catalog
+from schemas.services import ServiceInDB
+
+# Каталог послуг у пам'яті процесу. Читають його постійно (інвойси, записи
+# обслуговування), пишуть рідко. Кожен запис у services піднімає версію в
+# catalog_versions, тож на кожен запит вистачає дешевої перевірки версії
+# (пошук за первинним ключем) - і кеш коректний для будь-якої кількості воркерів.
+
+meter = metrics.get_meter(__name__)
+hits_counter = meter.create_counter(
+    "services_catalog.hits",
+    description="Services catalog reads served from the in-process copy",
+)
+reloads_counter = meter.create_counter(
+    "services_catalog.reloads",
+    description="Services catalog reloads after a version change",
+)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: Optional[int]
+    services: List[ServiceInDB] = field(default_factory=list)
+    by_id: Dict[int, ServiceInDB] = field(default_factory=dict)
+
+    def get(self, service_id: int) -> Optional[ServiceInDB]:
+        return self.by_id.get(service_id)
+
+
+class ServicesCatalog:
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    async def current(self, db) -> CatalogSnapshot:
+        """
+        Актуальний знімок каталогу: перевіряє версію і, якщо вона змінилась,
+        перечитує каталог (паралельні запити чекають на одне перечитування).
+        """
+        version = await get_services_version(db)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            hits_counter.add(1)
+            return snapshot
+        async with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = await self._load(db)
+        return snapshot
+
+    async def get(self, db, service_id: int) -> Optional[ServiceInDB]:
+        return (await self.current(db)).get(service_id)
+
+    def clear(self):
+        self._snapshot = None
+
+    async def _load(self, db) -> CatalogSnapshot:
+        version, services = await load_services_catalog(db)
+        snapshot = CatalogSnapshot(version, services, {service.id: service for service in services})
+        # Поки ми читали, версія могла піти вперед - тоді наступний запит перечитає ще раз
+        self._snapshot = snapshot
+        reloads_counter.add(1)
+        return snapshot
+
+
+services_catalog = ServicesCatalog()
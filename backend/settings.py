@@ -0,0 +1,45 @@
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+# Налаштування застосунку для create_app (main.py). Налаштування окремих
+# підсистем (пул БД, логування запитів, семплінг трейсів) лишаються змінними
+# середовища у відповідних модулях.
+
+DEFAULT_CORS_ORIGINS = [
+    "http://localhost:3000",  # React / Next.js за замовчуванням
+    "http://127.0.0.1:3000",
+    "http://localhost:5173",  # Vite за замовчуванням
+    "http://localhost:8080",
+]
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: Optional[str] = None
+    database_replica_url: Optional[str] = None
+    telemetry_mode: str = "otlp"
+    otlp_endpoint: str = "http://collector:4318"
+    service_name: str = "sto-crm-backend"
+    environment: str = "development"
+    rate_limit_window_ms: int = 2000
+    rate_limit_max_requests: int = 30
+    cors_origins: List[str] = field(default_factory=lambda: list(DEFAULT_CORS_ORIGINS))
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_dotenv()
+        origins = os.getenv("CORS_ORIGINS")
+        return cls(
+            database_url=os.getenv("DATABASE_URL"),
+            database_replica_url=os.getenv("DATABASE_REPLICA_URL"),
+            telemetry_mode=os.getenv("TELEMETRY_MODE", "otlp"),
+            otlp_endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://collector:4318"),
+            service_name=os.getenv("OTEL_SERVICE_NAME", "sto-crm-backend"),
+            environment=os.getenv("APP_ENV", "development"),
+            rate_limit_window_ms=int(os.getenv("RATE_LIMIT_WINDOW_MS", 2000)),
+            rate_limit_max_requests=int(os.getenv("RATE_LIMIT_MAX_REQUESTS", 30)),
+            cors_origins=origins.split(",") if origins else list(DEFAULT_CORS_ORIGINS),
+        )
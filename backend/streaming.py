@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator, List
+
+from fastapi.responses import StreamingResponse
+
+# Потоковий експорт рядків з БД у NDJSON або CSV.
+# Рядки читаються курсором (Database.iterate) і віддаються клієнту частинами,
+# тому пам'ять не росте з кількістю рядків.
+
+CHUNK_ROWS = 500
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+async def _ndjson_chunks(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    buffer = []
+    async for row in rows:
+        buffer.append(json.dumps(row, default=_json_default, ensure_ascii=False))
+        if len(buffer) >= CHUNK_ROWS:
+            yield "\n".join(buffer) + "\n"
+            buffer = []
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+async def _csv_chunks(rows: AsyncIterator[dict], columns: List[str]) -> AsyncIterator[str]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    # Заголовок віддаємо одразу, щоб перший байт прийшов без очікування запиту
+    yield out.getvalue()
+    out.seek(0)
+    out.truncate()
+
+    count = 0
+    async for row in rows:
+        writer.writerow([_csv_value(row[c]) for c in columns])
+        count += 1
+        if count >= CHUNK_ROWS:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+            count = 0
+    if count:
+        yield out.getvalue()
+
+
+def export_response(rows: AsyncIterator[dict], fmt: str, columns: List[str], filename: str) -> StreamingResponse:
+    if fmt == "csv":
+        body = _csv_chunks(rows, columns)
+    else:
+        body = _ndjson_chunks(rows)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
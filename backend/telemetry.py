@@ -0,0 +1,336 @@
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from opentelemetry import metrics, trace
+from opentelemetry._logs import set_logger_provider
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler
+from opentelemetry.sdk._logs.export import BatchLogRecordProcessor, LogRecordExportResult
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader, MetricReader, PeriodicExportingMetricReader
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExportResult
+from opentelemetry.trace import StatusCode
+
+# Телеметрія застосунку: трейси, метрики й логи в одному з режимів TELEMETRY_MODE.
+#
+# - otlp (типово): експорт в OTLP-колектор (OTEL_EXPORTER_OTLP_ENDPOINT).
+# - memory: без колектора - останні TELEMETRY_MEMORY_ITEMS спанів і логів
+#   лежать у кільцевих буферах процесу, метрики - в InMemoryMetricReader.
+# - off: жодних провайдерів (API OpenTelemetry лишається no-op), FastAPI не
+#   інструментується, логи йдуть у stderr.
+#
+# Трейси семплуються "з хвоста": спани трейсу чекають у пам'яті, доки не
+# завершиться його локальний кореневий спан, і лише тоді вирішується, чи
+# експортувати трейс. Трейси з помилкою (статус ERROR або HTTP 5xx) і повільні
+# (корінь довший за TRACE_SLOW_MS) зберігаються завжди, решта - з часткою
+# TRACE_SAMPLE_RATE, детерміновано за trace_id. Буфер обмежений
+# (TRACE_BUFFER_MAX_TRACES): найстаріші незавершені трейси відкидаються.
+#
+# Метрики самої телеметрії:
+# - telemetry.traces: рішення семплера (decision kept/dropped, reason);
+# - telemetry.export.items: спани й логи, віддані експортеру (signal, result);
+# - telemetry.export.dropped: відкинуті через повну чергу Batch*Processor;
+# - telemetry.export.queue_size: поточна глибина цих черг.
+
+TELEMETRY_MODES = ("off", "memory", "otlp")
+TELEMETRY_MODE = os.getenv("TELEMETRY_MODE", "otlp")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.1))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 500))
+TRACE_BUFFER_MAX_TRACES = int(os.getenv("TRACE_BUFFER_MAX_TRACES", 5000))
+TELEMETRY_MEMORY_ITEMS = int(os.getenv("TELEMETRY_MEMORY_ITEMS", 10_000))
+METRICS_EXPORT_INTERVAL_MS = int(os.getenv("METRICS_EXPORT_INTERVAL_MS", 15_000))
+
+meter = metrics.get_meter(__name__)
+traces_counter = meter.create_counter(
+    "telemetry.traces",
+    description="Tail sampling decisions per trace",
+)
+export_items_counter = meter.create_counter(
+    "telemetry.export.items",
+    description="Spans and log records handed to the exporter, by result",
+)
+export_dropped_counter = meter.create_counter(
+    "telemetry.export.dropped",
+    description="Spans and log records dropped because the export queue was full",
+)
+
+
+def keep_reason(spans: List[ReadableSpan], root: ReadableSpan, sample_rate: float, slow_ms: float) -> Optional[str]:
+    """
+    Чому трейс варто зберегти (error / slow / sampled), None - відкинути.
+    """
+    for span in spans:
+        if span.status.status_code is StatusCode.ERROR:
+            return "error"
+        status = span.attributes.get("http.status_code") or span.attributes.get("http.response.status_code")
+        if isinstance(status, int) and status >= 500:
+            return "error"
+    if (root.end_time - root.start_time) / 1e6 >= slow_ms:
+        return "slow"
+    # Молодші 64 біти trace_id випадкові - як у TraceIdRatioBased
+    if (root.context.trace_id & 0xFFFFFFFFFFFFFFFF) < sample_rate * 2**64:
+        return "sampled"
+    return None
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """
+    Буферизує завершені спани за trace_id і передає next_processor лише
+    трейси, які keep_reason вирішив зберегти.
+    """
+
+    def __init__(
+        self,
+        next_processor: SpanProcessor,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        slow_ms: float = TRACE_SLOW_MS,
+        max_traces: int = TRACE_BUFFER_MAX_TRACES,
+    ):
+        self.next_processor = next_processor
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_traces = max_traces
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+        # Рішення по нещодавніх трейсах - для спанів, що завершились після кореня
+        self._decided: "OrderedDict[int, bool]" = OrderedDict()
+
+    def on_start(self, span, parent_context=None):
+        pass
+
+    def on_end(self, span: ReadableSpan):
+        trace_id = span.context.trace_id
+        evicted = 0
+        with self._lock:
+            if trace_id in self._decided:
+                if self._decided[trace_id]:
+                    self.next_processor.on_end(span)
+                return
+            spans = self._pending.setdefault(trace_id, [])
+            spans.append(span)
+            if span.parent is not None and not span.parent.is_remote:
+                while len(self._pending) > self.max_traces:
+                    self._pending.popitem(last=False)
+                    evicted += 1
+                spans = None
+            else:
+                del self._pending[trace_id]
+        if evicted:
+            traces_counter.add(evicted, {"decision": "dropped", "reason": "evicted"})
+        if spans is None:
+            return
+
+        reason = keep_reason(spans, span, self.sample_rate, self.slow_ms)
+        with self._lock:
+            self._decided[trace_id] = reason is not None
+            if len(self._decided) > self.max_traces:
+                self._decided.popitem(last=False)
+        if reason is None:
+            traces_counter.add(1, {"decision": "dropped", "reason": "fast"})
+            return
+        traces_counter.add(1, {"decision": "kept", "reason": reason})
+        for buffered in spans:
+            self.next_processor.on_end(buffered)
+
+    def shutdown(self):
+        self.next_processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.next_processor.force_flush(timeout_millis)
+
+
+def queue_depth(processor) -> Optional[Tuple[int, int]]:
+    """
+    (довжина, місткість) черги Batch*Processor; None, якщо SDK влаштований інакше.
+    """
+    batch = getattr(processor, "_batch_processor", None)
+    items = getattr(batch, "_queue", None)
+    capacity = getattr(batch, "_max_queue_size", None)
+    if items is None or capacity is None:
+        return None
+    return len(items), capacity
+
+
+def _count_queue_full(processor, signal: str):
+    depth = queue_depth(processor)
+    if depth is not None and depth[0] >= depth[1]:
+        export_dropped_counter.add(1, {"signal": signal})
+
+
+class MeteredBatchSpanProcessor(BatchSpanProcessor):
+    def on_end(self, span: ReadableSpan):
+        _count_queue_full(self, "traces")
+        super().on_end(span)
+
+
+class MeteredBatchLogRecordProcessor(BatchLogRecordProcessor):
+    def on_emit(self, log_record):
+        _count_queue_full(self, "logs")
+        super().on_emit(log_record)
+
+
+class CountingExporter:
+    """
+    Обгортка експортера спанів чи логів: рахує віддані елементи за результатом.
+    """
+
+    def __init__(self, exporter, signal: str):
+        self.exporter = exporter
+        self.signal = signal
+
+    def export(self, batch):
+        try:
+            result = self.exporter.export(batch)
+        except Exception:
+            export_items_counter.add(len(batch), {"signal": self.signal, "result": "failure"})
+            raise
+        outcome = "success" if result.name == "SUCCESS" else "failure"
+        export_items_counter.add(len(batch), {"signal": self.signal, "result": outcome})
+        return result
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.exporter.force_flush(timeout_millis)
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+
+class RingBufferExporter:
+    """
+    Експортер режиму memory: останні maxlen спанів чи логів у пам'яті процесу.
+    """
+
+    def __init__(self, maxlen: int, success):
+        self.items = deque(maxlen=maxlen)
+        self.success = success
+
+    def export(self, batch):
+        self.items.extend(batch)
+        return self.success
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+    def shutdown(self):
+        pass
+
+
+@dataclass
+class Telemetry:
+    mode: str
+    log_handler: logging.Handler
+    tracer_provider: Optional[TracerProvider] = None
+    meter_provider: Optional[MeterProvider] = None
+    logger_provider: Optional[LoggerProvider] = None
+    # Лише в режимі memory
+    spans: Optional[RingBufferExporter] = None
+    logs: Optional[RingBufferExporter] = None
+    metric_reader: Optional[InMemoryMetricReader] = None
+
+    def install(self):
+        """
+        Робить провайдери глобальними (trace/metrics/_logs API). У режимі off - нічого.
+        """
+        if self.tracer_provider is not None:
+            trace.set_tracer_provider(self.tracer_provider)
+        if self.meter_provider is not None:
+            metrics.set_meter_provider(self.meter_provider)
+        if self.logger_provider is not None:
+            set_logger_provider(self.logger_provider)
+
+
+def build_telemetry(
+    mode: str = TELEMETRY_MODE,
+    resource: Optional[Resource] = None,
+    otlp_endpoint: Optional[str] = None,
+) -> Telemetry:
+    if mode not in TELEMETRY_MODES:
+        raise ValueError(f"TELEMETRY_MODE must be one of {', '.join(TELEMETRY_MODES)}, got {mode!r}")
+    if mode == "off":
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        return Telemetry(mode=mode, log_handler=handler)
+
+    resource = resource or Resource.create()
+    spans = logs = None
+    if mode == "memory":
+        spans = RingBufferExporter(TELEMETRY_MEMORY_ITEMS, SpanExportResult.SUCCESS)
+        logs = RingBufferExporter(TELEMETRY_MEMORY_ITEMS, LogRecordExportResult.SUCCESS)
+        metric_reader: MetricReader = InMemoryMetricReader()
+        span_exporter, log_exporter = spans, logs
+    else:
+        # Імпорт лише тут: режимам без колектора OTLP-клієнти не потрібні
+        from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        endpoint = otlp_endpoint or os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://collector:4318")
+        span_exporter = OTLPSpanExporter(endpoint=f"{endpoint}/v1/traces")
+        log_exporter = OTLPLogExporter(endpoint=f"{endpoint}/v1/logs")
+        metric_reader = PeriodicExportingMetricReader(
+            OTLPMetricExporter(endpoint=f"{endpoint}/v1/metrics"),
+            export_interval_millis=METRICS_EXPORT_INTERVAL_MS,
+        )
+
+    meter_provider = MeterProvider(resource=resource, metric_readers=[metric_reader])
+
+    span_processor = MeteredBatchSpanProcessor(CountingExporter(span_exporter, "traces"))
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(TailSamplingProcessor(span_processor))
+
+    log_processor = MeteredBatchLogRecordProcessor(CountingExporter(log_exporter, "logs"))
+    logger_provider = LoggerProvider(resource=resource)
+    logger_provider.add_log_record_processor(log_processor)
+
+    queues: Dict[str, object] = {"traces": span_processor, "logs": log_processor}
+
+    def observe_queues(options: CallbackOptions):
+        for signal, processor in queues.items():
+            depth = queue_depth(processor)
+            if depth is not None:
+                yield Observation(depth[0], {"signal": signal})
+
+    meter_provider.get_meter(__name__).create_observable_gauge(
+        "telemetry.export.queue_size",
+        callbacks=[observe_queues],
+        description="Spans and log records waiting in the export queue",
+    )
+
+    return Telemetry(
+        mode=mode,
+        log_handler=LoggingHandler(level=logging.NOTSET, logger_provider=logger_provider),
+        tracer_provider=tracer_provider,
+        meter_provider=meter_provider,
+        logger_provider=logger_provider,
+        spans=spans,
+        logs=logs,
+        metric_reader=metric_reader if mode == "memory" else None,
+    )
+
+
+# pid -> телеметрія цього процесу
+_started: Dict[int, Telemetry] = {}
+
+
+def start_telemetry(
+    mode: str = TELEMETRY_MODE,
+    resource: Optional[Resource] = None,
+    otlp_endpoint: Optional[str] = None,
+) -> Telemetry:
+    """
+    build_telemetry + install один раз на процес. Викликається з lifespan, тож
+    у pre-fork сервері потоки експортерів створює кожен воркер уже після fork;
+    повторний старт застосунку в тому ж процесі отримує ту саму телеметрію.
+    """
+    telemetry = _started.get(os.getpid())
+    if telemetry is None:
+        telemetry = build_telemetry(mode, resource, otlp_endpoint)
+        telemetry.install()
+        _started[os.getpid()] = telemetry
+    return telemetry
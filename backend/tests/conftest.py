@@ -12,7 +12,9 @@ load_dotenv()
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from main import app
+from main import app, rate_limiter
+from auth.principal_cache import principal_cache
+from services_catalog import services_catalog
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
@@ -36,6 +38,10 @@ def setup_database():
         finally:
             await database.disconnect()
     asyncio.run(_setup_database())
+    # База щойно перестворена, тож закешовані користувачі більше не актуальні
+    principal_cache.clear()
+    rate_limiter.clear()
+    services_catalog.clear()
 
 @pytest.fixture(scope="function")
 async def db_connection():
@@ -1,6 +1,17 @@
+import json
+import os
+import time
 import uuid
+import pytest
 from fastapi.testclient import TestClient
 
+import db
+from db_pool import PooledDatabase, pool_options
+from main import app
+from replica import PRIMARY_COOKIE, ReplicaMonitor
+
+REPLICA_URL = os.getenv("TEST_DATABASE_REPLICA_URL")
+
 def test_create_user_success(client: TestClient):
     """Test successful user creation."""
     response = client.post("/users/", json={
@@ -34,4 +45,632 @@ def test_create_user_duplicate_username(client: TestClient):
         "role": "master"  # Виправлено на валідну роль
     }, headers={"Idempotency-Key": str(uuid.uuid4())})
     assert response.status_code == 400
-    assert "Username already registered" in response.text
\ No newline at end of file
+    assert "Username already registered" in response.text
+
+def test_list_customers_keyset_pagination(client: TestClient):
+    """Test that the customers list is paged with an opaque cursor."""
+    for i in range(5):
+        response = client.post("/customers/", json={
+            "first_name": f"Name{i}",
+            "last_name": "Pager",
+            "phone": f"+38050000000{i}",
+            "email": f"pager{i}@example.com",
+        })
+        assert response.status_code == 201
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/customers/", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(c["id"] for c in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+
+    response = client.get("/customers/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_export_invoices_streams_ndjson_and_csv(client: TestClient):
+    """Test invoice export in both formats with a status filter."""
+    client.post("/users/", json={
+        "username": "accountant",
+        "email": "accountant@example.com",
+        "password": "password123",
+        "role": "admin"
+    }, headers={"Idempotency-Key": str(uuid.uuid4())})
+    token = client.post("/auth/login", json={
+        "username": "accountant", "password": "password123"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    customer = client.post("/customers/", json={
+        "first_name": "Export", "last_name": "Client",
+        "phone": "+380500000000", "email": "export@example.com",
+    }).json()
+    car = client.post("/cars/", json={
+        "customer_id": customer["id"], "brand": "Skoda", "model": "Octavia", "year": 2018,
+    }).json()
+    service = client.post("/services/", json={"name": "Oil change", "price": 50, "duration": 30}).json()
+    for status in ("unpaid", "paid"):
+        response = client.post("/invoices/", json={
+            "customer_id": customer["id"], "car_id": car["id"], "worker_id": 1,
+            "service_id": service["id"], "total_amount": 50, "payment_status": status,
+        }, headers=headers)
+        assert response.status_code == 201
+
+    response = client.get("/invoices/export", params={"payment_status": "paid"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["payment_status"] == "paid"
+    assert lines[0]["total_amount"] == "50.00"
+
+    response = client.get("/invoices/export", params={"format": "csv"}, headers=headers)
+    assert response.status_code == 200
+    rows = response.text.splitlines()
+    assert rows[0].startswith("id,customer_id,car_id")
+    assert len(rows) == 3
+
+
+def test_create_user_idempotent_replay(client: TestClient):
+    """Test that a repeated Idempotency-Key returns the stored response."""
+    payload = {
+        "username": "replayed",
+        "email": "replayed@example.com",
+        "password": "password123",
+        "role": "master"
+    }
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    first = client.post("/users/", json=payload, headers=headers)
+    second = client.post("/users/", json=payload, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert first.json() == second.json()
+    assert second.headers.get("Idempotent-Replayed") == "true"
+
+    # Той самий ключ з іншим тілом запиту - помилка клієнта
+    response = client.post("/users/", json={**payload, "username": "other"}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_rate_limit_returns_429_with_retry_after(client: TestClient):
+    """Test that a route with a tight budget answers 429 once it is spent."""
+    statuses = [client.get("/invoices/export").status_code for _ in range(6)]
+    assert statuses[:5] == [401] * 5
+    assert statuses[5] == 429
+
+    response = client.get("/invoices/export")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Інші ендпоінти мають власне відро
+    assert client.get("/").status_code == 200
+
+
+def test_car_history_joins_and_pages_by_date(client: TestClient):
+    """Test the single-query car history with mileage progression."""
+    mechanic = client.post("/users/", json={
+        "username": "mechanic",
+        "email": "mechanic@example.com",
+        "password": "password123",
+        "role": "master"
+    }, headers={"Idempotency-Key": str(uuid.uuid4())}).json()
+    customer = client.post("/customers/", json={
+        "first_name": "History", "last_name": "Owner",
+        "phone": "+380500000001", "email": "history@example.com",
+    }).json()
+    car = client.post("/cars/", json={
+        "customer_id": customer["id"], "brand": "Toyota", "model": "Corolla", "year": 2015,
+    }).json()
+    service = client.post("/services/", json={"name": "Brake pads", "price": 120, "duration": 60}).json()
+    for day, mileage in ((1, 1000), (2, 5000), (3, 9500)):
+        response = client.post("/service-records/", json={
+            "car_id": car["id"], "service_id": service["id"], "performed_by": mechanic["id"],
+            "date": f"2024-03-0{day}T09:00:00", "mileage": mileage,
+        })
+        assert response.status_code == 201
+
+    response = client.get(f"/cars/{car['id']}/history", params={"limit": 2})
+    assert response.status_code == 200
+    first_page = response.json()
+    assert [entry["mileage"] for entry in first_page] == [9500, 5000]
+    assert [entry["mileage_delta"] for entry in first_page] == [4500, 4000]
+    assert first_page[0]["service_name"] == "Brake pads"
+    assert first_page[0]["mechanic_username"] == "mechanic"
+
+    response = client.get(f"/cars/{car['id']}/history", params={
+        "limit": 2, "cursor": response.headers["X-Next-Cursor"]
+    })
+    second_page = response.json()
+    assert [entry["mileage"] for entry in second_page] == [1000]
+    assert second_page[0]["mileage_delta"] is None
+    assert "X-Next-Cursor" not in response.headers
+
+    assert client.get("/cars/999999/history").status_code == 404
+
+
+def test_customer_overview_endpoints(client: TestClient):
+    """Test single and batched customer 360 responses."""
+    ids = []
+    for i in range(2):
+        customer = client.post("/customers/", json={
+            "first_name": f"Overview{i}", "last_name": "Client",
+            "phone": f"+38050111000{i}", "email": f"overview{i}@example.com",
+        }).json()
+        client.post("/cars/", json={
+            "customer_id": customer["id"], "brand": "Ford", "model": "Focus", "year": 2012,
+        })
+        ids.append(customer["id"])
+
+    response = client.get(f"/customers/{ids[0]}/overview")
+    assert response.status_code == 200
+    assert response.json()["customer"]["id"] == ids[0]
+    assert len(response.json()["cars"]) == 1
+
+    response = client.post("/customers/overview", json={"ids": [ids[1], 999999, ids[0]]})
+    assert response.status_code == 200
+    assert [o["customer"]["id"] for o in response.json()] == [ids[1], ids[0]]
+
+    assert client.get("/customers/999999/overview").status_code == 404
+
+
+def test_bulk_import_customers_cars_and_services(client: TestClient):
+    """Test bulk endpoints: NDJSON and JSON input, VIN upsert, per-row errors."""
+    ndjson = "\n".join(json.dumps({
+        "first_name": f"Bulk{i}", "last_name": "Fleet",
+        "phone": f"+38067000000{i}", "email": f"bulk{i}@example.com",
+    }) for i in range(3)) + "\n{not json}\n"
+    response = client.post("/customers/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["errors"]) == (3, 1)
+    assert body["results"][3] == {"index": 3, "status": "error", "id": None, "error": "invalid_json"}
+    customer_id = body["results"][0]["id"]
+
+    cars = [
+        {"customer_id": customer_id, "brand": "Renault", "model": "Kangoo", "year": 2019, "vin": "VF1KW0000001"},
+        {"customer_id": customer_id, "brand": "Renault", "model": "Kangoo", "year": 2020, "vin": "VF1KW0000002"},
+        {"customer_id": 999999, "brand": "Renault", "model": "Kangoo", "year": 2020, "vin": "VF1KW0000003"},
+        {"customer_id": customer_id, "brand": "Renault", "model": "Master", "year": 2021},
+    ]
+    body = client.post("/cars/bulk", json=cars).json()
+    assert [r["status"] for r in body["results"]] == ["created", "created", "error", "created"]
+    first_car_id = body["results"][0]["id"]
+
+    cars[0]["year"] = 2018
+    body = client.post("/cars/bulk", json=cars[:1]).json()
+    assert body["results"][0] == {"index": 0, "status": "updated", "id": first_car_id, "error": None}
+    assert client.get(f"/cars/{first_car_id}").json()["year"] == 2018
+
+    body = client.post("/services/bulk", json=[
+        {"name": "Diagnostics", "price": 25.5, "duration": 20},
+        {"name": "No price", "duration": 20},
+    ]).json()
+    assert [r["status"] for r in body["results"]] == ["created", "error"]
+    assert client.get(f"/services/{body['results'][0]['id']}").json()["price"] == 25.5
+
+
+
+def test_bulk_import_over_row_limit_writes_nothing(client: TestClient, monkeypatch):
+    """Test that a bulk body over MAX_ROWS is rejected without keeping already flushed chunks."""
+    import bulk
+    monkeypatch.setattr(bulk, "MAX_ROWS", 3)
+    monkeypatch.setattr(bulk, "CHUNK_SIZE", 2)
+    ndjson = "\n".join(json.dumps({
+        "first_name": f"Overflow{i}", "last_name": "Fleet",
+        "phone": f"+38067100000{i}", "email": f"overflow{i}@example.com",
+    }) for i in range(4))
+    response = client.post("/customers/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 413
+    assert client.get("/customers/", params={"q": "Overflow"}).json() == []
+
+
+def test_duplicate_vin_is_a_conflict(client: TestClient):
+    """Test that POST and PUT /cars with a VIN owned by another car return 409."""
+    customer = client.post("/customers/", json={
+        "first_name": "Vin", "last_name": "Owner", "phone": "+380671234000", "email": "vin.owner@example.com",
+    }).json()
+    car = {"customer_id": customer["id"], "brand": "Skoda", "model": "Fabia", "year": 2016, "vin": "TMBEA6NJ0GZ000001"}
+    first = client.post("/cars/", json=car)
+    assert first.status_code == 201
+    response = client.post("/cars/", json=car)
+    assert (response.status_code, response.json()["detail"]) == (409, "duplicate_vin")
+
+    second = client.post("/cars/", json={**car, "vin": "TMBEA6NJ0GZ000002"}).json()
+    response = client.put(f"/cars/{second['id']}", json={**car, "year": 2017})
+    assert (response.status_code, response.json()["detail"]) == (409, "duplicate_vin")
+    assert client.get(f"/cars/{second['id']}").json()["vin"] == "TMBEA6NJ0GZ000002"
+
+def test_search_customers_and_cars(client: TestClient):
+    """Test prefix/suffix search by name, phone digits and VIN."""
+    customer = client.post("/customers/", json={
+        "first_name": "Ivan", "last_name": "Shevchenko",
+        "phone": "+38 (050) 123-45-67", "email": "ivan.search@example.com",
+    }).json()
+    client.post("/customers/", json={
+        "first_name": "Olena", "last_name": "Shevchuk",
+        "phone": "+380671112233", "email": "olena.search@example.com",
+    })
+    client.post("/cars/", json={
+        "customer_id": customer["id"], "brand": "Skoda", "model": "Octavia",
+        "year": 2015, "vin": "TMBJJ7NE5F0123456",
+    })
+
+    names = [c["last_name"] for c in client.get("/customers/", params={"q": "shev"}).json()]
+    assert names == ["Shevchenko", "Shevchuk"]
+    assert [c["id"] for c in client.get("/customers/", params={"q": "ivan shev"}).json()] == [customer["id"]]
+    assert [c["id"] for c in client.get("/customers/", params={"q": "4567"}).json()] == [customer["id"]]
+    assert [c["id"] for c in client.get("/customers/", params={"q": "+380 50 123"}).json()] == [customer["id"]]
+
+    response = client.get("/search/", params={"q": "123456"})
+    assert response.status_code == 200
+    assert [c["vin"] for c in response.json()["cars"]] == ["TMBJJ7NE5F0123456"]
+    assert client.get("/cars/", params={"q": "tmbjj"}).json()[0]["vin"] == "TMBJJ7NE5F0123456"
+    assert client.get("/cars/", params={"q": "100%"}).json() == []
+
+    # q враховує customer_id і повертає одну сторінку - курсор з q відхиляється
+    other = client.post("/customers/", json={
+        "first_name": "Petro", "last_name": "Koval", "phone": "+380631112233", "email": "petro.search@example.com",
+    }).json()
+    client.post("/cars/", json={"customer_id": other["id"], "brand": "Skoda", "model": "Fabia", "year": 2012})
+    assert len(client.get("/cars/", params={"q": "skoda"}).json()) == 2
+    owned = client.get("/cars/", params={"q": "skoda", "customer_id": other["id"]}).json()
+    assert [c["model"] for c in owned] == ["Fabia"]
+    cursor = client.get("/cars/", params={"limit": 1}).headers["X-Next-Cursor"]
+    response = client.get("/cars/", params={"q": "skoda", "cursor": cursor})
+    assert (response.status_code, response.json()["detail"]) == (400, "cursor_not_supported_with_q")
+    assert client.get("/customers/", params={"q": "shev", "cursor": cursor}).status_code == 400
+
+
+def test_services_catalog_etag_and_invalidation(client: TestClient):
+    """Test 304 for an unchanged catalog and a new ETag after a write."""
+    client.post("/services/", json={"name": "Oil change", "price": 40, "duration": 30})
+    response = client.get("/services/")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"services-')
+
+    cached = client.get("/services/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    service_id = client.post("/services/", json={"name": "Brakes", "price": 90, "duration": 60}).json()["id"]
+    response = client.get("/services/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [s["name"] for s in response.json()] == ["Oil change", "Brakes"]
+
+    item = client.get(f"/services/{service_id}")
+    assert item.json()["name"] == "Brakes"
+    assert client.get(f"/services/{service_id}", headers={"If-None-Match": item.headers["ETag"]}).status_code == 304
+
+
+def test_conditional_get_and_if_match(client: TestClient):
+    """Test ETag/Last-Modified revalidation and optimistic locking with If-Match."""
+    payload = {"first_name": "Olena", "last_name": "Bondar", "phone": "+380501234567", "email": "olena@example.com"}
+    customer_id = client.post("/customers/", json=payload).json()["id"]
+
+    response = client.get(f"/customers/{customer_id}")
+    etag = response.headers["ETag"]
+    assert etag.startswith(f'W/"{customer_id}-')
+    last_modified = response.headers["Last-Modified"]
+    assert client.get(f"/customers/{customer_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/customers/{customer_id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    listing = client.get("/customers/")
+    list_etag = listing.headers["ETag"]
+    assert client.get("/customers/", headers={"If-None-Match": list_etag}).status_code == 304
+
+    stale = client.put(f"/customers/{customer_id}", json={**payload, "address": "Kyiv"}, headers={"If-Match": 'W/"1-0"'})
+    assert stale.status_code == 412
+    updated = client.put(f"/customers/{customer_id}", json={**payload, "address": "Kyiv"}, headers={"If-Match": etag})
+    assert updated.status_code == 200
+    assert updated.headers["ETag"] != etag
+    # Той самий ETag вдруге вже застарів
+    assert client.put(f"/customers/{customer_id}", json=payload, headers={"If-Match": etag}).status_code == 412
+
+    response = client.get("/customers/", headers={"If-None-Match": list_etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != list_etag
+    assert client.get(f"/customers/{customer_id}", headers={"If-None-Match": etag}).json()["address"] == "Kyiv"
+
+
+
+def test_list_etag_changes_when_a_row_is_replaced(client: TestClient):
+    """Test that deleting a row from a full page changes the list ETag even if count and max(updated_at) stay."""
+    ids = [client.post("/customers/", json={
+        "first_name": f"Page{i}", "last_name": "Etag", "phone": f"+38050111000{i}", "email": f"page{i}@example.com",
+    }).json()["id"] for i in range(3)]
+    # Найновіший рядок - на сторінці, тож той, що підтягнеться на місце видаленого, не зсуне max(updated_at)
+    newest = {"first_name": "Page1", "last_name": "Etag", "phone": "+380501110001", "email": "page1@example.com"}
+    client.put(f"/customers/{ids[1]}", json={**newest, "address": "Lviv"})
+
+    list_etag = client.get("/customers/", params={"limit": 2}).headers["ETag"]
+    client.post("/users/", json={
+        "username": "etag-manager", "email": "etag-manager@example.com", "password": "password123", "role": "manager"
+    }, headers={"Idempotency-Key": str(uuid.uuid4())})
+    token = client.post("/auth/login", json={"username": "etag-manager", "password": "password123"}).json()["access_token"]
+    assert client.delete(f"/customers/{ids[0]}", headers={"Authorization": f"Bearer {token}"}).status_code == 204
+    response = client.get("/customers/", params={"limit": 2}, headers={"If-None-Match": list_etag})
+    assert response.status_code == 200
+    assert [c["id"] for c in response.json()] == ids[1:]
+    assert response.headers["ETag"] != list_etag
+
+@pytest.mark.skipif(not REPLICA_URL, reason="потрібна streaming-репліка в TEST_DATABASE_REPLICA_URL")
+def test_reads_use_replica_with_read_your_writes_and_lag_fallback(monkeypatch):
+    """Test GET routing to a replica, primary reads after a write and when the replica lags."""
+    replica_database = PooledDatabase(REPLICA_URL, **pool_options())
+    monitor = ReplicaMonitor(replica_database, max_lag=0.5, interval=3600)
+    monkeypatch.setattr(db, "replica_database", replica_database)
+    monkeypatch.setattr(db, "replica_monitor", monitor)
+
+    with TestClient(app) as client:
+        # Дочекатися, поки репліка застосує щойно перестворену схему
+        lsn = client.portal.call(db.database.fetch_val, "SELECT pg_current_wal_lsn()::text")
+        caught_up = "SELECT pg_last_wal_replay_lsn() >= CAST(CAST(:lsn AS text) AS pg_lsn)"
+        while not client.portal.call(replica_database.fetch_val, caught_up, {"lsn": lsn}):
+            time.sleep(0.05)
+        client.portal.call(replica_database.execute, "SELECT pg_wal_replay_pause()")
+        try:
+            customer = client.post("/customers/", json={
+                "first_name": "Replica", "last_name": "Check", "phone": "+380501110000", "email": "r@example.com",
+            })
+            assert PRIMARY_COOKIE in customer.cookies
+            path = f"/customers/{customer.json()['id']}"
+            # Щойно записали - читаємо з primary
+            assert client.get(path).status_code == 200
+
+            # Без cookie - з репліки, яка ще не бачить нового клієнта
+            client.cookies.clear()
+            assert client.get(path).status_code == 404
+
+            # Відставання понад max_lag - читання повертаються на primary
+            time.sleep(0.6)
+            assert client.portal.call(monitor.check) is False
+            assert client.get(path).status_code == 200
+        finally:
+            client.portal.call(replica_database.execute, "SELECT pg_wal_replay_resume()")
+
+
+def test_invoice_with_items_command_is_atomic(client: TestClient):
+    """Test invoice + items + record links in one command, all-or-nothing, and items:batch."""
+    client.post("/users/", json={
+        "username": "cashier", "email": "cashier@example.com", "password": "password123", "role": "manager"
+    }, headers={"Idempotency-Key": str(uuid.uuid4())})
+    token = client.post("/auth/login", json={"username": "cashier", "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    customer = client.post("/customers/", json={
+        "first_name": "Taras", "last_name": "Shevchenko", "phone": "+380501234000", "email": "taras@example.com",
+    }).json()
+    car = client.post("/cars/", json={"customer_id": customer["id"], "brand": "Audi", "model": "A4", "year": 2016}).json()
+    oil = client.post("/services/", json={"name": "Oil", "price": 40.5, "duration": 30}).json()
+    brakes = client.post("/services/", json={"name": "Brakes", "price": 90, "duration": 60}).json()
+    records = [
+        client.post("/service-records/", json={
+            "car_id": car["id"], "service_id": oil["id"], "performed_by": 1, "date": "2024-05-01T10:00:00",
+        }).json()["id"]
+        for _ in range(2)
+    ]
+    command = {
+        "customer_id": customer["id"], "car_id": car["id"], "worker_id": 1,
+        "items": [{"service_id": oil["id"], "quantity": 2}, {"service_id": brakes["id"], "unit_price": "80.00"}],
+        "service_record_ids": records,
+    }
+
+    response = client.post("/invoices/with-items", json=command, headers=headers)
+    assert response.status_code == 201
+    invoice = response.json()
+    assert invoice["total_amount"] == 161.0
+    assert [(i["service_id"], i["unit_price"], i["total"]) for i in invoice["items"]] == [
+        (oil["id"], "40.50", "81.00"), (brakes["id"], "80.00", "80.00"),
+    ]
+    assert {client.get(f"/service-records/{r}").json()["invoice_id"] for r in records} == {invoice["id"]}
+
+    # Записи вже прив'язані, послуги немає - нічого не створюється
+    assert client.post("/invoices/with-items", json=command, headers=headers).status_code == 409
+    unknown = {**command, "service_record_ids": [], "items": [{"service_id": 999999}]}
+    assert client.post("/invoices/with-items", json=unknown, headers=headers).status_code == 422
+    assert len(client.get("/invoices/", headers=headers).json()) == 1
+
+    batch = client.post(f"/invoices/{invoice['id']}/items:batch", json={"items": [{"service_id": brakes["id"]}]}, headers=headers)
+    assert batch.status_code == 201
+    assert [i["total"] for i in batch.json()] == ["90.00"]
+    assert client.get(f"/invoices/{invoice['id']}").json()["total_amount"] == 251.0
+    assert len(client.get(f"/invoice-items/by-invoice/{invoice['id']}").json()) == 3
+    missing = client.post("/invoices/999999/items:batch", json={"items": [{"service_id": oil["id"]}]}, headers=headers)
+    assert missing.status_code == 404
+
+    record = client.post("/service-records/", json={
+        "car_id": car["id"], "service_id": brakes["id"], "performed_by": 1, "date": "2024-05-02T10:00:00",
+    }).json()["id"]
+    created = client.post(f"/service-records/{record}/create-invoice")
+    assert created.status_code == 201
+    assert client.get(f"/service-records/{record}").json()["invoice_id"] == created.json()["invoice_id"]
+    assert client.get(f"/invoices/{created.json()['invoice_id']}").json()["total_amount"] == 90.0
+    assert client.post(f"/service-records/{record}/create-invoice").status_code == 400
+
+def test_revenue_report_follows_invoice_writes(client: TestClient):
+    """Test /reports/revenue by day, service and worker tracks invoice and item writes."""
+    client.post("/users/", json={
+        "username": "owner", "email": "owner@example.com", "password": "password123", "role": "manager"
+    }, headers={"Idempotency-Key": str(uuid.uuid4())})
+    token = client.post("/auth/login", json={"username": "owner", "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    owner_id = client.get("/users/me", headers=headers).json()["id"]
+    mechanic_id = client.post("/users/", json={
+        "username": "mechanic", "email": "mechanic@example.com", "password": "password123", "role": "master"
+    }, headers={"Idempotency-Key": str(uuid.uuid4())}).json()["id"]
+
+    customer = client.post("/customers/", json={
+        "first_name": "Lesia", "last_name": "Ukrainka", "phone": "+380501234001", "email": "lesia@example.com",
+    }).json()
+    car = client.post("/cars/", json={"customer_id": customer["id"], "brand": "Skoda", "model": "Superb", "year": 2019}).json()
+    oil = client.post("/services/", json={"name": "Oil", "price": 40, "duration": 30}).json()
+    tires = client.post("/services/", json={"name": "Tires", "price": 25, "duration": 20}).json()
+
+    invoice = client.post("/invoices/with-items", json={
+        "customer_id": customer["id"], "car_id": car["id"], "worker_id": owner_id,
+        "items": [{"service_id": oil["id"]}, {"service_id": tires["id"], "quantity": 4}],
+    }, headers=headers).json()
+    plain = client.post("/invoices/", json={
+        "customer_id": customer["id"], "car_id": car["id"], "worker_id": mechanic_id,
+        "service_id": oil["id"], "total_amount": 60,
+    }, headers={**headers, "Idempotency-Key": str(uuid.uuid4())}).json()
+    item = client.post("/invoice-items/", json={
+        "invoice_id": plain["id"], "service_id": oil["id"], "quantity": 1, "unit_price": 60, "total": 60,
+    }).json()
+
+    def report(group_by, **params):
+        response = client.get("/reports/revenue", params={"group_by": group_by, **params}, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    today = invoice["issue_date"][:10]
+    by_day = report("day", **{"from": today, "to": today})
+    assert by_day["rows"] == [{"day": today, "amount": "200.00", "count": 2}]
+    assert by_day["total"] == "200.00"
+    assert report("day", **{"from": "2000-01-01", "to": "2000-01-31"})["rows"] == []
+    assert {(r["service_name"], r["amount"], r["count"]) for r in report("service")["rows"]} == {
+        ("Oil", "100.00", 2), ("Tires", "100.00", 4),
+    }
+    assert [(r["worker_id"], r["worker_username"], r["amount"]) for r in report("worker")["rows"]] == [
+        (owner_id, "owner", "140.00"), (mechanic_id, "mechanic", "60.00"),
+    ]
+
+    # Зміна суми/майстра, видалення позиції та інвойсу - зведення йде слідом
+    client.patch(f"/invoices/{plain['id']}", json={"worker_id": owner_id, "total_amount": 75}, headers=headers)
+    assert [(r["worker_id"], r["amount"], r["count"]) for r in report("worker")["rows"]] == [(owner_id, "215.00", 2)]
+    client.delete(f"/invoice-items/{item['id']}")
+    assert {(r["service_name"], r["amount"]) for r in report("service")["rows"]} == {("Oil", "40.00"), ("Tires", "100.00")}
+    client.delete(f"/invoices/{invoice['id']}", headers=headers)
+    assert report("day")["rows"] == [{"day": today, "amount": "75.00", "count": 1}]
+    assert report("service")["rows"] == []
+
+    assert client.get("/reports/revenue", params={"group_by": "month"}, headers=headers).status_code == 422
+
+def test_schedule_availability_per_mechanic_and_any(client: TestClient):
+    """Test free slots come from records + service durations, per mechanic and for any mechanic."""
+    mechanics = [
+        client.post("/users/", json={
+            "username": name, "email": f"{name}@example.com", "password": "password123", "role": "master"
+        }, headers={"Idempotency-Key": str(uuid.uuid4())}).json()["id"]
+        for name in ("petro", "ivan")
+    ]
+    token = client.post("/auth/login", json={"username": "petro", "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    customer = client.post("/customers/", json={
+        "first_name": "Ivan", "last_name": "Franko", "phone": "+380501234002", "email": "franko@example.com",
+    }).json()
+    car = client.post("/cars/", json={"customer_id": customer["id"], "brand": "Lada", "model": "Niva", "year": 2010}).json()
+    long_job = client.post("/services/", json={"name": "Engine", "price": 500, "duration": 180}).json()
+    short_job = client.post("/services/", json={"name": "Check", "price": 20, "duration": 30}).json()
+    # Петро: 09:00-12:00 і 12:30-13:00, Іван: 08:00-09:00 (до періоду) і 10:00-10:30
+    for mechanic, service, at in [
+        (mechanics[0], long_job, "2024-06-03T09:00:00"), (mechanics[0], short_job, "2024-06-03T12:30:00"),
+        (mechanics[1], long_job, "2024-06-02T23:00:00"), (mechanics[1], short_job, "2024-06-03T10:00:00"),
+    ]:
+        client.post("/service-records/", json={
+            "car_id": car["id"], "service_id": service["id"], "performed_by": mechanic, "date": at,
+        })
+
+    def availability(**params):
+        response = client.get("/schedule/availability", params={
+            "from": "2024-06-03T08:00:00", "to": "2024-06-03T14:00:00", **params,
+        }, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    result = availability(duration=60)
+    assert [(m["username"], [(s["start"][11:16], s["end"][11:16]) for s in m["free"]]) for m in result["mechanics"]] == [
+        ("petro", [("08:00", "09:00"), ("13:00", "14:00")]),
+        ("ivan", [("08:00", "10:00"), ("10:30", "14:00")]),
+    ]
+    assert [(s["start"][11:16], s["end"][11:16]) for s in result["any"]] == [("08:00", "10:00"), ("10:30", "14:00")]
+
+    only_petro = availability(duration=30, mechanic_id=mechanics[0])
+    assert [(s["start"][11:16], s["end"][11:16]) for s in only_petro["any"]] == [
+        ("08:00", "09:00"), ("12:00", "12:30"), ("13:00", "14:00"),
+    ]
+    assert client.get("/schedule/availability", params={
+        "from": "2024-06-03T08:00:00", "to": "2024-08-03T08:00:00",
+    }, headers=headers).status_code == 422
+
+
+def test_ready_after_pool_and_cache_warm_up():
+    """/ready - 503 до прогріву пулу й каталогу послуг у lifespan, 200 після; /health - завжди."""
+    from db_pool import POOL_MIN_SIZE
+    from main import create_app
+    from services_catalog import services_catalog
+    from settings import Settings
+
+    fresh = create_app(Settings(database_url=os.getenv("DATABASE_URL"), telemetry_mode="off"))
+    # Без lifespan нічого не підключено
+    assert TestClient(fresh).get("/ready").status_code == 503
+    assert TestClient(fresh).get("/health").status_code == 200
+
+    with TestClient(fresh) as client:
+        deadline = time.monotonic() + 10
+        while client.get("/ready").status_code != 200:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        assert client.get("/ready").json() == {"status": "ready"}
+        assert services_catalog._snapshot is not None
+        assert db.database.pool.size >= POOL_MIN_SIZE
+    assert fresh.state.ready is False
+
+
+def test_debug_queries_groups_by_fingerprint_and_logs_slow_queries(client: TestClient, monkeypatch):
+    """Test /debug/queries: one fingerprint per query text, slow log with param types and EXPLAIN."""
+    from query_stats import fingerprint, query_stats
+
+    assert fingerprint("SELECT * FROM cars WHERE id = :id AND brand = 'BMW' LIMIT 10").statement == (
+        "SELECT * FROM cars WHERE id = ? AND brand = ? LIMIT ?"
+    )
+    assert fingerprint("SELECT id::text FROM users WHERE id IN (1, 2,\n 3)").statement == (
+        "SELECT id::text FROM users WHERE id IN (?)"
+    )
+
+    for username, role in (("root", "admin"), ("mechanic", "master")):
+        client.post("/users/", json={
+            "username": username, "email": f"{username}@example.com", "password": "password123", "role": role,
+        }, headers={"Idempotency-Key": str(uuid.uuid4())})
+    tokens = {
+        username: client.post("/auth/login", json={"username": username, "password": "password123"}).json()["access_token"]
+        for username in ("root", "mechanic")
+    }
+    headers = {"Authorization": f"Bearer {tokens['root']}"}
+    assert client.get("/debug/queries", headers={"Authorization": f"Bearer {tokens['mechanic']}"}).status_code == 403
+
+    assert client.delete("/debug/queries", headers=headers).status_code == 204
+    monkeypatch.setattr(query_stats, "slow_ms", 0)
+    monkeypatch.setattr(query_stats, "explain", True)
+    for car_id in (101, 102, 103):
+        assert client.get(f"/cars/{car_id}").status_code == 404
+
+    deadline = time.monotonic() + 5
+    while True:
+        report = client.get("/debug/queries", headers=headers).json()
+        cars = [row for row in report["slow"] if row["statement"].startswith("SELECT") and " cars " in row["statement"]]
+        if cars and cars[-1]["plan"] is not None:
+            break
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+    by_statement = {row["statement"]: row for row in report["fingerprints"]}
+    car_query = by_statement[cars[0]["statement"]]
+    assert car_query["calls"] == 3 and car_query["errors"] == 0
+    assert car_query["mean_ms"] <= car_query["max_ms"] <= car_query["total_ms"]
+    assert len(cars) == 3 and {row["fingerprint"] for row in cars} == {car_query["fingerprint"]}
+    assert cars[0]["params"] == {"id": "int"} and cars[0]["database"] == "primary"
+    # EXPLAIN - лише для першого повільного запиту з відбитком
+    assert "Index Scan" in cars[-1]["plan"] and cars[0]["plan"] is None
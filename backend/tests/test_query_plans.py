@@ -0,0 +1,249 @@
+import importlib
+import inspect
+import json
+import pkgutil
+from datetime import datetime, timedelta
+
+import pytest
+from databases import Database
+
+import crud
+from auth.jwt import create_access_token
+from schemas.cars import CarCreate, CarUpdate
+from schemas.customers import CustomerCreate, CustomerUpdate
+from schemas.invoice_items import InvoiceItemCreate, InvoiceItemUpdate
+from schemas.invoices import InvoiceCreate, InvoiceLine, InvoiceUpdate, InvoiceWithItemsCreate
+from schemas.service_records import ServiceRecordCreate, ServiceRecordUpdate
+from schemas.services import ServiceCreate, ServiceUpdate
+from schemas.users import UserCreate, UserUpdate
+
+pytestmark = pytest.mark.asyncio
+
+# Перевірка планів: кожен запит з crud/* виконується на засіяній базі, а перед
+# ним - EXPLAIN. Seq Scan по великій таблиці (>= LARGE_TABLE_ROWS) = провал:
+# значить, під фільтр запиту немає індексу.
+
+LARGE_TABLE_ROWS = 10_000
+
+# Останні 2 послуги та користувачі ні на що не посилаються - їх можна видалити
+SEED_SQL = [
+    """INSERT INTO users (username, email, password_hash)
+       SELECT 'user' || g, 'user' || g || '@example.com', 'x' FROM generate_series(1, 22) g""",
+    """INSERT INTO services (name, price, duration)
+       SELECT 'Service ' || g, 10 + g, 30 FROM generate_series(1, 52) g""",
+    """INSERT INTO customers (first_name, last_name, phone, email, created_by)
+       SELECT 'Name' || g, 'Last' || md5(g::text), '+380' || lpad(g::text, 9, '0'),
+              'c' || g || '@example.com', 1 + g % 20
+       FROM generate_series(1, 20000) g""",
+    """INSERT INTO cars (customer_id, brand, model, year, vin)
+       SELECT g, 'Brand' || g % 40, 'Model' || g % 300, 2000 + g % 24, upper(substr(md5(g::text), 1, 17))
+       FROM generate_series(1, 20000) g""",
+    """INSERT INTO invoices (customer_id, car_id, worker_id, service_id, created_by, total_amount, issue_date)
+       SELECT g, g, 1 + g % 20, 1 + g % 50, 1, 100, now() - g * interval '1 hour'
+       FROM generate_series(1, 20000) g""",
+    """INSERT INTO invoice_items (invoice_id, service_id, quantity, unit_price)
+       SELECT 1 + g % 20000, 1 + g % 50, 1, 10 FROM generate_series(1, 40000) g""",
+    """INSERT INTO service_records (car_id, service_id, performed_by, date, mileage, invoice_id, duration)
+       SELECT 1 + g % 20000, 1 + g % 50, 1 + g % 20, now() - g * interval '1 hour', g, 1 + g % 20000, 30 + g % 60
+       FROM generate_series(1, 40000) g""",
+    "ANALYZE",
+]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+class ExplainingDatabase:
+    """
+    Обгортка над Database: перед кожним запитом робить EXPLAIN і запам'ятовує
+    Seq Scan-и по великих таблицях.
+    """
+
+    def __init__(self, database: Database, large_tables):
+        self.database = database
+        self.large_tables = large_tables
+        self.current = None
+        self.seq_scans = []
+
+    async def _explain(self, query, values):
+        rows = await self.database.fetch_all(f"EXPLAIN (FORMAT JSON) {query}", values)
+        plan = json.loads(rows[0]["QUERY PLAN"])[0]["Plan"]
+        for node in plan_nodes(plan):
+            if node["Node Type"] == "Seq Scan" and node["Relation Name"] in self.large_tables:
+                self.seq_scans.append((self.current, node["Relation Name"], " ".join(query.split())))
+
+    async def fetch_one(self, query, values=None):
+        await self._explain(query, values)
+        return await self.database.fetch_one(query, values)
+
+    async def fetch_all(self, query, values=None):
+        await self._explain(query, values)
+        return await self.database.fetch_all(query, values)
+
+    async def fetch_val(self, query, values=None):
+        await self._explain(query, values)
+        return await self.database.fetch_val(query, values)
+
+    async def execute(self, query, values=None):
+        await self._explain(query, values)
+        return await self.database.execute(query, values)
+
+    async def iterate(self, query, values=None):
+        await self._explain(query, values)
+        async for row in self.database.iterate(query, values):
+            yield row
+
+
+def crud_functions():
+    """
+    Усі публічні асинхронні функції, оголошені в модулях crud.
+    """
+    found = {}
+    for info in pkgutil.iter_modules(crud.__path__):
+        module = importlib.import_module(f"crud.{info.name}")
+        for name, fn in inspect.getmembers(module, inspect.isfunction):
+            if name.startswith("_") or fn.__module__ != module.__name__:
+                continue
+            if inspect.iscoroutinefunction(fn) or inspect.isasyncgenfunction(fn):
+                found[f"{info.name}.{name}"] = fn
+    return found
+
+
+async def drain(iterator):
+    return [row async for row in iterator]
+
+
+def scenarios():
+    """
+    Типові виклики кожної функції crud (з фільтрами, які реально надсилає UI).
+    """
+    now = datetime.now()
+    customer = CustomerCreate(first_name="Plan", last_name="Check", phone="+380501112233", email="plan@example.com")
+    car = CarCreate(customer_id=5, brand="VW", model="Golf", year=2015, vin="PLANCHECKVIN00001")
+    invoice = InvoiceCreate(customer_id=5, car_id=5, worker_id=2, service_id=3, total_amount=50)
+    record = ServiceRecordCreate(car_id=5, service_id=3, performed_by=2, date=now, mileage=1000)
+    service = ServiceCreate(name="Check", price=10, duration=15)
+    item = InvoiceItemCreate(invoice_id=5, service_id=3, quantity=2, unit_price=10, total=20)
+    lines = [InvoiceLine(service_id=3, quantity=2), InvoiceLine(service_id=4, unit_price=15)]
+    command = InvoiceWithItemsCreate(customer_id=5, car_id=5, worker_id=2, items=lines)
+    return {
+        "cars.get_car_by_id": lambda fn, db: fn(db, 7),
+        "cars.get_car_row": lambda fn, db: fn(db, 7),
+        "cars.get_car_rows": lambda fn, db: fn(db, customer_id=7),
+        "cars.get_all_cars": lambda fn, db: fn(db, customer_id=7, after_id=3),
+        "cars.create_car": lambda fn, db: fn(db, car),
+        "cars.update_car": lambda fn, db: fn(db, 8, CarUpdate(**car.model_dump(exclude={"vin"}))),
+        "cars.delete_car": lambda fn, db: fn(db, 9),
+        "cars.get_car_by_vin": lambda fn, db: fn(db, "ABC"),
+        "cars.bulk_upsert_cars": lambda fn, db: fn(db, [(0, car)]),
+        "customer_overview.load_customer_overviews": lambda fn, db: fn(db, [10, 11]),
+        "customers.get_all_customers": lambda fn, db: fn(db, after_id=100),
+        "customers.get_customer_by_id": lambda fn, db: fn(db, 12),
+        "customers.get_customer_row": lambda fn, db: fn(db, 12),
+        "customers.get_customer_rows": lambda fn, db: fn(db, after_id=200),
+        "customers.create_customer": lambda fn, db: fn(db, customer),
+        "customers.update_customer_in_db": lambda fn, db: fn(db, 13, CustomerUpdate(**customer.model_dump())),
+        "customers.delete_customer_in_db": lambda fn, db: fn(db, 14),
+        "customers.bulk_create_customers": lambda fn, db: fn(db, [(0, customer)]),
+        "invoice_commands.create_invoice_with_items": lambda fn, db: fn(db, command, created_by=1),
+        "invoice_commands.add_invoice_items": lambda fn, db: fn(db, 26, lines),
+        "invoice_commands.invoice_service_record": lambda fn, db: fn(db, 27),
+        "invoice_aggregates.load_invoice": lambda fn, db: fn(db, 28),
+        "invoice_aggregates.load_invoices": lambda fn, db: fn(db, list(range(100, 600))),
+        "invoice_items.create_invoice_item": lambda fn, db: fn(db, item),
+        "invoice_items.get_invoice_item_by_id": lambda fn, db: fn(db, 15),
+        "invoice_items.get_items_by_invoice": lambda fn, db: fn(db, 16),
+        "invoice_items.get_invoice_item_row": lambda fn, db: fn(db, 15),
+        "invoice_items.get_item_rows_by_invoice": lambda fn, db: fn(db, 16),
+        "invoice_items.update_invoice_item": lambda fn, db: fn(db, 17, InvoiceItemUpdate(quantity=3, unit_price=5, total=15)),
+        "invoice_items.delete_invoice_item": lambda fn, db: fn(db, 18),
+        "invoices.create_invoice": lambda fn, db: fn(db, invoice),
+        "invoices.get_invoice_by_id": lambda fn, db: fn(db, 19),
+        "invoices.get_all_invoices": lambda fn, db: fn(db, worker_id=3, after_id=100),
+        "invoices.get_invoice_row": lambda fn, db: fn(db, 19),
+        "invoices.get_invoice_rows": lambda fn, db: fn(db, after_id=100),
+        "invoices.iter_invoices": lambda fn, db: drain(fn(db, date_from=now - timedelta(days=2), date_to=now)),
+        "invoices.update_invoice": lambda fn, db: fn(db, 20, InvoiceUpdate(work_status="done"), if_updated_at=[now]),
+        "invoices.delete_invoice": lambda fn, db: fn(db, 21),
+        "revenue.get_revenue": lambda fn, db: fn(db, "service", date_from=now.date() - timedelta(days=30), date_to=now.date()),
+        "revenue.rebuild_revenue_rollup": lambda fn, db: fn(db, date_from=now.date() - timedelta(days=1), date_to=now.date()),
+        "schedule.get_mechanics": lambda fn, db: fn(db),
+        "schedule.get_busy_intervals": lambda fn, db: fn(db, now - timedelta(days=7), now, list(range(1, 21))),
+        "search.search_customers": lambda fn, db: fn(db, "last5a"),
+        "search.search_cars": lambda fn, db: fn(db, "4F2A1C"),
+        "service_records.get_all_service_records": lambda fn, db: fn(db, before_date=now, before_id=100),
+        "service_records.get_car_history": lambda fn, db: fn(db, 22),
+        "service_records.iter_service_records": lambda fn, db: drain(fn(db, performed_by=4, date_from=now - timedelta(days=1))),
+        "service_records.get_service_record_by_id": lambda fn, db: fn(db, 23),
+        "service_records.get_service_record_row": lambda fn, db: fn(db, 23),
+        "service_records.get_service_record_rows": lambda fn, db: fn(db),
+        "service_records.create_service_record": lambda fn, db: fn(db, record),
+        "service_records.update_service_record": lambda fn, db: fn(db, 24, ServiceRecordUpdate(**record.model_dump())),
+        "service_records.delete_service_record": lambda fn, db: fn(db, 25),
+        "services.load_services_catalog": lambda fn, db: fn(db),
+        "services.get_services_version": lambda fn, db: fn(db),
+        "services.get_all_services": lambda fn, db: fn(db),
+        "services.get_service_by_id": lambda fn, db: fn(db, 4),
+        "services.create_service": lambda fn, db: fn(db, service),
+        "services.update_service": lambda fn, db: fn(db, 5, ServiceUpdate(**service.model_dump())),
+        "services.delete_service": lambda fn, db: fn(db, 51),
+        "services.delete_service_from_db": lambda fn, db: fn(db, 52),
+        "services.bulk_create_services": lambda fn, db: fn(db, [(0, service)]),
+        "users.create_user": lambda fn, db: fn(db, UserCreate(username="plan", email="plan@example.com", role="master", password="secret1")),
+        "users.get_user_by_username": lambda fn, db: fn(db, "user3"),
+        "users.get_principal": lambda fn, db: fn(db, "user4"),
+        "users.get_user_by_id": lambda fn, db: fn(db, 5),
+        "users.get_all_users": lambda fn, db: fn(db),
+        "users.get_user_rows": lambda fn, db: fn(db, after_id=3),
+        "users.get_current_user": lambda fn, db: fn(token=create_access_token({"sub": "user6"}), db=db),
+        "users.update_user_in_db": lambda fn, db: fn(db, 7, UserUpdate(role="manager")),
+        "users.delete_user_from_db": lambda fn, db: fn(db, 21),
+    }
+
+
+async def test_every_crud_query_uses_indexes_on_large_tables(db_connection: Database):
+    """
+    Жоден запит crud/* не сканує велику таблицю повністю.
+    """
+    for statement in SEED_SQL:
+        await db_connection.execute(statement)
+    large_tables = {
+        row["relname"] for row in await db_connection.fetch_all(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples >= :rows", {"rows": LARGE_TABLE_ROWS}
+        )
+    }
+    assert {"customers", "cars", "invoices", "invoice_items", "service_records"} <= large_tables
+
+    functions = crud_functions()
+    calls = scenarios()
+    assert set(functions) == set(calls), "нова функція crud без сценарію в scenarios()"
+
+    explaining = ExplainingDatabase(db_connection, large_tables)
+    for name, call in calls.items():
+        explaining.current = name
+        await call(functions[name], explaining)
+    assert explaining.seq_scans == []
+
+
+async def test_foreign_keys_are_indexed(db_connection: Database):
+    """
+    Кожен зовнішній ключ - перша колонка якогось індексу, інакше каскадне
+    видалення (і перевірка FK при видаленні батька) сканує всю дочірню таблицю.
+    """
+    rows = await db_connection.fetch_all(
+        """
+        SELECT c.conrelid::regclass::text AS table_name, a.attname AS column_name
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+        WHERE c.contype = 'f'
+          AND c.connamespace = 'public'::regnamespace
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_index i
+              WHERE i.indrelid = c.conrelid AND i.indkey[0] = c.conkey[1]
+          )
+        """
+    )
+    assert [(row["table_name"], row["column_name"]) for row in rows] == []
@@ -1,10 +1,39 @@
+import asyncio
 import pytest
 from fastapi import HTTPException
 from databases import Database
 
 # Імпортуємо те, що будемо тестувати
-from crud.users import create_user
-from schemas.users import UserCreate
+from crud.users import create_user, get_principal, update_user_in_db, delete_user_from_db
+from schemas.users import UserCreate, UserUpdate
+from auth.principal_cache import principal_cache
+from idempotency import IdempotencyStore, MemoryIdempotencyStore, PostgresIdempotencyStore, StoredResponse
+from rate_limit import RateLimit, TokenBucketLimiter
+from crud.customer_overview import load_customer_overviews
+from auth.passwords import password_hasher
+from services_catalog import ServicesCatalog
+from crud.services import create_service, update_service, delete_service_from_db
+from schemas.services import ServiceCreate, ServiceUpdate
+from migrate import Migration, MigrationError, load_migrations, migrate, migration_status
+from typing import List
+from pydantic import TypeAdapter
+from serialization import RowSerializer
+from db_pool import PooledDatabase, PoolTimeout, pool_options
+from crud.invoice_commands import create_invoice_with_items
+from crud.invoice_aggregates import load_invoice, load_invoices
+from domain.models import InvoiceStatus
+from schemas.invoices import InvoiceLine, InvoiceWithItemsCreate
+from crud.invoices import create_invoice, update_invoice
+from schemas.invoices import InvoiceCreate, InvoiceUpdate
+from backfill_revenue import backfill
+from datetime import date, datetime
+from decimal import Decimal
+from schemas.customers import CustomerInDB
+from schemas.invoices import InvoiceInDB
+from schemas.invoice_items import InvoiceItemInDB
+from schemas.users import UserInDB
+from crud.service_records import create_service_record, update_service_record
+from schemas.service_records import ServiceRecordCreate, ServiceRecordUpdate
 
 # Позначаємо всі тести в цьому файлі як асинхронні
 pytestmark = pytest.mark.asyncio
@@ -61,3 +90,606 @@ async def test_service_create_user_duplicate_username(db_connection: Database):
     # 4. Перевірка деталей виключення
     assert exc_info.value.status_code == 400
     assert "Username already registered" in exc_info.value.detail
+
+
+async def test_password_hasher_runs_off_event_loop():
+    """
+    Юніт-тест: хешування і перевірка пароля через пул потоків.
+    """
+    hashed = await password_hasher.hash("password123")
+
+    assert hashed != "password123"
+    assert await password_hasher.verify("password123", hashed)
+    assert not await password_hasher.verify("wrong", hashed)
+
+
+async def test_principal_cache_invalidated_on_update_and_delete(db_connection: Database):
+    """
+    Юніт-тест: кеш принципалів скидається при зміні та видаленні користувача.
+    """
+    created_user = await create_user(db_connection, UserCreate(
+        username="cached_user",
+        email="cached@example.com",
+        password="password123",
+        role="master"
+    ))
+
+    principal = await get_principal(db_connection, "cached_user")
+    assert principal["is_active"] is True
+    assert principal_cache.get("cached_user") is not None
+
+    await update_user_in_db(db_connection, created_user.id, UserUpdate(is_active=False))
+    assert principal_cache.get("cached_user") is None
+    principal = await get_principal(db_connection, "cached_user")
+    assert principal["is_active"] is False
+
+    await delete_user_from_db(db_connection, created_user.id)
+    assert await get_principal(db_connection, "cached_user") is None
+
+
+@pytest.mark.parametrize("backend", ["memory", "postgres"])
+async def test_idempotency_store_coalesces_concurrent_requests(db_connection: Database, backend):
+    """
+    Юніт-тест: паралельні запити з тим самим ключем чекають на перший.
+    """
+    if backend == "postgres":
+        store = PostgresIdempotencyStore(db_connection)
+    else:
+        store = MemoryIdempotencyStore(max_keys=10)
+
+    assert await store.claim("key-1", "fp") is None
+    waiter = asyncio.create_task(store.claim("key-1", "fp"))
+    await asyncio.sleep(0.1)
+    assert not waiter.done()
+
+    await store.complete("key-1", StoredResponse(201, {"id": 1}))
+    replay = await asyncio.wait_for(waiter, 5)
+    assert replay.status_code == 201
+    assert replay.body == {"id": 1}
+
+    # Якщо перший запит упав, ключ звільняється для повтору
+    assert await store.claim("key-2", "fp") is None
+    await store.release("key-2")
+    assert await store.claim("key-2", "fp") is None
+
+
+async def test_memory_idempotency_store_is_bounded():
+    """
+    Юніт-тест: in-memory сховище витісняє найстаріші завершені ключі.
+    """
+    store = MemoryIdempotencyStore(max_keys=3)
+    for i in range(10):
+        assert await store.claim(f"key-{i}", "fp") is None
+        await store.complete(f"key-{i}", StoredResponse(200, {}))
+
+    assert len(store._entries) <= 3
+    assert await store.claim("key-0", "fp") is None
+
+    # Сховище без _try_claim / _save / _delete_pending не створюється взагалі
+    with pytest.raises(TypeError):
+        IdempotencyStore()
+
+
+async def test_token_bucket_refills_and_evicts_idle_buckets(monkeypatch):
+    """
+    Юніт-тест: відро наповнюється з часом, а неактивні відра забуваються.
+    """
+    now = [1000.0]
+    monkeypatch.setattr("rate_limit.time.monotonic", lambda: now[0])
+    limiter = TokenBucketLimiter(default=RateLimit(max_requests=2, window_ms=1000), max_buckets=100)
+
+    assert limiter.hit("ip:a", "GET", "/cars/") == 0
+    assert limiter.hit("ip:a", "GET", "/cars/") == 0
+    assert limiter.hit("ip:a", "GET", "/cars/") == pytest.approx(0.5)
+
+    now[0] += 0.5
+    assert limiter.hit("ip:a", "GET", "/cars/") == 0
+
+    now[0] += 5
+    limiter.hit("ip:b", "GET", "/cars/")
+    assert list(limiter._buckets) == [("ip:b", None)]
+
+
+class QueryCountingDatabase:
+    def __init__(self, database: Database):
+        self.database = database
+        self.queries = 0
+
+    async def fetch_all(self, query, values=None):
+        self.queries += 1
+        return await self.database.fetch_all(query, values)
+
+
+async def test_customer_overview_query_count_is_constant(db_connection: Database):
+    """
+    Юніт-тест: "customer 360" робить однакову кількість запитів для 1 і 5 авто.
+    """
+    await db_connection.execute("INSERT INTO users (username, email, password_hash) VALUES ('m', 'm@x.com', 'x')")
+    await db_connection.execute("INSERT INTO services (name, price, duration) VALUES ('Oil', 40, 30)")
+
+    async def seed_customer(cars: int) -> int:
+        customer_id = await db_connection.fetch_val(
+            "INSERT INTO customers (first_name, last_name, phone, email) "
+            "VALUES ('A', 'B', '+380500000000', 'a@example.com') RETURNING id"
+        )
+        for n in range(cars):
+            car_id = await db_connection.fetch_val(
+                "INSERT INTO cars (customer_id, brand, model, year) VALUES (:c, 'VW', 'Golf', 2010) RETURNING id", {"c": customer_id}
+            )
+            invoice_id = await db_connection.fetch_val(
+                "INSERT INTO invoices (customer_id, car_id, worker_id, service_id, total_amount) "
+                "VALUES (:c, :car, 1, 1, 80) RETURNING id", {"c": customer_id, "car": car_id}
+            )
+            await db_connection.execute(
+                "INSERT INTO invoice_items (invoice_id, service_id, quantity, unit_price) VALUES (:i, 1, 2, 40)",
+                {"i": invoice_id}
+            )
+            await db_connection.execute(
+                "INSERT INTO service_records (car_id, service_id, performed_by, date, invoice_id) "
+                "VALUES (:car, 1, 1, now() - make_interval(days => :n), :i)", {"car": car_id, "n": n, "i": invoice_id}
+            )
+        return customer_id
+
+    small = await seed_customer(1)
+    large = await seed_customer(5)
+
+    counting = QueryCountingDatabase(db_connection)
+    overviews = await load_customer_overviews(counting, [small])
+    queries_for_small = counting.queries
+
+    counting = QueryCountingDatabase(db_connection)
+    overviews = await load_customer_overviews(counting, [small, large])
+    assert counting.queries == queries_for_small
+
+    overview = overviews[large]
+    assert len(overview.cars) == 5
+    assert len(overview.invoices) == 5
+    assert overview.invoices[0].items[0].total == 80
+    assert len(overview.recent_service_records) == 5
+    assert overview.recent_service_records[0].date >= overview.recent_service_records[-1].date
+
+
+SCHEMA_QUERY = """
+    SELECT 'column' AS kind, table_name || '.' || column_name || ' ' || data_type AS definition
+    FROM information_schema.columns WHERE table_schema = :schema AND table_name <> 'schema_migrations'
+    UNION ALL
+    SELECT 'index', replace(indexdef, :schema || '.', '')
+    FROM pg_indexes WHERE schemaname = :schema AND tablename <> 'schema_migrations'
+"""
+
+
+async def test_migrations_build_same_schema_as_init_db(db_connection: Database):
+    """
+    Юніт-тест: міграції з нуля дають ту саму схему, що й init_db.sql.
+    """
+    async with db_connection.connection():
+        await db_connection.execute("DROP SCHEMA IF EXISTS migration_check CASCADE")
+        await db_connection.execute("CREATE SCHEMA migration_check")
+        await db_connection.execute("SET search_path TO migration_check")
+        try:
+            applied = await migrate(db_connection)
+            assert [m.version for m in applied] == [m.version for m in load_migrations()]
+            assert await migrate(db_connection) == []
+            assert all(done for _, done in await migration_status(db_connection))
+        finally:
+            await db_connection.execute("RESET search_path")
+
+        migrated = await db_connection.fetch_all(SCHEMA_QUERY, {"schema": "migration_check"})
+        expected = await db_connection.fetch_all(SCHEMA_QUERY, {"schema": "public"})
+        await db_connection.execute("DROP SCHEMA migration_check CASCADE")
+    assert sorted(map(tuple, migrated)) == sorted(map(tuple, expected))
+
+
+async def test_migrations_upgrade_legacy_database(db_connection: Database):
+    """
+    Юніт-тест: база з init_db.sql без schema_migrations приймається як базова
+    схема, решта міграцій доганяє її; змінена застосована міграція - помилка.
+    """
+    migrations = load_migrations()
+    applied = await migrate(db_connection, migrations)
+    assert [m.version for m in applied] == [m.version for m in migrations[1:]]
+    versions = await db_connection.fetch_all("SELECT version FROM schema_migrations ORDER BY version")
+    assert [row["version"] for row in versions] == [m.version for m in migrations]
+
+    changed = Migration(migrations[-1].version, migrations[-1].name, migrations[-1].sql + "\n-- edited")
+    with pytest.raises(MigrationError):
+        await migrate(db_connection, migrations[:-1] + [changed])
+
+
+
+
+async def test_migration_rebuilds_invalid_concurrent_index(db_connection: Database):
+    """
+    Юніт-тест: збій CREATE INDEX CONCURRENTLY лишає INVALID індекс - міграція
+    не записується, а повторний запуск перебудовує індекс.
+    """
+    migrations = load_migrations()
+    await migrate(db_connection, migrations)
+    unique_emails = Migration(9999, "unique_customer_emails", (
+        "-- migrate: no-transaction\n"
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_email_unique ON customers(email);\n"
+    ))
+    await db_connection.execute(
+        "INSERT INTO customers (first_name, last_name, email) VALUES ('A', 'Same', 'same@example.com'), ('B', 'Same', 'same@example.com')"
+    )
+    with pytest.raises(Exception):
+        await migrate(db_connection, migrations + [unique_emails])
+    invalid = "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass('idx_customers_email_unique')"
+    assert await db_connection.fetch_val(invalid) is True
+    assert not await db_connection.fetch_val("SELECT count(*) FROM schema_migrations WHERE version = 9999")
+
+    await db_connection.execute("UPDATE customers SET email = 'other@example.com' WHERE first_name = 'B'")
+    assert [m.version for m in await migrate(db_connection, migrations + [unique_emails])] == [9999]
+    assert await db_connection.fetch_val(invalid) is False
+
+async def test_migration_reports_duplicate_vins(db_connection: Database):
+    """
+    Юніт-тест: стара база з повторними VIN - 0002 зупиняється зі списком
+    дублікатів і нічого з неї не застосовується.
+    """
+    await db_connection.execute("DROP INDEX idx_cars_vin")
+    await db_connection.execute("CREATE INDEX idx_cars_vin ON cars(vin)")
+    customer_id = await db_connection.execute(
+        "INSERT INTO customers (first_name, last_name) VALUES ('Dup', 'Vin') RETURNING id"
+    )
+    for _ in range(2):
+        await db_connection.execute(
+            "INSERT INTO cars (customer_id, brand, model, year, vin) VALUES (:id, 'Ford', 'Focus', 2015, 'DUPVIN1')",
+            {"id": customer_id},
+        )
+    await db_connection.execute("DROP TABLE idempotency_keys")
+
+    with pytest.raises(Exception, match="duplicate VINs: DUPVIN1"):
+        await migrate(db_connection)
+    assert await db_connection.fetch_val("SELECT to_regclass('idempotency_keys') IS NULL")
+
+async def test_services_catalog_sees_writes_from_other_workers(db_connection: Database):
+    """
+    Юніт-тест: два каталоги (два воркери) - запис через один видно в іншому,
+    а без записів каталог не перечитується.
+    """
+    worker_a, worker_b = ServicesCatalog(), ServicesCatalog()
+    service = await create_service(db_connection, ServiceCreate(name="Oil", price=40, duration=30))
+    first = await worker_b.current(db_connection)
+    assert [s.name for s in first.services] == ["Oil"]
+    assert await worker_b.current(db_connection) is first
+
+    await worker_a.current(db_connection)
+    await update_service(db_connection, service.id, ServiceUpdate(name="Oil 5W-30", price=45, duration=30))
+    second = await worker_b.current(db_connection)
+    assert second.version > first.version
+    assert second.get(service.id).name == "Oil 5W-30"
+    assert (await worker_a.get(db_connection, service.id)).price == 45
+
+
+async def test_fast_json_matches_pydantic_output(db_connection: Database):
+    """
+    Швидка серіалізація рядків дає ті самі байти, що й моделі Pydantic:
+    float з NUMERIC, Decimal рядком, datetime з мікросекундами, без зайвих колонок.
+    """
+    await db_connection.execute(
+        "INSERT INTO users (username, email, password_hash) VALUES ('fast', 'fast@example.com', 'x')"
+    )
+    await db_connection.execute(
+        """INSERT INTO customers (first_name, last_name, phone, email)
+           VALUES ('Іван', 'Франко', '+380501112233', 'ivan@example.com')"""
+    )
+    await db_connection.execute("INSERT INTO cars (customer_id, brand, model, year) VALUES (1, 'VW', 'Golf', 2015)")
+    await db_connection.execute("INSERT INTO services (name, price, duration) VALUES ('Oil', 40.5, 30)")
+    await db_connection.execute(
+        """INSERT INTO invoices (customer_id, car_id, worker_id, service_id, total_amount, issue_date)
+           VALUES (1, 1, 1, 1, 81, '2024-03-01 10:00:00.120000')"""
+    )
+    await db_connection.execute(
+        "INSERT INTO invoice_items (invoice_id, service_id, quantity, unit_price) VALUES (1, 1, 2, 40.5)"
+    )
+
+    for model, query in [
+        (InvoiceInDB, "SELECT * FROM invoices"),
+        (InvoiceItemInDB, "SELECT * FROM invoice_items"),
+        (CustomerInDB, "SELECT * FROM customers"),
+        (UserInDB, "SELECT * FROM users"),
+    ]:
+        rows = await db_connection.fetch_all(query)
+        expected = TypeAdapter(List[model]).dump_json([model(**dict(row)) for row in rows])
+        assert RowSerializer(model).encode(rows) == expected
+
+
+async def test_pooled_database_timeout_lifetime_and_settings():
+    """
+    Пул: statement_timeout на кожному з'єднанні, таймаут очікування з'єднання
+    замість вічної черги, перевідкриття з'єднань старших за max_lifetime.
+    """
+    import os
+    options = {**pool_options(), "min_size": 1, "max_size": 1, "server_settings": {"statement_timeout": "1500"}}
+    database = PooledDatabase(os.getenv("DATABASE_URL"), **options)
+    await database.connect()
+    try:
+        assert await database.fetch_val("SHOW statement_timeout") == "1500ms"
+        database.pool.acquire_timeout = 0.2
+
+        async with database.transaction():
+            # Єдине з'єднання зайняте транзакцією цієї задачі - інша задача чекає і здається
+            waiter = asyncio.create_task(database.fetch_val("SELECT 1"))
+            await asyncio.sleep(0.05)
+            assert database.pool.waiting == 1
+            assert database.pool.in_use == 1
+            with pytest.raises(PoolTimeout):
+                await waiter
+        assert database.pool.waiting == 0
+
+        pid = await database.fetch_val("SELECT pg_backend_pid()")
+        assert await database.fetch_val("SELECT pg_backend_pid()") == pid
+        database.pool.max_lifetime = 0
+        await database.fetch_val("SELECT 1")
+        assert await database.fetch_val("SELECT pg_backend_pid()") != pid
+        assert database.pool.in_use == 0
+    finally:
+        await database.disconnect()
+
+
+async def test_concurrent_invoice_commands_link_record_once(db_connection: Database):
+    """
+    Два паралельні інвойси на той самий запис обслуговування: один проходить,
+    другий отримує 409 і не лишає по собі ні інвойсу, ні позицій.
+    """
+    import os
+    await db_connection.execute("INSERT INTO users (username, email, password_hash) VALUES ('m', 'm@example.com', 'x')")
+    await db_connection.execute(
+        "INSERT INTO customers (first_name, last_name, phone, email) VALUES ('A', 'B', '+380500000009', 'a@example.com')"
+    )
+    await db_connection.execute("INSERT INTO cars (customer_id, brand, model, year) VALUES (1, 'VW', 'Polo', 2012)")
+    await db_connection.execute("INSERT INTO services (name, price, duration) VALUES ('Oil', 40, 30)")
+    await db_connection.execute(
+        "INSERT INTO service_records (car_id, service_id, performed_by, date) VALUES (1, 1, 1, now())"
+    )
+    command = InvoiceWithItemsCreate(
+        customer_id=1, car_id=1, worker_id=1, items=[InvoiceLine(service_id=1)], service_record_ids=[1]
+    )
+
+    # Окреме з'єднання на кожну команду, щоб вони справді йшли паралельно
+    other = Database(os.getenv("DATABASE_URL"))
+    await other.connect()
+    try:
+        results = await asyncio.gather(
+            create_invoice_with_items(db_connection, command),
+            create_invoice_with_items(other, command),
+            return_exceptions=True,
+        )
+    finally:
+        await other.disconnect()
+
+    created = [r for r in results if not isinstance(r, Exception)]
+    failed = [r for r in results if isinstance(r, HTTPException)]
+    assert len(created) == 1 and len(failed) == 1
+    assert failed[0].status_code == 409
+    assert await db_connection.fetch_val("SELECT count(*) FROM invoices") == 1
+    assert await db_connection.fetch_val("SELECT count(*) FROM invoice_items") == 1
+    assert await db_connection.fetch_val("SELECT invoice_id FROM service_records WHERE id = 1") == created[0].id
+
+
+async def test_revenue_rollup_matches_backfill(db_connection: Database):
+    """
+    Інкрементальне зведення виручки збігається з повним перерахунком, а
+    перерахунок за період виправляє лише цей період.
+    """
+    await db_connection.execute("INSERT INTO users (username, email, password_hash) VALUES ('w1', 'w1@example.com', 'x'), ('w2', 'w2@example.com', 'x')")
+    await db_connection.execute("INSERT INTO customers (first_name, last_name, phone, email) VALUES ('A', 'B', '+380500000001', 'a@example.com')")
+    await db_connection.execute("INSERT INTO cars (customer_id, brand, model, year) VALUES (1, 'VW', 'Golf', 2015)")
+    oil = await create_service(db_connection, ServiceCreate(name="Oil", price=40, duration=30))
+    filter_ = await create_service(db_connection, ServiceCreate(name="Filter", price=15, duration=10))
+    for worker_id in (1, 2):
+        await create_invoice_with_items(db_connection, InvoiceWithItemsCreate(
+            customer_id=1, car_id=1, worker_id=worker_id,
+            items=[InvoiceLine(service_id=oil.id, quantity=2), InvoiceLine(service_id=filter_.id)],
+        ))
+    invoice = await create_invoice(db_connection, InvoiceCreate(customer_id=1, car_id=1, worker_id=1, service_id=oil.id, total_amount=30))
+    await update_invoice(db_connection, invoice.id, InvoiceUpdate(total_amount=35))
+    await delete_service_from_db(db_connection, filter_.id)
+
+    rollup = "SELECT dimension, day, key, amount, units FROM revenue_rollup WHERE units <> 0 OR amount <> 0 ORDER BY 1, 2, 3"
+    incremental = [dict(row) for row in await db_connection.fetch_all(rollup)]
+    assert {(row["dimension"], row["key"], row["amount"]) for row in incremental} == {
+        ("worker", 1, Decimal("130.00")), ("worker", 2, Decimal("95.00")), ("service", oil.id, Decimal("160.00")),
+    }
+
+    # Ручна правка "в обхід" crud: перерахунок за інший період її не чіпає, за весь - виправляє
+    await db_connection.execute("UPDATE revenue_rollup SET amount = 0")
+    await db_connection.execute("INSERT INTO revenue_rollup VALUES ('worker', '2001-01-01', 1, 5, 1)")
+    today = incremental[0]["day"]
+    await backfill(db_connection, date_from=date(2001, 1, 1), date_to=date(2001, 1, 1))
+    assert all(row["amount"] == 0 for row in await db_connection.fetch_all("SELECT amount FROM revenue_rollup"))
+    assert await backfill(db_connection) == 3
+    assert [dict(row) for row in await db_connection.fetch_all(rollup)] == incremental
+    assert await backfill(db_connection, date_from=today, date_to=today) == 3
+
+
+
+async def test_revenue_rollup_counts_legacy_items_without_service(db_connection: Database):
+    """
+    Юніт-тест: старі позиції без service_id не зупиняють міграцію 0005 і
+    перерахунок - вони йдуть у зведення з ключем 0.
+    """
+    await db_connection.execute("INSERT INTO customers (first_name, last_name) VALUES ('A', 'B')")
+    await db_connection.execute("INSERT INTO cars (customer_id, brand, model, year) VALUES (1, 'VW', 'Golf', 2015)")
+    await db_connection.execute("INSERT INTO invoices (customer_id, car_id, total_amount) VALUES (1, 1, 20)")
+    await db_connection.execute("INSERT INTO invoice_items (invoice_id, service_id, quantity, unit_price) VALUES (1, NULL, 2, 10)")
+
+    await migrate(db_connection)
+    service_rows = "SELECT key, amount, units FROM revenue_rollup WHERE dimension = 'service'"
+    assert [dict(row) for row in await db_connection.fetch_all(service_rows)] == [{"key": 0, "amount": Decimal("20.00"), "units": 2}]
+    assert await backfill(db_connection) == 2
+    assert [dict(row) for row in await db_connection.fetch_all(service_rows)] == [{"key": 0, "amount": Decimal("20.00"), "units": 2}]
+
+
+async def test_service_record_keeps_booked_duration(db_connection: Database):
+    """
+    Юніт-тест: зміна тривалості послуги в каталозі не зсуває вже записану
+    роботу при редагуванні запису; нова послуга - нова тривалість.
+    """
+    await db_connection.execute("INSERT INTO users (username, email, password_hash) VALUES ('w', 'w@example.com', 'x')")
+    await db_connection.execute("INSERT INTO customers (first_name, last_name) VALUES ('A', 'B')")
+    await db_connection.execute("INSERT INTO cars (customer_id, brand, model, year) VALUES (1, 'VW', 'Golf', 2015)")
+    oil = await create_service(db_connection, ServiceCreate(name="Oil", price=40, duration=30))
+    tires = await create_service(db_connection, ServiceCreate(name="Tires", price=25, duration=20))
+    fields = {"car_id": 1, "service_id": oil.id, "performed_by": 1, "date": datetime(2026, 3, 2, 9)}
+    record = await create_service_record(db_connection, ServiceRecordCreate(**fields))
+    booked = "SELECT duration FROM service_records WHERE id = :id"
+
+    await db_connection.execute("UPDATE services SET duration = 90 WHERE id = :id", {"id": oil.id})
+    await update_service_record(db_connection, record.id, ServiceRecordUpdate(**fields, notes="late"))
+    assert await db_connection.fetch_val(booked, {"id": record.id}) == 30
+
+    await update_service_record(db_connection, record.id, ServiceRecordUpdate(**{**fields, "service_id": tires.id}))
+    assert await db_connection.fetch_val(booked, {"id": record.id}) == 20
+
+async def test_invoice_aggregates_load_header_and_lines(db_connection: Database):
+    """
+    Агрегат Invoice з позиціями одним запитом; сума позицій у Decimal збігається з total_amount.
+    """
+    await db_connection.execute("INSERT INTO users (username, email, password_hash) VALUES ('w', 'w@example.com', 'x')")
+    await db_connection.execute("INSERT INTO customers (first_name, last_name, phone, email) VALUES ('A', 'B', '+380500000001', 'a@example.com')")
+    await db_connection.execute("INSERT INTO cars (customer_id, brand, model, year) VALUES (1, 'VW', 'Golf', 2015)")
+    oil = await create_service(db_connection, ServiceCreate(name="Oil", price=40.5, duration=30))
+    filter_ = await create_service(db_connection, ServiceCreate(name="Filter", price=0.1, duration=10))
+    created = [
+        await create_invoice_with_items(db_connection, InvoiceWithItemsCreate(
+            customer_id=1, car_id=1, worker_id=1, payment_status=status,
+            items=[InvoiceLine(service_id=oil.id, quantity=2)] + [InvoiceLine(service_id=filter_.id)] * 3,
+        ))
+        for status in ("paid", "unpaid")
+    ]
+
+    invoice = await load_invoice(db_connection, created[0].id)
+    assert [(line.service_name, line.quantity, line.total) for line in invoice.items] == [
+        ("Oil", 2, Decimal("81.00")), ("Filter", 1, Decimal("0.10")), ("Filter", 1, Decimal("0.10")), ("Filter", 1, Decimal("0.10")),
+    ]
+    assert invoice.calculate_total() == invoice.total_amount == Decimal("81.30")
+    assert invoice.status == InvoiceStatus.PAID
+    assert not hasattr(invoice, "__dict__") and not hasattr(invoice.items[0], "__dict__")
+
+    batch = await load_invoices(db_connection, [created[1].id, 999, created[0].id])
+    assert [(i.id, i.status, len(i.items)) for i in batch] == [
+        (created[0].id, InvoiceStatus.PAID, 4), (created[1].id, InvoiceStatus.ISSUED, 4),
+    ]
+    assert await load_invoice(db_connection, 999) is None
+
+
+async def test_request_logging_samples_and_formats_off_request_path(monkeypatch):
+    """
+    Успішні запити семплуються, помилки й повільні пишуться завжди; атрибути
+    розгортаються у фоновому потоці; повна черга відкидає записи, а не блокує.
+    """
+    import logging
+    import httpx
+    from fastapi import FastAPI
+    import request_logging
+    from request_logging import RequestLoggingMiddleware, install_queue_logging
+
+    class Capture(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.records = []
+
+        def emit(self, record):
+            self.records.append(record)
+
+    app = FastAPI()
+
+    @app.get("/ok")
+    async def ok():
+        return {}
+
+    app.add_middleware(RequestLoggingMiddleware)
+    capture = Capture()
+    root = logging.getLogger()
+    listener = install_queue_logging(capture, root)
+    queue_handler = root.handlers[-1]
+    listener.start()
+    monkeypatch.setattr(request_logging, "LOG_SAMPLE_RATE", 0.0)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://crm") as client:
+            await client.get("/ok?page=2")
+            await client.get("/missing?q=1")
+            monkeypatch.setattr(request_logging, "LOG_SLOW_REQUEST_MS", 0)
+            await client.get("/ok?page=3")
+    finally:
+        listener.stop()
+        root.removeHandler(queue_handler)
+
+    logged = [r for r in capture.records if "http.status_code" in r.__dict__]
+    assert [(r.getMessage().split(" - ")[1], r.levelname) for r in logged] == [
+        ('"GET /missing HTTP/1.1" 404', "WARNING"), ('"GET /ok HTTP/1.1" 200', "INFO"),
+    ]
+    assert logged[0].__dict__["http.url"] == "http://crm/missing?q=1"
+    assert "request_log" not in logged[0].__dict__ and "otel_context" not in logged[0].__dict__
+
+    full = install_queue_logging(capture, logging.getLogger("test.full"), queue_size=1)
+    full_logger = logging.getLogger("test.full")
+    for n in range(3):
+        full_logger.warning("record %s", n)  # потік не запущено - черга переповнюється
+    full_logger.removeHandler(full_logger.handlers[-1])
+    assert full.queue.qsize() == 1
+
+
+async def test_tail_sampling_keeps_errors_and_slow_traces():
+    """
+    Трейс вирішується, коли завершується його корінь: помилки й повільні
+    зберігаються повністю, швидкі успішні - за часткою; режим memory тримає
+    в буферах лише останні спани.
+    """
+    import telemetry
+    from opentelemetry.trace import Status, StatusCode, use_span
+    from telemetry import RingBufferExporter, TailSamplingProcessor, build_telemetry
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExportResult
+
+    exporter = RingBufferExporter(100, SpanExportResult.SUCCESS)
+    provider = TracerProvider()
+    provider.add_span_processor(TailSamplingProcessor(SimpleSpanProcessor(exporter), sample_rate=0.0, slow_ms=50))
+    tracer = provider.get_tracer(__name__)
+
+    with tracer.start_as_current_span("fast"):
+        with tracer.start_as_current_span("db"):
+            pass
+    with tracer.start_as_current_span("failed"):
+        with tracer.start_as_current_span("db") as child:
+            child.set_status(Status(StatusCode.ERROR))
+    with tracer.start_as_current_span("server") as server:
+        server.set_attribute("http.status_code", 503)
+    slow = tracer.start_span("slow", start_time=0)
+    slow.end(end_time=60 * 10**6)
+    assert [span.name for span in exporter.items] == ["db", "failed", "server", "slow"]
+
+    exporter.items.clear()
+    bounded = TailSamplingProcessor(SimpleSpanProcessor(exporter), sample_rate=1.0, max_traces=2)
+    provider = TracerProvider()
+    provider.add_span_processor(bounded)
+    tracer = provider.get_tracer(__name__)
+    roots = [tracer.start_span(f"root {n}") for n in range(3)]
+    for root in roots:
+        with use_span(root):
+            tracer.start_span("child").end()
+    for root in roots:
+        root.end()
+    # Дочірній спан найстарішого трейсу витіснено з переповненого буфера
+    assert [span.name for span in exporter.items] == ["root 0", "child", "root 1", "child", "root 2"]
+
+    assert telemetry.keep_reason([], slow, sample_rate=1.0, slow_ms=10**6) == "sampled"
+    memory = build_telemetry("memory")
+    memory.tracer_provider.get_tracer(__name__).start_span("request").end()
+    memory.tracer_provider.force_flush()
+    assert memory.spans.items.maxlen == telemetry.TELEMETRY_MEMORY_ITEMS
+    metric_names = {
+        metric.name
+        for resource in memory.metric_reader.get_metrics_data().resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+    }
+    assert "telemetry.export.queue_size" in metric_names
+    memory.tracer_provider.shutdown()
+    memory.meter_provider.shutdown()
+    memory.logger_provider.shutdown()
+    assert build_telemetry("off").tracer_provider is None
+    with pytest.raises(ValueError):
+        build_telemetry("stdout")
@@ -1,5 +1,5 @@
 -- DROP all tables if they exist to avoid conflicts
-DROP TABLE IF EXISTS invoice_items, invoices, service_records, services, cars, customers, users CASCADE;
+DROP TABLE IF EXISTS invoice_items, invoices, service_records, services, cars, customers, users, idempotency_keys, catalog_versions, revenue_rollup, schema_migrations CASCADE;
 -- DROP the ENUM type if it exists
 DROP TYPE IF EXISTS payment_status_enum;
 
@@ -96,12 +96,68 @@ CREATE TABLE service_records (
     notes TEXT,
     invoice_id INTEGER REFERENCES invoices(id) ON DELETE SET NULL,
     created_at TIMESTAMP DEFAULT now(),
-    updated_at TIMESTAMP DEFAULT now()
+    updated_at TIMESTAMP DEFAULT now(),
+    duration INT NOT NULL DEFAULT 0 -- хвилини, на які запис займає майстра
+);
+-- Idempotency keys (IDEMPOTENCY_BACKEND=postgres)
+CREATE TABLE idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status_code INT,
+    response JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+-- Версії довідників для кешу в процесі (services_catalog.py). Починаються з
+-- поточного часу в мс, щоб після перестворення бази не збігтися зі старими
+CREATE TABLE catalog_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT (extract(epoch FROM clock_timestamp()) * 1000)::BIGINT
+);
+INSERT INTO catalog_versions (name) VALUES ('services');
+-- Зведення виручки для /reports (crud/revenue.py): оновлюється в тих самих
+-- операторах, що пишуть invoices та invoice_items
+CREATE TABLE revenue_rollup (
+    dimension TEXT NOT NULL,
+    day DATE NOT NULL,
+    key INT NOT NULL,
+    amount NUMERIC(14,2) NOT NULL DEFAULT 0,
+    units INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, day, key)
 );
--- Додаємо індекси
+-- Додаємо індекси (живі бази оновлюються міграціями з backend/migrations, див. migrate.py)
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
-CREATE INDEX IF NOT EXISTS idx_cars_vin ON cars(vin);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_vin ON cars(vin);
 CREATE INDEX IF NOT EXISTS idx_customers_created_at ON customers(created_at);
 CREATE INDEX IF NOT EXISTS idx_cars_created_at ON cars(created_at);
 CREATE INDEX IF NOT EXISTS idx_services_created_at ON services(created_at);
 CREATE INDEX IF NOT EXISTS idx_invoices_created_at ON invoices(created_at);
+CREATE INDEX IF NOT EXISTS idx_service_records_car_id_date ON service_records(car_id, date, id);
+-- Пошук (crud/search.py): префікси та суфікси через reverse(...)
+CREATE INDEX IF NOT EXISTS idx_customers_last_name_prefix ON customers (lower(last_name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_first_name_prefix ON customers (lower(first_name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_email_prefix ON customers (lower(email) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_phone_digits_prefix ON customers (regexp_replace(phone, '\D', '', 'g') text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_phone_digits_suffix ON customers (reverse(regexp_replace(phone, '\D', '', 'g')) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_cars_vin_prefix ON cars (upper(vin) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_cars_vin_suffix ON cars (reverse(upper(vin)) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_cars_brand_prefix ON cars (lower(brand) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_cars_model_prefix ON cars (lower(model) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+-- Фільтри CRUD-запитів і зовнішні ключі (migrations/0003_query_indexes.sql)
+CREATE INDEX IF NOT EXISTS idx_cars_customer_id ON cars(customer_id, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_worker_id ON invoices(worker_id, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_customer_id ON invoices(customer_id, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_issue_date ON invoices(issue_date, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_car_id ON invoices(car_id);
+CREATE INDEX IF NOT EXISTS idx_invoices_service_id ON invoices(service_id);
+CREATE INDEX IF NOT EXISTS idx_invoices_created_by ON invoices(created_by);
+CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice_id ON invoice_items(invoice_id, id);
+CREATE INDEX IF NOT EXISTS idx_invoice_items_service_id ON invoice_items(service_id);
+CREATE INDEX IF NOT EXISTS idx_service_records_date ON service_records(date, id);
+CREATE INDEX IF NOT EXISTS idx_service_records_service_id ON service_records(service_id);
+CREATE INDEX IF NOT EXISTS idx_service_records_invoice_id ON service_records(invoice_id);
+CREATE INDEX IF NOT EXISTS idx_service_records_performed_by ON service_records(performed_by, date, id);
+CREATE INDEX IF NOT EXISTS idx_customers_created_by ON customers(created_by);
+-- Зайнятість майстрів для /schedule/availability (migrations/0006_mechanic_schedule.sql)
+CREATE INDEX IF NOT EXISTS idx_service_records_busy ON service_records USING gist (tsrange(date, date + duration * interval '1 minute'));
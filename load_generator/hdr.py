@@ -0,0 +1,78 @@
+import math
+from typing import Dict, Iterable
+
+# Гістограма затримок у стилі HdrHistogram: лог-лінійні кошики, відносна
+# похибка значення не більша за 10^-significant_digits на всьому діапазоні,
+# а пам'ять не залежить від кількості вимірювань. Значення - цілі мікросекунди.
+#
+# Кошик b покриває [2^(b + k - 1), 2^(b + k)) з кроком 2^b, де 2^k -
+# sub_bucket_count; кошик 0 - [0, 2^k) з кроком 1.
+
+
+class LatencyHistogram:
+    def __init__(self, significant_digits: int = 2):
+        self.significant_digits = significant_digits
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count // 2
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        bucket = max(0, value.bit_length() - self.sub_bucket_bits)
+        return bucket * self.sub_bucket_half + (value >> bucket)
+
+    def _highest_equivalent(self, index: int) -> int:
+        if index < self.sub_bucket_count:
+            return index
+        bucket = (index - self.sub_bucket_count) // self.sub_bucket_half + 1
+        sub_bucket = index - bucket * self.sub_bucket_half
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, value_us: float, count: int = 1):
+        value = max(0, int(value_us))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> int:
+        """
+        Найменше значення (з точністю кошика), не менше за яке percentile% вимірювань.
+        """
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(self.total * percentile / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def summary(self, percentiles: Iterable[float] = (50, 90, 99, 99.9)) -> dict:
+        """
+        Кількість і затримки в мілісекундах.
+        """
+        result = {"count": self.total, "mean_ms": round(self.mean() / 1000, 3)}
+        for percentile in percentiles:
+            result[f"p{percentile:g}_ms"] = round(self.percentile(percentile) / 1000, 3)
+        result["max_ms"] = round(self.max / 1000, 3)
+        return result
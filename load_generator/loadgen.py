@@ -0,0 +1,288 @@
+"""
+Генератор навантаження на бекенд CRM: зважені сценарії (scenarios.py) з
+відкритим циклом прибуття і звітом у JSON та markdown.
+
+Відкритий цикл: сценарії стартують за розкладом (--rate сценаріїв/с, з
+--ramp-to - лінійно до цієї частоти за --duration), незалежно від того, чи
+встигає бекенд відповідати на попередні. Затримка першого кроку рахується від
+запланованого, а не фактичного старту, тож якщо генератор чи бекенд
+відстають, черга потрапляє у вимірювання (без coordinated omission).
+Затримки - у гістограмах hdr.LatencyHistogram на кожен крок і сценарій.
+
+Локально проти docker-compose (бекенд на :8000):
+
+    python loadgen.py --target http://localhost:8000 --rate 20 --duration 60 \\
+        --json summary.json --markdown summary.md
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Tuple
+
+import httpx
+
+from hdr import LatencyHistogram
+from scenarios import DEFAULT_WEIGHTS, SCENARIOS, Session, Skipped, StepFailed, prepare
+
+TARGET_URL = os.getenv("LOADGEN_TARGET", "http://backend:8000")
+PROGRESS_INTERVAL_S = 10
+
+
+class Recorder:
+    """
+    Гістограми затримок і лічильники результатів за сценаріями та кроками.
+    """
+
+    def __init__(self):
+        self.steps: Dict[Tuple[str, str], LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.step_outcomes: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        self.scenarios: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.scenario_outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self.requests = 0
+        self.in_flight = 0
+        self.max_start_lag_us = 0.0
+
+    def step(self, scenario: str, step: str, outcome: str, latency_us: float):
+        self.requests += 1
+        self.steps[scenario, step].record(latency_us)
+        self.step_outcomes[scenario, step][outcome] += 1
+
+    def scenario(self, scenario: str, outcome: str, latency_us: float):
+        self.scenario_outcomes[scenario][outcome] += 1
+        if outcome == "ok":
+            self.scenarios[scenario].record(latency_us)
+
+
+def arrival_offsets(rate: float, ramp_to: float, duration: float, poisson: bool, rng: random.Random) -> Iterator[float]:
+    """
+    Моменти старту сценаріїв (с від початку). Частота лінійно змінюється від
+    rate до ramp_to; poisson - експоненційні інтервали замість рівних.
+    """
+    offset = 0.0
+    while offset < duration:
+        yield offset
+        current = rate + (ramp_to - rate) * offset / duration
+        offset += rng.expovariate(current) if poisson else 1 / current
+
+
+async def run_scenario(name: str, fixtures, client, recorder: Recorder, intended: float,
+                       semaphore: asyncio.Semaphore, rng: random.Random):
+    async with semaphore:
+        recorder.max_start_lag_us = max(recorder.max_start_lag_us, (time.perf_counter() - intended) * 1e6)
+        recorder.in_flight += 1
+        session = Session(client, recorder, name, rng.choice(fixtures.accounts), intended)
+        try:
+            await SCENARIOS[name](session, fixtures)
+            outcome = "ok"
+        except StepFailed as failed:
+            outcome = f"failed:{failed.step}"
+        except Skipped:
+            outcome = "skipped"
+        except Exception as exc:
+            # Несподівана відповідь (немає ETag, не JSON, ...) - провал сценарію, а не всього прогону
+            outcome = f"failed:{type(exc).__name__}"
+        finally:
+            recorder.in_flight -= 1
+        recorder.scenario(name, outcome, (time.perf_counter() - intended) * 1e6)
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float):
+    """
+    Чекає на 200 від /ready (або /health, якщо /ready немає).
+    """
+    deadline = time.monotonic() + timeout
+    path = "/ready"
+    while True:
+        try:
+            response = await client.get(path)
+            if response.status_code == 404 and path == "/ready":
+                path = "/health"
+                continue
+            if response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise SystemExit(f"{client.base_url} is not ready after {timeout:.0f}s")
+        await asyncio.sleep(0.5)
+
+
+async def report_progress(recorder: Recorder, started: float):
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL_S)
+        done = sum(sum(outcomes.values()) for outcomes in recorder.scenario_outcomes.values())
+        print(
+            f"[{time.perf_counter() - started:6.0f}s] scenarios done {done}, in flight {recorder.in_flight}, "
+            f"requests {recorder.requests}",
+            flush=True,
+        )
+
+
+async def run(args, weights: Dict[str, float]) -> dict:
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+        await wait_ready(client, args.wait_ready)
+        fixtures = await prepare(client, args.accounts, uuid.uuid4().hex[:6])
+        names = list(weights)
+        semaphore = asyncio.Semaphore(args.max_in_flight)
+        tasks = set()
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        progress = asyncio.create_task(report_progress(recorder, started))
+        arrivals = 0
+        try:
+            for offset in arrival_offsets(args.rate, args.ramp_to or args.rate, args.duration, args.poisson, rng):
+                intended = started + offset
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                name = rng.choices(names, weights=[weights[name] for name in names])[0]
+                task = asyncio.create_task(run_scenario(name, fixtures, client, recorder, intended, semaphore, rng))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                arrivals += 1
+            await asyncio.gather(*tasks)
+        finally:
+            progress.cancel()
+        elapsed = time.perf_counter() - started
+    return summarize(args, weights, recorder, arrivals, elapsed, started_at)
+
+
+def summarize(args, weights, recorder: Recorder, arrivals: int, elapsed: float, started_at: datetime) -> dict:
+    completed = sum(outcomes["ok"] for outcomes in recorder.scenario_outcomes.values())
+    return {
+        "target": args.target,
+        "started_at": started_at.isoformat(),
+        "config": {
+            "rate": args.rate, "ramp_to": args.ramp_to or args.rate, "duration_s": args.duration,
+            "arrivals": "poisson" if args.poisson else "uniform", "accounts": args.accounts,
+            "max_in_flight": args.max_in_flight, "weights": weights,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "scenarios_started": arrivals,
+        "scenarios_completed": completed,
+        "throughput": {
+            "scenarios_per_s": round(completed / elapsed, 2),
+            "requests_per_s": round(recorder.requests / elapsed, 2),
+        },
+        "max_start_lag_ms": round(recorder.max_start_lag_us / 1000, 3),
+        "scenarios": {
+            name: {"outcomes": dict(recorder.scenario_outcomes[name]), "latency": recorder.scenarios[name].summary()}
+            for name in sorted(recorder.scenario_outcomes)
+        },
+        "steps": [
+            {
+                "scenario": scenario,
+                "step": step,
+                "outcomes": dict(recorder.step_outcomes[scenario, step]),
+                "latency": histogram.summary(),
+            }
+            for (scenario, step), histogram in recorder.steps.items()
+        ],
+    }
+
+
+def to_markdown(summary: dict) -> str:
+    config = summary["config"]
+    rate = f"{config['rate']:g}/s" if config["rate"] == config["ramp_to"] else f"{config['rate']:g} -> {config['ramp_to']:g}/s"
+    lines = [
+        f"# Load test {summary['started_at']}",
+        "",
+        f"Target `{summary['target']}`, {config['arrivals']} arrivals at {rate} for {config['duration_s']:g}s, "
+        f"{config['accounts']} accounts, weights {', '.join(f'{k}={v:g}' for k, v in config['weights'].items())}.",
+        "",
+        f"- scenarios: {summary['scenarios_started']} started, {summary['scenarios_completed']} completed "
+        f"({summary['throughput']['scenarios_per_s']}/s)",
+        f"- requests: {summary['throughput']['requests_per_s']}/s",
+        f"- max start lag: {summary['max_start_lag_ms']} ms",
+        "",
+        "## Scenarios (end to end, from scheduled start)",
+        "",
+        "| scenario | ok | not ok | p50 ms | p90 ms | p99 ms | p99.9 ms | max ms |",
+        "|---|---:|---|---:|---:|---:|---:|---:|",
+    ]
+    for name, data in summary["scenarios"].items():
+        outcomes = dict(data["outcomes"])
+        ok = outcomes.pop("ok", 0)
+        latency = data["latency"]
+        lines.append(
+            f"| {name} | {ok} | {_outcomes(outcomes)} | {latency['p50_ms']} | {latency['p90_ms']} | "
+            f"{latency['p99_ms']} | {latency['p99.9_ms']} | {latency['max_ms']} |"
+        )
+    lines += [
+        "",
+        "## Steps",
+        "",
+        "| scenario | step | count | statuses | p50 ms | p90 ms | p99 ms | p99.9 ms | max ms |",
+        "|---|---|---:|---|---:|---:|---:|---:|---:|",
+    ]
+    for step in summary["steps"]:
+        latency = step["latency"]
+        lines.append(
+            f"| {step['scenario']} | {step['step']} | {latency['count']} | {_outcomes(step['outcomes'])} | "
+            f"{latency['p50_ms']} | {latency['p90_ms']} | {latency['p99_ms']} | {latency['p99.9_ms']} | {latency['max_ms']} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _outcomes(outcomes: Dict[str, int]) -> str:
+    return ", ".join(f"{name}: {count}" for name, count in sorted(outcomes.items())) or "-"
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}, known: {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def positive(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError("must be positive")
+    return number
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Сценарне навантаження з відкритим циклом прибуття")
+    parser.add_argument("--target", default=TARGET_URL)
+    parser.add_argument("--rate", type=positive, default=5, help="сценаріїв за секунду")
+    parser.add_argument("--ramp-to", type=positive, default=None, help="частота в кінці прогону (лінійно від --rate)")
+    parser.add_argument("--duration", type=positive, default=60, help="секунд прибуття нових сценаріїв")
+    parser.add_argument("--poisson", action="store_true", help="експоненційні інтервали між стартами")
+    parser.add_argument("--weights", type=parse_weights, default=dict(DEFAULT_WEIGHTS),
+                        help="ваги сценаріїв, напр. onboarding=2,browse=5,status_updates=3")
+    parser.add_argument("--accounts", type=int, default=10, help="облікових записів (ліміти запитів - на користувача)")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="одночасних сценаріїв, далі - черга")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--wait-ready", type=float, default=120, help="скільки чекати на /ready бекенду, с")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", help="файл для JSON-звіту")
+    parser.add_argument("--markdown", help="файл для markdown-звіту (інакше - в stdout)")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run(args, args.weights))
+    markdown = to_markdown(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.markdown:
+        with open(args.markdown, "w") as f:
+            f.write(markdown)
+    print(markdown)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import count
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+# Сценарії навантаження - послідовності запитів, як їх робить ресепшен СТО.
+# Кожен крок - один HTTP-запит; наступний крок стартує, коли завершився
+# попередній, а перший - у запланований генератором момент (loadgen.py), тож
+# затримка першого кроку включає і час очікування в самому генераторі.
+
+PASSWORD = "loadgen-password"
+BRANDS = [("Skoda", "Octavia"), ("Toyota", "Corolla"), ("Renault", "Megane"), ("Volkswagen", "Passat"), ("Ford", "Focus")]
+
+
+@dataclass
+class Account:
+    id: int
+    username: str
+    headers: Dict[str, str]
+
+
+@dataclass
+class Fixtures:
+    """
+    Спільні для всіх сценаріїв дані: облікові записи, послуги і створені сутності.
+    """
+    run_id: str
+    accounts: List[Account]
+    service_ids: List[int]
+    customer_ids: List[int] = field(default_factory=list)
+    car_ids: List[int] = field(default_factory=list)
+    # Інвойс береться зі сторони черги і повертається в кінець - двоє сценаріїв
+    # не змінюють один інвойс одночасно (інакше 412 на If-Match)
+    invoice_ids: Deque[int] = field(default_factory=deque)
+    counter: count = field(default_factory=count)
+
+
+class StepFailed(Exception):
+    def __init__(self, step: str, outcome: str):
+        super().__init__(f"{step}: {outcome}")
+        self.step = step
+        self.outcome = outcome
+
+
+class Skipped(Exception):
+    """
+    Сценарію бракує даних (наприклад, ще немає інвойсів) - не помилка.
+    """
+
+
+class Session:
+    """
+    Один прогін сценарію від імені облікового запису. step() міряє крок і
+    передає результат recorder-у; несподіваний статус перериває сценарій.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, recorder, scenario: str, account: Account, intended_start: float):
+        self.client = client
+        self.recorder = recorder
+        self.scenario = scenario
+        self.account = account
+        self.step_start = intended_start
+
+    async def step(self, name: str, method: str, url: str, expect=(200,), headers: Optional[dict] = None, **kwargs):
+        started = self.step_start
+        try:
+            response = await self.client.request(method, url, headers={**self.account.headers, **(headers or {})}, **kwargs)
+            outcome = str(response.status_code)
+        except httpx.TimeoutException:
+            response, outcome = None, "timeout"
+        except httpx.TransportError:
+            response, outcome = None, "transport_error"
+        finished = time.perf_counter()
+        self.step_start = finished
+        self.recorder.step(self.scenario, name, outcome, (finished - started) * 1e6)
+        if response is None or response.status_code not in expect:
+            raise StepFailed(name, outcome)
+        return response
+
+
+async def onboarding(session: Session, fixtures: Fixtures):
+    """
+    Новий клієнт: клієнт -> авто -> запис обслуговування -> інвойс за нього.
+    """
+    n = next(fixtures.counter)
+    tag = f"{fixtures.run_id}{n:08d}"
+    customer = (await session.step("create_customer", "POST", "/customers/", expect=(201,), json={
+        "first_name": "Load",
+        "last_name": f"Test {tag}",
+        "phone": f"+380{n % 10 ** 9:09d}",
+        "email": f"load-{tag}@example.com",
+    })).json()
+    brand, model = random.choice(BRANDS)
+    car = (await session.step("create_car", "POST", "/cars/", expect=(201,), json={
+        "customer_id": customer["id"], "brand": brand, "model": model,
+        "year": random.randint(2005, 2024), "vin": f"LG{tag}".upper(),
+    })).json()
+    service_id = random.choice(fixtures.service_ids)
+    record = (await session.step("create_service_record", "POST", "/service-records/", expect=(201,), json={
+        "car_id": car["id"], "service_id": service_id, "performed_by": session.account.id,
+        "date": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+        "mileage": random.randint(10_000, 300_000),
+    })).json()
+    invoice = (await session.step(
+        "create_invoice", "POST", "/invoices/with-items", expect=(201,),
+        headers={"Idempotency-Key": str(uuid.uuid4())},
+        json={
+            "customer_id": customer["id"], "car_id": car["id"], "worker_id": session.account.id,
+            "items": [{"service_id": service_id}], "service_record_ids": [record["id"]],
+        },
+    )).json()
+    fixtures.customer_ids.append(customer["id"])
+    fixtures.car_ids.append(car["id"])
+    fixtures.invoice_ids.append(invoice["id"])
+
+
+async def browse(session: Session, fixtures: Fixtures):
+    """
+    Списки з фільтрами і пагінацією: клієнти (дві сторінки і пошук), пошук
+    ресепшену, записи обслуговування, інвойси, історія авто.
+    """
+    first = await session.step("list_customers", "GET", "/customers/", params={"limit": 20})
+    cursor = first.headers.get("X-Next-Cursor")
+    if cursor:
+        await session.step("list_customers_next_page", "GET", "/customers/", params={"limit": 20, "cursor": cursor})
+    await session.step("filter_customers", "GET", "/customers/", params={"q": "Test", "limit": 20})
+    await session.step("search", "GET", "/search/", params={"q": random.choice(BRANDS)[0]})
+    await session.step("list_service_records", "GET", "/service-records/", params={"limit": 20})
+    await session.step("list_invoices", "GET", "/invoices/", params={"limit": 20})
+    if fixtures.car_ids:
+        await session.step("car_history", "GET", f"/cars/{random.choice(fixtures.car_ids)}/history")
+
+
+async def status_updates(session: Session, fixtures: Fixtures):
+    """
+    Робота з інвойсом: прочитати (ETag) і провести статуси через PATCH з If-Match.
+    """
+    if not fixtures.invoice_ids:
+        raise Skipped()
+    invoice_id = fixtures.invoice_ids.popleft()
+    try:
+        response = await session.step("get_invoice", "GET", f"/invoices/{invoice_id}")
+        response = await session.step(
+            "start_work", "PATCH", f"/invoices/{invoice_id}",
+            headers={"If-Match": response.headers["ETag"]}, json={"work_status": "in_progress"},
+        )
+        await session.step(
+            "finish_and_pay", "PATCH", f"/invoices/{invoice_id}",
+            headers={"If-Match": response.headers["ETag"]}, json={"work_status": "done", "payment_status": "paid"},
+        )
+    finally:
+        fixtures.invoice_ids.append(invoice_id)
+
+
+Scenario = Callable[[Session, Fixtures], Awaitable[None]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    "onboarding": onboarding,
+    "browse": browse,
+    "status_updates": status_updates,
+}
+DEFAULT_WEIGHTS = {"onboarding": 2, "browse": 5, "status_updates": 3}
+
+
+async def prepare(client: httpx.AsyncClient, accounts: int, run_id: str) -> Fixtures:
+    """
+    Облікові записи loadgen-N (менеджери; створюються, якщо їх немає), послуги
+    каталогу і наявні інвойси. Кілька облікових записів - бо ліміти запитів
+    бекенду рахуються на користувача.
+    """
+    result = []
+    for n in range(accounts):
+        username = f"loadgen-{n}"
+        response = await client.post("/users/", headers={"Idempotency-Key": str(uuid.uuid4())}, json={
+            "username": username, "email": f"{username}@example.com", "password": PASSWORD, "role": "manager",
+        })
+        if response.status_code not in (201, 400):
+            response.raise_for_status()
+        login = await client.post("/auth/login", json={"username": username, "password": PASSWORD})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        me = await client.get("/users/me", headers=headers)
+        me.raise_for_status()
+        result.append(Account(me.json()["id"], username, headers))
+
+    services = await client.get("/services/", params={"limit": 100})
+    services.raise_for_status()
+    service_ids = [service["id"] for service in services.json()]
+    if not service_ids:
+        for name, price, duration in (("Oil change", 40, 30), ("Tire change", 25, 20), ("Diagnostics", 30, 45)):
+            created = await client.post("/services/", json={"name": name, "price": price, "duration": duration})
+            created.raise_for_status()
+            service_ids.append(created.json()["id"])
+
+    invoices = await client.get("/invoices/", params={"limit": 100}, headers=result[0].headers)
+    invoices.raise_for_status()
+    return Fixtures(
+        run_id=run_id,
+        accounts=result,
+        service_ids=service_ids,
+        invoice_ids=deque(invoice["id"] for invoice in invoices.json()),
+    )
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модулі генератора імпортуються як у контейнері - з кореня load_generator
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,118 @@
+import asyncio
+import math
+import random
+import time
+
+import pytest
+
+import loadgen
+from hdr import LatencyHistogram
+from loadgen import Recorder, arrival_offsets, run_scenario
+from scenarios import Account, Fixtures, StepFailed
+
+
+def exact_percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * percentile / 100)) - 1]
+
+
+def test_histogram_bucket_boundaries():
+    """До 2^8 значення точні, далі кошики подвоюють крок на кожній степені двійки."""
+    histogram = LatencyHistogram(significant_digits=2)
+    assert histogram.sub_bucket_count == 256
+    index = histogram._index
+    assert [histogram._highest_equivalent(index(v)) for v in (0, 1, 254, 255)] == [0, 1, 254, 255]
+    # 256..511 - крок 2, 512..1023 - крок 4
+    assert index(255) != index(256) == index(257) != index(258)
+    assert index(510) == index(511) != index(512)
+    assert index(512) == index(515) != index(516)
+    assert histogram._highest_equivalent(index(256)) == 257
+    assert histogram._highest_equivalent(index(511)) == 511
+    assert histogram._highest_equivalent(index(512)) == 515
+    # Суміжні кошики не перекриваються і не лишають дірок
+    for value in range(0, 1 << 14):
+        assert histogram._highest_equivalent(index(value)) >= value
+        assert index(histogram._highest_equivalent(index(value)) + 1) == index(value) + 1
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_histogram_percentiles_within_relative_error(seed):
+    """Перцентилі відрізняються від точних не більше ніж на 10^-significant_digits."""
+    rng = random.Random(seed)
+    values = [int(rng.lognormvariate(9, 1.5)) for _ in range(20_000)]
+    histogram = LatencyHistogram(significant_digits=2)
+    for value in values:
+        histogram.record(value)
+
+    for percentile in (1, 25, 50, 90, 99, 99.9, 100):
+        exact = exact_percentile(values, percentile)
+        assert exact <= histogram.percentile(percentile) <= exact + max(1, exact * 0.01)
+    assert histogram.percentile(100) == max(values)
+    assert (histogram.total, histogram.min, histogram.max) == (len(values), min(values), max(values))
+    assert histogram.mean() == pytest.approx(sum(values) / len(values))
+
+
+def test_histogram_merge_equals_recording_everything():
+    """Злиття гістограм (напр. з кількох генераторів) - те саме, що запис усіх значень в одну."""
+    rng = random.Random(7)
+    values = [rng.randint(0, 5_000_000) for _ in range(5_000)]
+    whole, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for value in values:
+        whole.record(value)
+    for value in values[:1000]:
+        left.record(value)
+    for value in values[1000:]:
+        right.record(value)
+
+    left.merge(right)
+    assert left.counts == whole.counts
+    assert (left.total, left.sum, left.min, left.max) == (whole.total, whole.sum, whole.min, whole.max)
+    assert left.summary() == whole.summary()
+
+    empty = LatencyHistogram()
+    empty.merge(LatencyHistogram())
+    assert (empty.total, empty.min, empty.percentile(99)) == (0, None, 0)
+
+
+def test_arrival_offsets_constant_ramp_and_poisson():
+    """Розклад стартів: рівні інтервали, лінійне прискорення, пуассонівський потік."""
+    constant = list(arrival_offsets(10, 10, 2, poisson=False, rng=random.Random(1)))
+    assert len(constant) == 20
+    assert constant == pytest.approx([n / 10 for n in range(20)])
+
+    # Середня частота 10 -> 30 за 10 с - 20/с, тобто ~200 стартів
+    ramp = list(arrival_offsets(10, 30, 10, poisson=False, rng=random.Random(1)))
+    assert all(b > a for a, b in zip(ramp, ramp[1:])) and ramp[-1] < 10
+    assert 195 <= len(ramp) <= 205
+    gaps = [b - a for a, b in zip(ramp, ramp[1:])]
+    assert gaps[0] == pytest.approx(0.1) and gaps[-1] == pytest.approx(1 / 30, rel=0.02)
+
+    poisson = list(arrival_offsets(200, 200, 20, poisson=True, rng=random.Random(1)))
+    assert 3800 <= len(poisson) <= 4200
+    gaps = [b - a for a, b in zip(poisson, poisson[1:])]
+    assert min(gaps) >= 0 and len({round(gap, 6) for gap in gaps}) > 100
+    assert sum(gaps) / len(gaps) == pytest.approx(1 / 200, rel=0.05)
+
+
+def test_run_scenario_records_unexpected_errors_as_failures(monkeypatch):
+    """Несподіваний виняток у сценарії - провал цього сценарію, а не всього прогону."""
+    async def missing_etag(session, fixtures):
+        raise KeyError("etag")
+
+    async def failed_step(session, fixtures):
+        raise StepFailed("get_invoice", "500")
+
+    monkeypatch.setitem(loadgen.SCENARIOS, "missing_etag", missing_etag)
+    monkeypatch.setitem(loadgen.SCENARIOS, "failed_step", failed_step)
+    recorder = Recorder()
+    fixtures = Fixtures(run_id="t", accounts=[Account(1, "loadgen-0", {})], service_ids=[1])
+
+    async def run_both():
+        semaphore = asyncio.Semaphore(2)
+        for name in ("missing_etag", "failed_step"):
+            await run_scenario(name, fixtures, None, recorder, time.perf_counter(), semaphore, random.Random(1))
+
+    asyncio.run(run_both())
+    assert recorder.scenario_outcomes["missing_etag"] == {"failed:KeyError": 1}
+    assert recorder.scenario_outcomes["failed_step"] == {"failed:get_invoice": 1}
+    assert recorder.in_flight == 0
@@ -0,0 +1,37 @@
+import api from "./axios";
+
+const NEXT_CURSOR_HEADER = "x-next-cursor";
+const MAX_RATE_LIMIT_RETRIES = 3;
+
+const sleep = (ms) => new Promise(r => setTimeout(r, ms));
+
+async function getPage(url, params, retries = MAX_RATE_LIMIT_RETRIES) {
+  try {
+    return await api.get(url, { params });
+  } catch (err) {
+    // Спискові ендпоінти мають жорсткіший rate limit - чекаємо Retry-After
+    if (err.response?.status === 429 && retries > 0) {
+      await sleep(Number(err.response.headers["retry-after"] || 1) * 1000);
+      return getPage(url, params, retries - 1);
+    }
+    throw err;
+  }
+}
+
+/**
+ * Завантажує всі сторінки спискового ендпоінта, слідуючи курсору X-Next-Cursor.
+ * Повертає об'єкт у форматі відповіді axios ({ data: [...] }).
+ * @param {string} url - Шлях списку, напр. "/customers" або "/cars?customer_id=1".
+ * @param {object} [params] - Додаткові query-параметри.
+ * @returns {Promise<{data: Array}>}
+ */
+export async function fetchAllPages(url, params = {}) {
+  const data = [];
+  let cursor = null;
+  do {
+    const res = await getPage(url, { ...params, ...(cursor ? { cursor } : {}) });
+    data.push(...res.data);
+    cursor = res.headers[NEXT_CURSOR_HEADER] || null;
+  } while (cursor);
+  return { data };
+}
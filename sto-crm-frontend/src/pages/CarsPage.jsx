@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from "react";
 import { useParams, Link } from "react-router-dom";
 import api from "../api/axios";
+import { fetchAllPages } from "../api/pagination";
 import MainMenu from "../components/MainMenu";
 
 export default function CarsPage() {
@@ -21,7 +22,7 @@ export default function CarsPage() {
     const url = customerId ? `/cars?customer_id=${customerId}` : "/cars";
     
     setLoading(true);
-    api.get(url)
+    fetchAllPages(url)
       .then(res => setCars(res.data))
       .catch(() => {
         setError("Помилка при завантаженні автомобілів");
@@ -31,7 +32,7 @@ export default function CarsPage() {
 
     // Якщо ми на сторінці /cars, завантажуємо список клієнтів для форми
     if (!customerId) {
-      api.get("/customers").then(res => setCustomers(res.data));
+      fetchAllPages("/customers").then(res => setCustomers(res.data));
     } else {
       // Якщо ми на сторінці клієнта, завантажуємо його дані для заголовка
       api.get(`/customers/${customerId}`).then(res => setCustomer(res.data));
@@ -46,7 +47,7 @@ export default function CarsPage() {
     await api.post("/cars", form);
     setForm({ vin: "", brand: "", model: "", year: "", customer_id: "" });
     // Перезавантажуємо список всіх авто
-    api.get("/cars").then(res => setCars(res.data));
+    fetchAllPages("/cars").then(res => setCars(res.data));
   };
 
   const handleEdit = (car) => {
@@ -59,14 +60,14 @@ export default function CarsPage() {
     await api.put(`/cars/${editId}`, form);
     setEditId(null);
     setForm({ vin: "", brand: "", model: "", year: "", customer_id: "" });
-    api.get("/cars").then(res => setCars(res.data));
+    fetchAllPages("/cars").then(res => setCars(res.data));
   };
 
   const handleDelete = async (id) => {
     if (!window.confirm("Видалити авто?")) return;
     await api.delete(`/cars/${id}`);
     const url = customerId ? `/cars?customer_id=${customerId}` : "/cars";
-    api.get(url).then(res => setCars(res.data));
+    fetchAllPages(url).then(res => setCars(res.data));
   };
 
   // Визначаємо заголовок сторінки
@@ -10,8 +10,14 @@ export default function CustomerDetailsPage() {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    api.get(`/customers/${id}`).then(res => setCustomer(res.data));
-    api.get(`/cars?customer_id=${id}`).then(res => setCars(res.data)).finally(() => setLoading(false));
+    // Клієнт і його авто одним запитом
+    api.get(`/customers/${id}/overview`)
+      .then(res => {
+        setCustomer(res.data.customer);
+        setCars(res.data.cars);
+      })
+      .catch(() => setCustomer(null))
+      .finally(() => setLoading(false));
   }, [id]);
 
   if (loading) return <div>Завантаження...</div>;
@@ -1,5 +1,6 @@
 import React, { useEffect, useState, useContext } from "react";
 import api from "../api/axios";
+import { fetchAllPages } from "../api/pagination";
 import MainMenu from "../components/MainMenu";
 import { Link } from "react-router-dom";
 
@@ -24,7 +25,7 @@ export default function CustomersPage() {
 
   const fetchCustomers = () => {
     setLoading(true);
-    api.get("/customers")
+    fetchAllPages("/customers")
       .then(res => setCustomers(res.data))
       .catch(() => setCustomers([]))
       .finally(() => setLoading(false));
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from "react";
 import api from "../api/axios";
+import { fetchAllPages } from "../api/pagination";
 import MainMenu from "../components/MainMenu";
 import { useNavigate } from "react-router-dom";
 
@@ -31,19 +32,19 @@ export default function InvoicesPage() {
         const userRes = await api.get("/users/me");
         setUser(userRes.data);
 
-        const invoicesRes = await api.get("/invoices");
+        const invoicesRes = await fetchAllPages("/invoices");
         setInvoices(invoicesRes.data);
 
-        const customersRes = await api.get("/customers");
+        const customersRes = await fetchAllPages("/customers");
         setCustomers(customersRes.data);
 
-        const carsRes = await api.get("/cars");
+        const carsRes = await fetchAllPages("/cars");
         setCars(carsRes.data);
 
         const servicesRes = await api.get("/services");
         setServices(servicesRes.data);
 
-        const workersRes = await api.get("/users");
+        const workersRes = await fetchAllPages("/users");
         setWorkers(workersRes.data.filter(u => u.role === "master"));
       } catch (err) {
         setError("Помилка завантаження даних");
@@ -101,7 +102,7 @@ export default function InvoicesPage() {
         payment_status: "unpaid",
         work_status: "new"
       });
-      const invoicesRes = await api.get("/invoices");
+      const invoicesRes = await fetchAllPages("/invoices");
       setInvoices(invoicesRes.data);
     } catch (err) {
       setError(err.message);
@@ -136,7 +137,7 @@ export default function InvoicesPage() {
         payment_status: "unpaid",
         work_status: "new"
       });
-      const invoicesRes = await api.get("/invoices");
+      const invoicesRes = await fetchAllPages("/invoices");
       setInvoices(invoicesRes.data);
     } catch (err) {
       setError("Помилка при оновленні інвойсу");
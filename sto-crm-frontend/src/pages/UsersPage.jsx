@@ -1,5 +1,6 @@
 import React, { useEffect, useState, useRef } from "react";
 import api from "../api/axios";
+import { fetchAllPages } from "../api/pagination";
 import MainMenu from "../components/MainMenu";
 import { fetchWithResilience } from "../lib/http";
 import { getOrReuseKey } from "../lib/idempotency";
@@ -28,7 +29,7 @@ export default function UsersPage() {
 
   const fetchUsers = () => {
     setLoading(true);
-    api.get("/users")
+    fetchAllPages("/users")
       .then(res => {
         setUsers(res.data);
         // Скидаємо лічильник помилок при успішному запиті